@@ -0,0 +1,373 @@
+"""
+离线基准测试 / 性能回归检查。
+
+把录制好的游戏画面 (完整客户端画面或任务追踪面板截图) 逐一送入流水线的各个阶段，
+报告每个阶段的 p50/p95/p99 延迟、吞吐量和峰值内存，并与 JSON 基线比较。
+默认语料为项目根目录的 caiyi.png、renshen.png 以及 benchmarks/frames/ 下的全部录制画面
+(客户端尺寸的画面：任务追踪栏在两个不同位置、两种任务描述，以及一张没有任务追踪栏的画面；
+这些画面由上述两张录制的面板截图和标题模板合成，不是完整的游戏录屏，有真实录屏时应加入该目录)。
+基线 benchmarks/baseline.json 随代码提交；在不同的机器上比较前应先用 --write-baseline 重新生成。
+写入基线时 OCR 必须可用 (否则需要显式加 --allow-no-ocr)。
+
+用法:
+    python benchmarks/run_benchmarks.py                       # 与 benchmarks/baseline.json 比较 (若存在)
+    python benchmarks/run_benchmarks.py --write-baseline      # 把本次结果写为新的基线
+    python benchmarks/run_benchmarks.py --frames recordings/  # 指定录制画面 (文件或目录，可多个)
+
+每个指标取 repeats 轮测量的中位数。任何阶段的指标超过基线 (1 + threshold) 倍、且 (延迟指标)
+绝对增量超过 floor_ms 时，或者基线与本次结果覆盖的阶段不一致时，以退出码 1 结束。
+"""
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+TASKS_DIR = os.path.join(PROJECT_ROOT, 'tasks')
+if TASKS_DIR not in sys.path:
+    sys.path.append(TASKS_DIR)
+
+from core.config_loader import SettingsStore
+from core.image_matcher import TemplateTracker, find_template_pyramid, load_template, to_gray
+from core.frame_context import FrameContext
+from core.text_recognizer import get_ocr_cache, recognize_lines_batch, initialize_paddle_ocr
+
+DEFAULT_FRAMES = [
+    os.path.join(PROJECT_ROOT, 'caiyi.png'),
+    os.path.join(PROJECT_ROOT, 'renshen.png'),
+    os.path.join(PROJECT_ROOT, 'benchmarks', 'frames'),
+]
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, 'benchmarks', 'baseline.json')
+STAGES = ('capture_decode', 'template_match', 'color_segmentation', 'ocr', 'process_jianduoshiguang')
+
+# 合成客户端画面时任务追踪栏标题的放置位置 (与实际游戏中的大致位置一致)
+_SYNTHETIC_HEADER_POS = (1000, 300)
+_SYNTHETIC_BACKGROUND = (40, 40, 40)
+
+
+class _NullInput:
+    """基准测试中代替 core.input_simulator，只记录调用次数，不操作键鼠。"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _record(self, *args, **kwargs):
+        self.calls += 1
+
+    click_screen_coords = press_key = press_hotkey = move_to_screen_coords = _record
+
+
+def _expand_frame_paths(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in ('*.png', '*.jpg', '*.bmp'):
+                files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        elif os.path.isfile(path):
+            files.append(path)
+    return files
+
+
+def _synthesize_client_frame(panel_bgr, settings):
+    """
+    录制的只是任务面板截图时，把它和标题模板一起贴到一张客户端尺寸的画面上，
+    使模板匹配和完整处理器阶段也能使用这份录制数据。
+    """
+    width, height = settings.client_size
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = _SYNTHETIC_BACKGROUND
+    header = cv2.imread(settings.header_template_path)
+    hx, hy = _SYNTHETIC_HEADER_POS
+    frame[hy:hy + header.shape[0], hx:hx + header.shape[1]] = header
+
+    roi = settings.layout_rois.get('taskdesc')
+    px, py = roi.at(hx, hy)[:2] if roi is not None else (hx, hy + header.shape[0])
+    ph = min(panel_bgr.shape[0], height - py)
+    pw = min(panel_bgr.shape[1], width - px)
+    frame[py:py + ph, px:px + pw] = panel_bgr[:ph, :pw]
+    return frame
+
+
+def load_corpus(frame_paths, settings):
+    """
+    返回 [(名称, 客户端画面 BGR, 面板图像 BGR)]。
+    尺寸不小于客户端区域的图像视为完整客户端画面，其余视为任务面板截图。
+    """
+    client_w, client_h = settings.client_size
+    corpus = []
+    for path in _expand_frame_paths(frame_paths):
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"警告：无法读取 {path}，已跳过。")
+            continue
+        name = os.path.relpath(path, PROJECT_ROOT)
+        if image.shape[1] >= client_w and image.shape[0] >= client_h:
+            frame = np.ascontiguousarray(image[:client_h, :client_w])
+            panel = None
+            header = find_template_pyramid(frame, settings.header_template_path, settings.header_match_threshold,
+                                           settings.header_pyramid_levels, scales=settings.header_match_scales)
+            roi = settings.layout_rois.get('taskdesc')
+            if header is not None and roi is not None:
+                x, y, w, h = roi.at(header[0], header[1])
+                panel = frame[max(0, y):y + h, max(0, x):x + w]
+            corpus.append((name, frame, panel if panel is not None and panel.size else None))
+        else:
+            corpus.append((name, _synthesize_client_frame(image, settings), image))
+    return corpus
+
+
+def _ocr_available():
+    return importlib.util.find_spec('paddleocr') is not None and initialize_paddle_ocr()
+
+
+def build_stages(corpus, settings, ocr_enabled):
+    """返回 {阶段名: (函数, 输入列表)}；函数对一个输入执行一次该阶段。"""
+    import jianduoshiguang_processor
+
+    header_template = load_template(settings.header_template_path)
+    frames = [frame for _, frame, _ in corpus]
+    panels = [panel for _, _, panel in corpus if panel is not None]
+    bgra_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA) for frame in frames]
+    decode_buffer = {}
+
+    def capture_decode(bgra):
+        # 与 MssCaptureBackend.grab 相同：BGRA 截图转换到复用的 BGR 缓冲区
+        buffer = decode_buffer.get(bgra.shape)
+        if buffer is None:
+            buffer = decode_buffer[bgra.shape] = np.empty(bgra.shape[:2] + (3,), dtype=np.uint8)
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=buffer)
+
+    def template_match(frame):
+        return find_template_pyramid(to_gray(frame), header_template, settings.header_match_threshold,
+                                     settings.header_pyramid_levels, scales=settings.header_match_scales)
+
+    def color_segmentation(panel):
+        return settings.color_segmenter.segment(panel, 4)
+
+    # 每帧一个批次，与处理器送入识别器的截图块相同：任务类型 ROI 的单行截图，
+    # 加上任务描述中绿色连通块经 group_text_lines 合并后的每一行 NPC 名字
+    ocr_batches = []
+    for frame in frames:
+        context = FrameContext(frame, (0, 0, frame.shape[1], frame.shape[0]), settings, header_tracker=TemplateTracker())
+        batch = []
+        task_type_image = context.roi_image('tasktype')
+        if task_type_image is not None:
+            batch.append(task_type_image)
+        task_desc_image = context.roi_image('taskdesc')
+        if task_desc_image is not None:
+            for x, y, w, h, _ in context.color_text_lines('taskdesc', 'npcnamegreen', min_area=4):
+                batch.append(task_desc_image[y:y + h, x:x + w])
+        if batch:
+            ocr_batches.append(batch)
+
+    def ocr(batch):
+        return recognize_lines_batch(batch, use_cache=False)
+
+    null_input = _NullInput()
+    header_tracker = TemplateTracker()
+
+    def process(frame):
+        # 每次都丢弃缓存的面板结果并清空 OCR 结果缓存，测量的是完整处理路径 (包括真正的识别)，
+        # 而不是 "面板未变化" 或缓存命中的快速路径
+        jianduoshiguang_processor.reset_panel_cache()
+        ocr_cache = get_ocr_cache()
+        if ocr_cache is not None:
+            ocr_cache.clear()
+        rect = (0, 0, frame.shape[1], frame.shape[0])
+        context = FrameContext(frame, rect, settings, header_tracker=header_tracker)
+        return jianduoshiguang_processor.process_jianduoshiguang(context, null_input)
+
+    stages = {
+        'capture_decode': (capture_decode, bgra_frames),
+        'template_match': (template_match, frames),
+        'color_segmentation': (color_segmentation, panels),
+        'process_jianduoshiguang': (process, frames),
+    }
+    if ocr_enabled:
+        stages['ocr'] = (ocr, ocr_batches)
+    return stages
+
+
+def measure_stage(function, inputs, iterations, warmup, repeats=5):
+    """
+    把测量分成 repeats 轮，每轮对每个输入执行 iterations 次 (最开始预热 warmup 次)，
+    每个延迟指标取各轮结果的中位数，单轮受到的机器负载波动不会直接进入结果。
+    峰值内存单独用 tracemalloc 跑一遍测量，避免 tracemalloc 的开销影响延迟数据。
+    """
+    for _ in range(warmup):
+        for item in inputs:
+            function(item)
+
+    rounds = []
+    for _ in range(repeats):
+        samples = []
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for item in inputs:
+                call_start = time.perf_counter()
+                function(item)
+                samples.append(time.perf_counter() - call_start)
+        elapsed = time.perf_counter() - started
+        samples_ms = np.array(samples) * 1000
+        p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+        rounds.append({
+            'mean_ms': float(samples_ms.mean()),
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'throughput_per_s': len(samples) / elapsed if elapsed > 0 else 0.0,
+        })
+
+    tracemalloc.start()
+    for item in inputs:
+        function(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {'samples': iterations * len(inputs) * repeats, 'repeats': repeats}
+    for metric in rounds[0]:
+        result[metric] = float(np.median([r[metric] for r in rounds]))
+    result['peak_memory_kb'] = peak / 1024
+    return result
+
+
+def run_benchmarks(frame_paths=DEFAULT_FRAMES, iterations=20, warmup=3, stages=STAGES, enable_ocr=True, repeats=5):
+    settings = SettingsStore(PROJECT_ROOT).load()
+    corpus = load_corpus(frame_paths, settings)
+    if not corpus:
+        raise SystemExit("错误：没有可用的录制画面。")
+
+    ocr_enabled = enable_ocr and 'ocr' in stages and _ocr_available()
+    stage_table = build_stages(corpus, settings, ocr_enabled)
+    results = {}
+    for stage in stages:
+        if stage not in stage_table:
+            print(f"[bench] {stage}: 跳过 (不可用)")
+            continue
+        function, inputs = stage_table[stage]
+        if not inputs:
+            print(f"[bench] {stage}: 跳过 (没有输入)")
+            continue
+        results[stage] = measure_stage(function, inputs, iterations, warmup, repeats)
+        print(f"[bench] {format_stage(stage, results[stage])}")
+
+    return {
+        'meta': {
+            'frames': [name for name, _, _ in corpus],
+            'iterations': iterations,
+            'repeats': repeats,
+            'ocr_enabled': bool(ocr_enabled),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'machine': platform.machine(),
+        },
+        'stages': results,
+    }
+
+
+def format_stage(stage, s):
+    return (f"{stage:<24} p50={s['p50_ms']:8.3f}ms p95={s['p95_ms']:8.3f}ms p99={s['p99_ms']:8.3f}ms "
+            f"throughput={s['throughput_per_s']:9.1f}/s peak_mem={s['peak_memory_kb']:9.1f}KB")
+
+
+def compare_to_baseline(report, baseline, threshold=0.25, metrics=('p50_ms',), floor_ms=0.5):
+    """
+    返回回归列表 [(阶段, 指标, 基线值, 当前值)]：当前值 > 基线值 * (1 + threshold)，
+    且 (对 *_ms 指标) 绝对增量超过 floor_ms 即视为回归；绝对下限避免亚毫秒级阶段的计时抖动触发回归。
+
+    基线和本次结果覆盖的阶段不一致 (例如基线录制时 OCR 不可用、或本机 OCR 不可用) 时，
+    缺失的阶段同样作为回归报告 (基线值 / 当前值为 None)：回归检查不能悄悄地少测一个阶段。
+    """
+    regressions = []
+    baseline_stages = baseline.get('stages', {})
+    for stage in sorted(set(baseline_stages) ^ set(report['stages'])):
+        previous = baseline_stages.get(stage)
+        current = report['stages'].get(stage)
+        regressions.append((stage, 'missing', previous and previous.get('p50_ms'), current and current.get('p50_ms')))
+    for stage, current in report['stages'].items():
+        previous = baseline_stages.get(stage)
+        if previous is None:
+            continue
+        for metric in metrics:
+            if metric not in previous:
+                continue
+            limit = previous[metric] * (1 + threshold)
+            if metric.endswith('_ms'):
+                limit = max(limit, previous[metric] + floor_ms)
+            if current[metric] > limit:
+                regressions.append((stage, metric, previous[metric], current[metric]))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="离线基准测试 / 性能回归检查")
+    parser.add_argument('--frames', nargs='+', default=DEFAULT_FRAMES, help="录制画面文件或目录")
+    parser.add_argument('--iterations', type=int, default=20, help="每轮中每个输入的重复次数")
+    parser.add_argument('--repeats', type=int, default=5, help="测量轮数 (各指标取各轮的中位数)")
+    parser.add_argument('--warmup', type=int, default=3, help="预热次数")
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=STAGES, help="要测试的阶段")
+    parser.add_argument('--no-ocr', action='store_true', help="跳过 OCR 阶段")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基线 JSON 文件")
+    parser.add_argument('--write-baseline', action='store_true', help="把本次结果写为新的基线")
+    parser.add_argument('--threshold', type=float, default=0.25, help="允许的相对退化比例")
+    parser.add_argument('--floor-ms', type=float, default=0.5, help="延迟指标至少增加这么多毫秒才算回归")
+    parser.add_argument('--allow-no-ocr', action='store_true',
+                        help="允许在 OCR 不可用时写入基线 (之后在 OCR 可用的机器上比较会报告 ocr 阶段缺失)")
+    parser.add_argument('--metrics', nargs='+', default=['p50_ms'],
+                        help="参与回归比较的指标 (p50_ms, p95_ms, p99_ms, peak_memory_kb, ...)")
+    parser.add_argument('--output', default=None, help="把本次结果另存为 JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmarks(args.frames, args.iterations, args.warmup, tuple(args.stages), not args.no_ocr,
+                            args.repeats)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.write_baseline:
+        if 'ocr' in args.stages and 'ocr' not in report['stages'] and not args.allow_no_ocr:
+            print("[bench] 错误：OCR 阶段不可用，拒绝写入不含 OCR 的基线 (确需如此请加 --allow-no-ocr)。")
+            return 1
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"[bench] 基线已写入 {args.baseline}")
+        return 0
+
+    if not os.path.isfile(args.baseline):
+        print(f"[bench] 没有基线文件 {args.baseline}，跳过回归比较 (使用 --write-baseline 生成)。")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if not baseline.get('meta', {}).get('ocr_enabled') and 'ocr' not in report['stages']:
+        print("[bench] 警告：基线和本次运行都没有 OCR 阶段，OCR 的性能不在回归检查范围内。")
+    regressions = compare_to_baseline(report, baseline, args.threshold, tuple(args.metrics), args.floor_ms)
+    if regressions:
+        for stage, metric, previous, current in regressions:
+            if metric == 'missing':
+                where = "基线" if previous is None else "本次结果"
+                print(f"[bench] 回归: {stage} 阶段在{where}中缺失，无法比较 (需要在同一环境下重新生成基线)")
+                continue
+            print(f"[bench] 回归: {stage} {metric} {previous:.3f} -> {current:.3f} "
+                  f"(+{(current / previous - 1) * 100 if previous else float('inf'):.0f}%)")
+        return 1
+    print(f"[bench] 与基线相比没有超过 {args.threshold * 100:.0f}% 的退化。")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
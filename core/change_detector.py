@@ -0,0 +1,130 @@
+import cv2
+import numpy as np
+import threading
+
+
+class RegionChangeDetector:
+    """
+    脏区域检测：为每个登记的 ROI 保存一个廉价的降采样签名 (每个 tile_size x tile_size 小块的灰度均值)，
+    每一帧只比较签名，报告哪些区域自上次检查以来发生了变化。
+
+    处理器可以在区域未变化时直接复用上一次的分析结果，跳过模板匹配、颜色分割和 OCR。
+    """
+
+    def __init__(self, tile_size=8, tile_tolerance=6.0):
+        """
+        参数:
+        - tile_size (int): 签名中每个小块的边长 (像素)。
+        - tile_tolerance (float): 小块灰度均值的变化超过该值才认为该小块变化了 (用于忽略抗锯齿/闪烁噪声)。
+        """
+        self.tile_size = tile_size
+        self.tile_tolerance = tile_tolerance
+        self._regions = {} # 名称 -> {'roi': (x, y, w, h), 'signature': ndarray or None, 'dirty': bool}
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.clean_checks = 0
+
+    def register(self, name, roi):
+        """
+        登记 (或更新) 一个需要跟踪的区域。ROI 发生变化时该区域会被视为脏区域。
+
+        参数:
+        - name (str): 区域名称，例如 "tasktracker_panel"。
+        - roi (tuple): (x, y, w, h)，相对于整帧的坐标。
+        """
+        roi = tuple(int(v) for v in roi)
+        with self._lock:
+            region = self._regions.get(name)
+            if region is None or region['roi'] != roi:
+                self._regions[name] = {'roi': roi, 'signature': None, 'dirty': True, 'changed_tiles': 0}
+
+    def unregister(self, name):
+        with self._lock:
+            self._regions.pop(name, None)
+
+    def _signature(self, frame, roi):
+        x, y, w, h = roi
+        frame_h, frame_w = frame.shape[:2]
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(frame_w, x + w), min(frame_h, y + h)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        crop = frame[y0:y1, x0:x1]
+        if crop.ndim == 3:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        tiles_w = max(1, (x1 - x0) // self.tile_size)
+        tiles_h = max(1, (y1 - y0) // self.tile_size)
+        # INTER_AREA 缩放得到的就是每个小块的均值
+        return cv2.resize(crop, (tiles_w, tiles_h), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def _check_region(self, region, frame):
+        signature = self._signature(frame, region['roi'])
+        previous = region['signature']
+        if signature is None:
+            dirty = True
+            changed_tiles = 0
+        elif previous is None or previous.shape != signature.shape:
+            dirty = True
+            changed_tiles = signature.size
+        else:
+            changed_tiles = int(np.count_nonzero(np.abs(signature - previous) > self.tile_tolerance))
+            dirty = changed_tiles > 0
+        region['signature'] = signature
+        region['dirty'] = dirty
+        region['changed_tiles'] = changed_tiles
+        self.checks += 1
+        if not dirty:
+            self.clean_checks += 1
+        return dirty
+
+    def update(self, frame):
+        """
+        对所有登记的区域计算签名并与上一帧比较。
+
+        返回:
+        - set: 自上次 update / check 以来发生变化的区域名称集合。
+        """
+        if frame is None:
+            return set()
+        with self._lock:
+            return {name for name, region in self._regions.items() if self._check_region(region, frame)}
+
+    def check(self, name, frame, roi=None):
+        """
+        只检查一个区域 (需要时顺便登记/更新它的 ROI)。
+
+        返回:
+        - bool: True 表示该区域是脏区域 (首次检查、ROI 改变或画面变化)。
+        """
+        if roi is not None:
+            self.register(name, roi)
+        with self._lock:
+            region = self._regions.get(name)
+            if region is None or frame is None:
+                return True
+            return self._check_region(region, frame)
+
+    def is_dirty(self, name):
+        """返回最近一次检查时该区域是否变化 (未登记的区域视为脏区域)。"""
+        with self._lock:
+            region = self._regions.get(name)
+            return True if region is None else region['dirty']
+
+    def invalidate(self, name=None):
+        """强制某个区域 (或全部区域) 在下一次检查时被视为脏区域。"""
+        with self._lock:
+            names = [name] if name is not None else list(self._regions)
+            for region_name in names:
+                region = self._regions.get(region_name)
+                if region is not None:
+                    region['signature'] = None
+                    region['dirty'] = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'regions': len(self._regions),
+                'checks': self.checks,
+                'clean_checks': self.clean_checks,
+                'clean_rate': (self.clean_checks / self.checks) if self.checks else 0.0,
+            }
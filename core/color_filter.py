@@ -1,15 +1,20 @@
 import cv2
 import numpy as np
 import os # 只是为了在可能的调试中保存图片时使用
+from collections import namedtuple
 
+from core.metrics import span
+
+
+@span('color.contours')
 def find_contours_by_bgr_range(image_bgr, lower_bgr, upper_bgr, min_contour_area=10):
     """
     在给定的BGR图像数据中，根据BGR颜色范围查找轮廓。
 
     参数:
     - image_bgr (numpy.ndarray): BGR格式的图像数据。
-    - lower_bgr (tuple or list): BGR颜色范围的下界 (B, G, R)。
-    - upper_bgr (tuple or list): BGR颜色范围的上界 (B, G, R)。
+    - lower_bgr (tuple, list or numpy.ndarray): BGR颜色范围的下界 (B, G, R)。
+    - upper_bgr (tuple, list or numpy.ndarray): BGR颜色范围的上界 (B, G, R)。
     - min_contour_area (int): 轮廓的最小面积，用于过滤小噪点。
 
     返回:
@@ -20,8 +25,8 @@ def find_contours_by_bgr_range(image_bgr, lower_bgr, upper_bgr, min_contour_area
     if image_bgr is None:
         return []
 
-    if not (isinstance(lower_bgr, (list, tuple)) and len(lower_bgr) == 3 and
-            isinstance(upper_bgr, (list, tuple)) and len(upper_bgr) == 3):
+    if not (isinstance(lower_bgr, (list, tuple, np.ndarray)) and len(lower_bgr) == 3 and
+            isinstance(upper_bgr, (list, tuple, np.ndarray)) and len(upper_bgr) == 3):
         # print("错误 (find_contours_by_bgr_range): 颜色范围参数格式不正确。") # 暂时不打印
         return []
 
@@ -69,4 +74,242 @@ def find_contours_by_bgr_range(image_bgr, lower_bgr, upper_bgr, min_contour_area
         # print(f"错误 (find_contours_by_bgr_range): 颜色轮廓查找过程中发生错误 - {e}") # 暂时不打印
         # import traceback
         # traceback.print_exc() # 调试时可以打开
-        return []
\ No newline at end of file
+        return []
+
+COLOR_SPACE_BGR = 'bgr'
+COLOR_SPACE_HSV = 'hsv'
+
+# 一个命名颜色范围。space 为 COLOR_SPACE_HSV 时 lower/upper 是 OpenCV 的 HSV (H: 0-179)，
+# 且允许 lower 的 H 大于 upper 的 H，表示色相跨过 0 (例如红色 170 -> 10)。
+ColorRange = namedtuple('ColorRange', ['name', 'lower', 'upper', 'space'])
+
+_HUE_MAX = 179
+_COLORS_PER_PLANE = 8 # 每个 uint8 位平面最多容纳 8 种颜色
+
+
+def _channel_lut(lower, upper, wrap=False):
+    values = np.arange(256)
+    if wrap and lower > upper:
+        return (values >= lower) | ((values <= upper) & (values <= _HUE_MAX))
+    return (values >= lower) & (values <= upper)
+
+
+class ColorSegmenter:
+    """
+    多颜色单遍分割：一次扫描把每个像素同时归类到若干命名颜色范围。
+
+    构造时为每个通道预先生成 256 项查找表，表项是 "该通道值落在哪些颜色范围内" 的位掩码
+    (每种颜色占一位)。分割时先用所有颜色范围的外包范围做一次 cv2.inRange，找出候选像素的
+    外接矩形 (彩色文字通常只占面板的一小部分，没有候选像素时直接返回)；再只在这个窗口内做一次
+    3 通道 cv2.LUT，把三个通道的位掩码按位与，结果中第 i 位为 1 即表示像素落在第 i 种颜色范围内。
+    增加颜色不会增加扫描次数 (每 8 种颜色共用一个位平面)，HSV 范围共用一次 cvtColor。
+    各颜色的连通块由 cv2.connectedComponentsWithStats 给出，面积过滤和排序都用 NumPy 向量化完成。
+    """
+
+    def __init__(self, color_ranges):
+        """
+        参数:
+        - color_ranges (iterable[ColorRange]): 颜色范围列表，名称不能重复。
+        """
+        self.color_ranges = tuple(color_ranges)
+        names = [color_range.name for color_range in self.color_ranges]
+        if len(set(names)) != len(names):
+            raise ValueError(f"颜色名称重复: {names}")
+        # 颜色空间 -> (外包下界, 外包上界, [(3 通道查找表, [(颜色名, 位, 单色查找表), ...]), ...])
+        self._spaces = {}
+        for space in (COLOR_SPACE_BGR, COLOR_SPACE_HSV):
+            ranges = [r for r in self.color_ranges if r.space == space]
+            if not ranges:
+                continue
+            union_lower = np.min([r.lower for r in ranges], axis=0).astype(np.uint8)
+            union_upper = np.max([r.upper for r in ranges], axis=0).astype(np.uint8)
+            if space == COLOR_SPACE_HSV and any(int(r.lower[0]) > int(r.upper[0]) for r in ranges):
+                union_lower[0], union_upper[0] = 0, _HUE_MAX # 有跨 0 的色相范围时外包范围取全部色相
+            planes = []
+            for start in range(0, len(ranges), _COLORS_PER_PLANE):
+                group = ranges[start:start + _COLORS_PER_PLANE]
+                lut = np.zeros((256, 1, 3), dtype=np.uint8)
+                bits = []
+                for bit_index, color_range in enumerate(group):
+                    bit = 1 << bit_index
+                    for channel in range(3):
+                        hits = _channel_lut(int(color_range.lower[channel]), int(color_range.upper[channel]),
+                                            wrap=(space == COLOR_SPACE_HSV and channel == 0))
+                        lut[hits, 0, channel] |= bit
+                    # 位平面 -> 0/255 掩码的查找表，一次 cv2.LUT 取出单个颜色
+                    bit_lut = np.where(np.arange(256) & bit, 255, 0).astype(np.uint8)
+                    bits.append((color_range.name, bit, bit_lut))
+                planes.append((lut, bits))
+            self._spaces[space] = (union_lower, union_upper, planes)
+
+    @property
+    def names(self):
+        return tuple(color_range.name for color_range in self.color_ranges)
+
+    def _label_windows(self, image_bgr):
+        # 生成 (x0, y0, 位平面窗口, [(颜色名, 位, 单色查找表), ...])
+        for space, (union_lower, union_upper, planes) in self._spaces.items():
+            source = image_bgr if space == COLOR_SPACE_BGR else cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
+            x0, y0, w, h = cv2.boundingRect(cv2.inRange(source, union_lower, union_upper))
+            if w == 0 or h == 0:
+                continue
+            window = source[y0:y0 + h, x0:x0 + w]
+            for lut, bits in planes:
+                mapped = cv2.LUT(window, lut)
+                packed = cv2.bitwise_and(cv2.bitwise_and(mapped[:, :, 0], mapped[:, :, 1]), mapped[:, :, 2])
+                yield x0, y0, packed, bits
+
+    @span('color.masks')
+    def masks(self, image_bgr):
+        """返回 {颜色名: 0/255 掩码}，与 cv2.inRange 的输出格式相同。"""
+        if image_bgr is None:
+            return {}
+        masks = {name: np.zeros(image_bgr.shape[:2], dtype=np.uint8) for name in self.names}
+        for x0, y0, packed, bits in self._label_windows(image_bgr):
+            h, w = packed.shape
+            for name, _, bit_lut in bits:
+                masks[name][y0:y0 + h, x0:x0 + w] = cv2.LUT(packed, bit_lut)
+        return masks
+
+    @span('color.segment')
+    def segment(self, image_bgr, min_area=1, connectivity=8):
+        """
+        对每种颜色求连通块边界框。
+
+        参数:
+        - image_bgr (numpy.ndarray): BGR 图像。
+        - min_area (int or dict): 连通块的最小像素数；dict 时按颜色名分别指定 (缺省为 1)。
+        - connectivity (int): 4 或 8 连通。
+
+        返回:
+        - dict: 颜色名 -> [(x, y, w, h), ...]，坐标相对 image_bgr，按从上到下、从左到右排序。
+        """
+        boxes = {name: [] for name in self.names}
+        if image_bgr is None:
+            return boxes
+        for x0, y0, packed, bits in self._label_windows(image_bgr):
+            for name, bit, _ in bits:
+                area_limit = min_area.get(name, 1) if isinstance(min_area, dict) else min_area
+                # 连通块分析只区分零 / 非零，直接用 "位平面 & 该颜色的位" 作为掩码
+                boxes[name] = boxes_from_mask(cv2.bitwise_and(packed, bit), area_limit, connectivity, offset=(x0, y0))
+        return boxes
+
+
+def boxes_from_mask(mask, min_area=1, connectivity=8, offset=(0, 0)):
+    """
+    用 cv2.connectedComponentsWithStats 求掩码中所有连通块的边界框。
+    面积 (像素数) 过滤、平移和排序都是向量化的，不对每个连通块调用 Python 函数。
+
+    参数:
+    - offset (tuple): 加到每个边界框 (x, y) 上的偏移 (mask 是大图中的一个窗口时使用)。
+
+    返回:
+    - list: [(x, y, w, h), ...]，按从上到下、从左到右排序。
+    """
+    if mask is None:
+        return []
+    # 只在前景像素的外接矩形内做连通块分析：稀疏的文字掩码上这比对整张掩码快一个数量级
+    x0, y0, w, h = cv2.boundingRect(mask)
+    if w == 0 or h == 0:
+        return []
+    window = mask[y0:y0 + h, x0:x0 + w]
+    # Grana (BBDT) 用于 8 连通，4 连通时 OpenCV 自动改用 SAUF
+    _, _, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(window, connectivity, cv2.CV_32S, cv2.CCL_GRANA)
+    stats = stats[1:] # 第 0 个连通块是背景
+    stats = stats[stats[:, cv2.CC_STAT_AREA] >= min_area]
+    if not len(stats):
+        return []
+    order = np.lexsort((stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]))
+    boxes = stats[order, :4]
+    boxes[:, 0] += x0 + offset[0]
+    boxes[:, 1] += y0 + offset[1]
+    return [tuple(box) for box in boxes.tolist()]
+
+
+def segment_colors(image_bgr, color_ranges, min_area=1, connectivity=8):
+    """
+    便捷函数：用 color_ranges 构造一个 ColorSegmenter 并分割 image_bgr。
+    在循环中反复调用时应复用同一个 ColorSegmenter，避免重复生成查找表。
+    """
+    return ColorSegmenter(color_ranges).segment(image_bgr, min_area, connectivity)
+
+
+# 由若干同色连通块合并成的一行文字。x, y, w, h 为整行的边界框，members 为组成该行的连通块 [(x, y, w, h), ...]
+TextLine = namedtuple('TextLine', ['x', 'y', 'w', 'h', 'members'])
+
+
+def _same_line(a, b, max_gap, baseline_tolerance, min_height):
+    # a, b: [left, top, right, bottom] (right / bottom 不含)
+    horizontal_gap = max(a[0], b[0]) - min(a[2], b[2])
+    if horizontal_gap > max_gap:
+        return False
+    vertical_gap = max(a[1], b[1]) - min(a[3], b[3])
+    if vertical_gap > baseline_tolerance:
+        return False
+    # 竖直方向重叠超过较矮者的一半 (包括一个框包含另一个) 时一定是同一行，不再比较底边
+    if -vertical_gap * 2 > min(a[3] - a[1], b[3] - b[1]):
+        return True
+    # 两者都已有整行的高度时还要求底边对齐，避免行距很小的上下两行因为笔画相接被合并
+    if a[3] - a[1] >= min_height and b[3] - b[1] >= min_height:
+        return abs(a[3] - b[3]) <= baseline_tolerance
+    return True
+
+
+@span('color.text_lines')
+def group_text_lines(boxes, max_gap=6, baseline_tolerance=2, min_height=8):
+    """
+    把同一颜色的连通块合并成文字行。
+
+    汉字的笔画、偏旁常常互不相连，一个名字会被分割成许多小连通块；这里把水平间距不超过 max_gap、
+    竖直方向相接 (间距不超过 baseline_tolerance) 的连通块合并为一行。两个候选都已达到 min_height
+    (即都已是完整字高)、且竖直重叠不超过较矮者的一半时，还要求底边相差不超过 baseline_tolerance。合并结束后高度仍小于 min_height 的行
+    (零散的噪点、标点) 被丢弃。
+
+    参数:
+    - boxes (list): [(x, y, w, h), ...] 连通块边界框，例如 ColorSegmenter.segment() 的结果。
+    - max_gap (int): 同一行内相邻连通块之间允许的最大水平间距 (像素)。
+    - baseline_tolerance (int): 竖直间距 / 底边对齐的容差 (像素)。
+    - min_height (int): 文字行的最小高度 (像素)。
+
+    返回:
+    - list: [TextLine, ...]，按从上到下、从左到右排序；每行的 members 按从左到右排序。
+    """
+    if not boxes:
+        return []
+    # 按 x 排序后逐个并入已有的行；合并顺序会影响中间结果，所以最后再反复合并相邻的行直到不再变化
+    lines = [] # [[left, top, right, bottom], members]
+    for box in sorted(boxes, key=lambda b: (b[0], b[1])):
+        x, y, w, h = box
+        rect = [x, y, x + w, y + h]
+        for line in reversed(lines):
+            if _same_line(line[0], rect, max_gap, baseline_tolerance, min_height):
+                bounds = line[0]
+                bounds[0], bounds[1] = min(bounds[0], rect[0]), min(bounds[1], rect[1])
+                bounds[2], bounds[3] = max(bounds[2], rect[2]), max(bounds[3], rect[3])
+                line[1].append(tuple(box))
+                break
+        else:
+            lines.append([rect, [tuple(box)]])
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(lines)):
+            for j in range(i + 1, len(lines)):
+                a, b = lines[i][0], lines[j][0]
+                if _same_line(a, b, max_gap, baseline_tolerance, min_height):
+                    lines[i] = [[min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])],
+                                lines[i][1] + lines[j][1]]
+                    del lines[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    text_lines = [
+        TextLine(left, top, right - left, bottom - top, sorted(members))
+        for (left, top, right, bottom), members in lines
+        if bottom - top >= min_height
+    ]
+    text_lines.sort(key=lambda line: (line.y, line.x))
+    return text_lines
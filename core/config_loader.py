@@ -1,105 +1,327 @@
 import configparser
+import logging
 import os
+import threading
+import time
+import types
+from dataclasses import dataclass, field
 
-_loaded_configs = {} # 缓存已加载的配置文件对象
+import numpy as np
 
-def load_config_file(file_name, config_dir="config"):
-    """
-    加载指定的 .ini 配置文件。
-    会缓存已加载的配置，避免重复读取。
+from core.keyword_index import KeywordIndex
+from core.color_filter import ColorRange, ColorSegmenter, COLOR_SPACE_BGR, COLOR_SPACE_HSV
 
-    参数:
-    - file_name (str): 配置文件的名称 (例如 "settings_ui_layout.ini")。
-    - config_dir (str): 配置文件所在的目录路径 (相对于项目根目录)。
+logger = logging.getLogger(__name__)
 
-    返回:
-    - configparser.ConfigParser: 加载的配置对象。
-    - None: 如果文件未找到或加载失败。
+DEFAULT_CONFIG_FILES = (
+    "settings_general.ini",
+    "settings_ui_layout.ini",
+    "settings_ocr.ini",
+    "task_keywords.ini",
+)
+
+
+class ConfigValidationError(ValueError):
+    """配置文件内容无效 (缺少段落/键、数值越界等)。"""
+
+
+@dataclass(frozen=True)
+class RoiSpec:
+    """相对锚点 (例如任务追踪栏标题模板左上角) 的 ROI 布局。"""
+    offset_x: int
+    offset_y: int
+    width: int
+    height: int
+
+    def at(self, anchor_x, anchor_y):
+        """返回以 (anchor_x, anchor_y) 为锚点时的 (x, y, w, h)。"""
+        return (anchor_x + self.offset_x, anchor_y + self.offset_y, self.width, self.height)
+
+
+@dataclass(frozen=True)
+class NpcKeywords:
+    target_name: str
+    keywords: tuple
+
+
+@dataclass(frozen=True)
+class Settings:
     """
-    global _loaded_configs
+    由全部 INI 文件编译得到的不可变配置快照。
 
-    # 构建到项目根目录的路径，然后到config目录
-    # __file__ 是当前脚本 (config_loader.py) 的路径
-    # os.path.dirname(__file__) 是 core 目录
-    # os.path.dirname(os.path.dirname(__file__)) 是项目根目录
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    config_file_path = os.path.join(project_root, config_dir, file_name)
+    所有字符串解析 (整数、浮点、逗号分隔的列表和颜色) 都在编译时完成一次，
+    热路径上的代码只读取这里已解析好的字段。
+    """
+    project_root: str
+    window_title: str
+    expected_window_size: tuple          # (width, height)
+    client_offset: tuple                 # (x, y)
+    client_size: tuple                   # (width, height)
+    header_template_path: str
+    header_match_threshold: float
+    header_pyramid_levels: int
+    header_match_scales: tuple
+    layout_rois: types.MappingProxyType  # 前缀 -> RoiSpec，例如 'tasktype', 'taskdesc'
+    color_bounds: types.MappingProxyType # 名称 -> (lower ndarray, upper ndarray)，例如 'npcnamegreen' (只含 BGR 范围)
+    color_ranges: tuple                  # 全部命名颜色范围 (BGR 和 HSV)，ColorRange 元组
+    color_segmenter: ColorSegmenter      # 由 color_ranges 构建的多颜色单遍分割器
+    task_keywords: types.MappingProxyType  # 任务类型 -> 关键词元组
+    npc_keywords: types.MappingProxyType   # 任务类型 -> NpcKeywords
+    keyword_index: KeywordIndex            # 由全部任务类型 / NPC 别名构建的关键词索引
+    ocr_cache_max_entries: int
+    ocr_cache_ttl_seconds: object        # float 或 None
+    ocr_cache_phash_tolerance: int
+    glyph_atlas_path: object             # str 或 None：点阵字体字形图集 (core.glyph_ocr)
+    glyph_min_confidence: float
+    input_zero_animation: bool           # True 时键鼠操作不做移动动画，也不使用 pyautogui.PAUSE
+    input_max_frame_age: object          # int 或 None：键鼠操作落后当前帧超过这么多帧即丢弃
+    source_mtimes: types.MappingProxyType = field(repr=False, compare=False)
 
-    if config_file_path in _loaded_configs:
-        return _loaded_configs[config_file_path]
 
-    if not os.path.exists(config_file_path):
-        # print(f"错误 (load_config_file): 配置文件未找到: {config_file_path}") # 遵循原则，暂时不打印
-        return None
+def _split_list(value):
+    return tuple(item.strip() for item in value.split(',') if item.strip())
 
-    config = configparser.ConfigParser()
+
+def _parse_color(value, option):
     try:
-        config.read(config_file_path, encoding='utf-8')
-        _loaded_configs[config_file_path] = config
-        return config
-    except configparser.Error: # 捕获所有configparser相关的解析错误
-        # print(f"错误 (load_config_file): 解析配置文件失败: {config_file_path}") # 暂时不打印
-        return None
+        parts = tuple(int(v) for v in value.split(','))
+    except ValueError:
+        raise ConfigValidationError(f"{option}: 颜色值必须是逗号分隔的整数，实际为 '{value}'")
+    if len(parts) != 3 or not all(0 <= v <= 255 for v in parts):
+        raise ConfigValidationError(f"{option}: 颜色值必须是 3 个 0-255 的整数，实际为 '{value}'")
+    color = np.array(parts, dtype=np.uint8)
+    color.flags.writeable = False
+    return color
 
 
-def get_section_dict(config_parser_object, section_name):
-    """
-    从已加载的 ConfigParser 对象中获取指定段落的所有键值对，作为字典返回。
+def _require(config, section, option, getter='get', **kwargs):
+    try:
+        return getattr(config, getter)(section, option, **kwargs)
+    except (configparser.NoSectionError, configparser.NoOptionError) as e:
+        raise ConfigValidationError(f"缺少配置 [{section}] {option}") from e
+    except ValueError as e:
+        raise ConfigValidationError(f"配置 [{section}] {option} 的值无效: {e}") from e
 
-    参数:
-    - config_parser_object (configparser.ConfigParser): 已加载的配置对象。
-    - section_name (str): 要获取的段落名称。
+
+def compile_settings(config, project_root, source_mtimes=None):
+    """
+    把 ConfigParser 编译为 Settings 快照，并在此处完成全部校验。
 
     返回:
-    - dict: 包含该段落所有键值对的字典。
-    - None: 如果配置对象无效或段落不存在。
+    - Settings: 编译后的配置。
+
+    异常:
+    - ConfigValidationError: 配置缺失或数值无效。
     """
-    if not config_parser_object or not isinstance(config_parser_object, configparser.ConfigParser):
-        return None
-    if not config_parser_object.has_section(section_name):
-        # print(f"警告 (get_section_dict): 段落 '{section_name}' 在配置中未找到。") # 暂时不打印
-        return None # 或者返回空字典 {}，取决于你希望如何处理
+    header_template_path = os.path.join(project_root, _require(config, 'tasktrackerui_templates', 'headertemplatepath'))
+    if not os.path.isfile(header_template_path):
+        raise ConfigValidationError(f"模板文件不存在: {header_template_path}")
+    header_match_threshold = _require(config, 'tasktrackerui_templates', 'headermatchthreshold', 'getfloat')
+    if not 0.0 < header_match_threshold <= 1.0:
+        raise ConfigValidationError(f"headermatchthreshold 必须在 (0, 1] 之间，实际为 {header_match_threshold}")
+    try:
+        header_match_scales = tuple(float(v) for v in _split_list(
+            config.get('tasktrackerui_templates', 'headermatchscales', fallback='1.0')))
+    except ValueError as e:
+        raise ConfigValidationError(f"headermatchscales 无效: {e}") from e
+    if not header_match_scales or any(scale <= 0 for scale in header_match_scales):
+        raise ConfigValidationError("headermatchscales 必须是正数列表")
 
-    return dict(config_parser_object.items(section_name))
+    if not config.has_section('tasktrackerui_layout'):
+        raise ConfigValidationError("缺少配置段落 [tasktrackerui_layout]")
+    layout = dict(config.items('tasktrackerui_layout'))
+    layout_rois = {}
+    for key in layout:
+        if not key.endswith('_offsetx'):
+            continue
+        prefix = key[:-len('_offsetx')]
+        roi = RoiSpec(*(_require(config, 'tasktrackerui_layout', f"{prefix}_{suffix}", 'getint')
+                        for suffix in ('offsetx', 'offsety', 'width', 'height')))
+        if roi.width <= 0 or roi.height <= 0:
+            raise ConfigValidationError(f"ROI '{prefix}' 的宽高必须大于 0")
+        layout_rois[prefix] = roi
 
+    # <名称>lowerbound / <名称>upperbound 是 BGR 范围；<名称>hsvlowerbound / <名称>hsvupperbound 是
+    # OpenCV HSV 范围 (H: 0-179)，H 的下界可以大于上界，表示色相跨过 0 (例如红色)
+    color_bounds = {}
+    color_ranges = []
+    for key, value in layout.items():
+        if not key.endswith('lowerbound'):
+            continue
+        prefix = key[:-len('lowerbound')]
+        upper_key = f"{prefix}upperbound"
+        lower = _parse_color(value, key)
+        upper = _parse_color(_require(config, 'tasktrackerui_layout', upper_key), upper_key)
+        if prefix.endswith('hsv'):
+            name, space = prefix[:-len('hsv')], COLOR_SPACE_HSV
+            if lower[0] > 179 or upper[0] > 179:
+                raise ConfigValidationError(f"{key} / {upper_key} 的 H 分量必须在 0-179 之间")
+            if np.any(lower[1:] > upper[1:]):
+                raise ConfigValidationError(f"{key} 的 S、V 分量都必须不大于 {upper_key}")
+        else:
+            name, space = prefix, COLOR_SPACE_BGR
+            if np.any(lower > upper):
+                raise ConfigValidationError(f"{key} 的每个分量都必须不大于 {upper_key}")
+            color_bounds[name] = (lower, upper)
+        if any(existing.name == name for existing in color_ranges):
+            raise ConfigValidationError(f"颜色 '{name}' 同时配置了 BGR 和 HSV 范围")
+        color_ranges.append(ColorRange(name, lower, upper, space))
 
-def get_config_value(config_dict, key, default_value=None, value_type=str):
-    """
-    从配置字典中获取指定键的值，并进行可选的类型转换。
+    task_keywords = {}
+    if config.has_section('taskkeywords'):
+        task_keywords = {task: _split_list(value) for task, value in config.items('taskkeywords')}
 
-    参数:
-    - config_dict (dict): 从 get_section_dict 获取的配置字典。
-    - key (str): 要获取的键名 (不区分大小写，因为ConfigParser默认不区分)。
-    - default_value (any, optional): 如果键不存在，返回的默认值。
-    - value_type (type, optional): 期望的值类型 (例如 int, float, bool, str)。
-                                   对于bool, "true", "yes", "on", "1" (不区分大小写) 会被转为True,
-                                   "false", "no", "off", "0" 会被转为False。
+    npc_keywords = {}
+    for section in config.sections():
+        if section.endswith('_npc_keywords'):
+            task = section[:-len('_npc_keywords')]
+            npc_keywords[task] = NpcKeywords(
+                target_name=config.get(section, 'targetnpcname', fallback='').strip(),
+                keywords=_split_list(config.get(section, 'keywords', fallback=''))
+            )
 
-    返回:
-    - any: 获取到的值 (可能已转换类型)，或默认值。
-    - None: 如果键不存在且未提供默认值，或类型转换失败。
+    ocr_cache_ttl = _require(config, 'ocr_params', 'cachettlseconds', 'getfloat', fallback=0)
+    ocr_cache_max_entries = _require(config, 'ocr_params', 'cachemaxentries', 'getint', fallback=256)
+    ocr_cache_phash_tolerance = _require(config, 'ocr_params', 'cachephashtolerance', 'getint', fallback=0)
+    if ocr_cache_ttl < 0:
+        raise ConfigValidationError(f"cachettlseconds 不能为负数，实际为 {ocr_cache_ttl}")
+    if ocr_cache_max_entries < 0:
+        raise ConfigValidationError(f"cachemaxentries 不能为负数，实际为 {ocr_cache_max_entries}")
+    if not 0 <= ocr_cache_phash_tolerance <= 64:
+        raise ConfigValidationError(f"cachephashtolerance 必须在 0-64 之间，实际为 {ocr_cache_phash_tolerance}")
+    header_pyramid_levels = _require(config, 'tasktrackerui_templates', 'headerpyramidlevels', 'getint', fallback=0)
+    if not 0 <= header_pyramid_levels <= 4:
+        raise ConfigValidationError(f"headerpyramidlevels 必须在 0-4 之间，实际为 {header_pyramid_levels}")
+    input_max_frame_age = _require(config, 'input', 'maxframeage', 'getint', fallback=1)
+    glyph_atlas_path = config.get('ocr_params', 'glyphatlaspath', fallback='').strip()
+    glyph_atlas_path = os.path.join(project_root, glyph_atlas_path) if glyph_atlas_path else None
+    glyph_min_confidence = _require(config, 'ocr_params', 'glyphminconfidence', 'getfloat', fallback=0.85)
+    if not 0.0 < glyph_min_confidence <= 1.0:
+        raise ConfigValidationError(f"glyphminconfidence 必须在 (0, 1] 之间，实际为 {glyph_min_confidence}")
+
+    return Settings(
+        project_root=project_root,
+        window_title=_require(config, 'gamewindow', 'titlepattern'),
+        expected_window_size=(_require(config, 'gamewindow', 'expectedwidth', 'getint'),
+                              _require(config, 'gamewindow', 'expectedheight', 'getint')),
+        client_offset=(_require(config, 'screencapture', 'clientareaoffsetx', 'getint'),
+                       _require(config, 'screencapture', 'clientareaoffsety', 'getint')),
+        client_size=(_require(config, 'screencapture', 'clientareawidth', 'getint'),
+                     _require(config, 'screencapture', 'clientareaheight', 'getint')),
+        header_template_path=header_template_path,
+        header_match_threshold=header_match_threshold,
+        header_pyramid_levels=header_pyramid_levels,
+        header_match_scales=header_match_scales,
+        layout_rois=types.MappingProxyType(layout_rois),
+        color_bounds=types.MappingProxyType(color_bounds),
+        color_ranges=tuple(color_ranges),
+        color_segmenter=ColorSegmenter(color_ranges),
+        task_keywords=types.MappingProxyType(task_keywords),
+        npc_keywords=types.MappingProxyType(npc_keywords),
+        keyword_index=KeywordIndex.from_config(config),
+        ocr_cache_max_entries=ocr_cache_max_entries,
+        ocr_cache_ttl_seconds=ocr_cache_ttl if ocr_cache_ttl > 0 else None,
+        ocr_cache_phash_tolerance=ocr_cache_phash_tolerance,
+        glyph_atlas_path=glyph_atlas_path,
+        glyph_min_confidence=glyph_min_confidence,
+        input_zero_animation=_require(config, 'input', 'zeroanimation', 'getboolean', fallback=False),
+        input_max_frame_age=input_max_frame_age if input_max_frame_age >= 0 else None,
+        source_mtimes=types.MappingProxyType(dict(source_mtimes or {})),
+    )
+
+
+class SettingsStore:
     """
-    if not config_dict or not isinstance(config_dict, dict):
-        return default_value if default_value is not None else None
+    持有当前的 Settings 快照，并在 INI 文件的 mtime 变化时重新编译、原子替换。
 
-    # ConfigParser 默认会将键名转为小写
-    value_str = config_dict.get(key.lower())
+    读取方只需在每个 tick 开头取一次 store.current，之后整个 tick 都使用同一份快照；
+    重新编译失败 (例如文件改到一半) 时保留旧快照，错误记录在 last_error 中。
+    """
 
-    if value_str is None:
-        return default_value
+    def __init__(self, project_root, config_files=DEFAULT_CONFIG_FILES, config_dir="config", check_interval=1.0):
+        self.project_root = project_root
+        self.config_paths = [os.path.join(project_root, config_dir, name) for name in config_files]
+        self.check_interval = check_interval
+        self.last_error = None
+        self._current = None
+        self._last_check = 0.0
+        self._listeners = []
+        self._lock = threading.Lock()
 
-    try:
-        if value_type == bool:
-            if value_str.lower() in ('true', 'yes', 'on', '1'):
-                return True
-            elif value_str.lower() in ('false', 'no', 'off', '0'):
-                return False
-            else: #无法转换为bool，可以返回默认值或None，或抛出异常
-                return default_value # 或者 raise ValueError
-        elif value_type == str:
-            return value_str
-        else: # int, float 等
-            return value_type(value_str)
-    except ValueError:
-        # print(f"警告 (get_config_value): 值 '{value_str}' 无法转换为类型 {value_type.__name__} for key '{key}'.") # 暂时不打印
-        return default_value if default_value is not None else None
\ No newline at end of file
+    @property
+    def current(self):
+        if self._current is None:
+            self.load()
+        return self._current
+
+    def add_listener(self, listener):
+        """listener(old_settings, new_settings) 在每次成功替换快照后调用。"""
+        self._listeners.append(listener)
+
+    def _read_mtimes(self):
+        mtimes = {}
+        for path in self.config_paths:
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def _compile(self):
+        mtimes = self._read_mtimes()
+        config = configparser.ConfigParser()
+        try:
+            config.read([p for p in self.config_paths if mtimes[p] is not None], encoding='utf-8')
+        except configparser.Error as e:
+            raise ConfigValidationError(f"解析配置文件失败: {e}") from e
+        if not config.has_section('paths'):
+            config.add_section('paths')
+        config.set('paths', 'projectroot', self.project_root)
+        try:
+            return compile_settings(config, self.project_root, mtimes)
+        except (ValueError, TypeError) as e:
+            if isinstance(e, ConfigValidationError):
+                raise
+            # 兜底：没有经过 _require 的选项解析失败时同样按配置无效处理，不让热重载打断运行循环
+            raise ConfigValidationError(f"配置值无效: {e}") from e
+
+    def load(self):
+        """
+        (重新) 编译全部配置并替换当前快照。
+
+        异常:
+        - ConfigValidationError: 配置无效 (首次加载时直接抛出)。
+        """
+        with self._lock:
+            new_settings = self._compile()
+            old_settings, self._current = self._current, new_settings
+            self._last_check = time.monotonic()
+            self.last_error = None
+        for listener in list(self._listeners):
+            try:
+                listener(old_settings, new_settings)
+            except Exception as e:
+                # 监听器应用新配置失败 (例如字形图集文件损坏) 不影响快照替换，也不打断运行循环
+                logger.error("Settings listener %r failed: %s", listener, e)
+                self.last_error = e
+        return new_settings
+
+    def reload_if_changed(self):
+        """
+        按 check_interval 节流检查文件 mtime，有变化时重新编译。
+
+        返回:
+        - bool: 是否替换了快照。
+        """
+        now = time.monotonic()
+        if self._current is not None and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        if self._current is not None and self._read_mtimes() == dict(self._current.source_mtimes):
+            return False
+        try:
+            self.load()
+        except ConfigValidationError as e:
+            self.last_error = e
+            return False
+        return True
@@ -0,0 +1,187 @@
+import threading
+import time
+
+import cv2
+
+from core.color_filter import group_text_lines
+from core.image_matcher import TemplateTracker, to_gray
+from core.text_recognizer import OcrResultCache, recognize_lines_batch
+
+# 任务追踪栏标题的位置在所有处理器和所有帧之间共享
+_shared_header_tracker = TemplateTracker()
+
+
+def _crop_key(crop):
+    # 按内容区分截图块：处理器可能传入临时分配的拷贝，释放后同一地址可能被另一块截图复用
+    if crop is None or crop.size == 0:
+        return None
+    return OcrResultCache.content_key(crop)
+
+
+class FrameContext:
+    """
+    单帧分析上下文：所有任务处理器共享同一个 FrameContext。
+
+    灰度图、降采样金字塔、任务追踪栏标题位置、命名 ROI、颜色掩码和 OCR 结果等派生数据
+    都在第一次访问时计算并缓存在本帧内，之后的访问直接复用。
+    stats() 报告每一项的计算耗时、命中次数以及因此节省的时间。
+    """
+
+    def __init__(self, frame, client_rect, settings, frame_seq=None, header_tracker=None):
+        """
+        参数:
+        - frame (numpy.ndarray): 游戏内部画面 (BGR)。
+        - client_rect (tuple): 游戏内部画面在屏幕上的绝对矩形 (x, y, w, h)。
+        - settings (core.config_loader.Settings): 本帧使用的配置快照。
+        - frame_seq (int, optional): 帧序号。
+        - header_tracker (TemplateTracker, optional): 默认使用模块级共享的追踪器。
+        """
+        self.frame = frame
+        self.client_rect = client_rect
+        self.settings = settings
+        self.frame_seq = frame_seq
+        self.header_tracker = header_tracker or _shared_header_tracker
+        self._memo = {}
+        self._memo_stats = {} # 名称 -> [计算耗时(秒), 命中次数]
+        self._lock = threading.RLock()
+
+    def memoize(self, name, compute):
+        """
+        返回名称为 name 的派生数据，首次访问时调用 compute() 计算并缓存。
+
+        参数:
+        - name (hashable): 缓存键，例如 'gray' 或 ('roi', 'taskdesc')。
+        - compute (callable): 无参函数，返回要缓存的值 (None 也会被缓存)。
+        """
+        with self._lock:
+            if name in self._memo:
+                self._memo_stats[name][1] += 1
+                return self._memo[name]
+            started = time.perf_counter()
+            value = compute()
+            self._memo[name] = value
+            self._memo_stats[name] = [time.perf_counter() - started, 0]
+            return value
+
+    @property
+    def frame_size(self):
+        return self.frame.shape[1], self.frame.shape[0]
+
+    @property
+    def gray(self):
+        return self.memoize('gray', lambda: to_gray(self.frame))
+
+    def pyramid(self, level):
+        """返回缩小到 1/2**level 的灰度图 (level 0 即灰度原图)。"""
+        if level <= 0:
+            return self.gray
+
+        def compute():
+            previous = self.pyramid(level - 1)
+            return cv2.pyrDown(previous)
+        return self.memoize(('pyramid', level), compute)
+
+    @property
+    def header(self):
+        """任务追踪栏标题的匹配结果 (x, y, w, h, confidence)，未找到时为 None。"""
+        def compute():
+            self.header_tracker.pyramid_levels = self.settings.header_pyramid_levels
+            self.header_tracker.scales = self.settings.header_match_scales
+            return self.header_tracker.find(self.gray, self.settings.header_template_path,
+                                            self.settings.header_match_threshold)
+        return self.memoize('header', compute)
+
+    def roi(self, name):
+        """
+        返回布局配置中名为 name 的 ROI (相对任务追踪栏标题)，即 (x, y, w, h)。
+        标题未找到或配置中没有该 ROI 时返回 None。
+        """
+        def compute():
+            header = self.header
+            roi_spec = self.settings.layout_rois.get(name)
+            if header is None or roi_spec is None:
+                return None
+            return roi_spec.at(header[0], header[1])
+        return self.memoize(('roi', name), compute)
+
+    def roi_in_bounds(self, name):
+        roi = self.roi(name)
+        if roi is None:
+            return False
+        x, y, w, h = roi
+        frame_w, frame_h = self.frame_size
+        return x >= 0 and y >= 0 and x + w <= frame_w and y + h <= frame_h
+
+    def roi_image(self, name):
+        """返回 ROI 的 BGR 图像视图 (ROI 不存在或越界时为 None)。"""
+        def compute():
+            if not self.roi_in_bounds(name):
+                return None
+            x, y, w, h = self.roi(name)
+            return self.frame[y:y + h, x:x + w]
+        return self.memoize(('roi_image', name), compute)
+
+    def color_masks(self, roi_name):
+        """ROI 内所有配置颜色的掩码 {颜色名: 0/255 掩码}，由一次多颜色分割得到。"""
+        def compute():
+            image = self.roi_image(roi_name)
+            if image is None:
+                return {}
+            return self.settings.color_segmenter.masks(image)
+        return self.memoize(('color_masks', roi_name), compute)
+
+    def color_mask(self, roi_name, color_name):
+        """ROI 内落在配置颜色范围 color_name 中的像素掩码 (未配置该颜色时为 None)。"""
+        return self.color_masks(roi_name).get(color_name)
+
+    def color_segments(self, roi_name, min_area=1):
+        """ROI 内所有配置颜色的连通块 {颜色名: [(x, y, w, h), ...]} (坐标相对 ROI)，一次扫描完成。"""
+        def compute():
+            image = self.roi_image(roi_name)
+            if image is None:
+                return {}
+            return self.settings.color_segmenter.segment(image, min_area)
+        return self.memoize(('color_segments', roi_name, min_area), compute)
+
+    def color_blobs(self, roi_name, color_name, min_area=1):
+        """ROI 内颜色 color_name 的连通块边界框列表 (坐标相对 ROI)。"""
+        return self.color_segments(roi_name, min_area).get(color_name, [])
+
+    def color_text_lines(self, roi_name, color_name, min_area=1, max_gap=6, baseline_tolerance=2, min_height=8):
+        """ROI 内颜色 color_name 的连通块合并成的文字行 [TextLine, ...] (坐标相对 ROI)，见 group_text_lines。"""
+        def compute():
+            return group_text_lines(self.color_blobs(roi_name, color_name, min_area),
+                                    max_gap, baseline_tolerance, min_height)
+        return self.memoize(('color_text_lines', roi_name, color_name, min_area,
+                             max_gap, baseline_tolerance, min_height), compute)
+
+    def ocr_roi_line(self, roi_name):
+        """对单行文字 ROI 做识别，返回 (text, confidence)。"""
+        def compute():
+            image = self.roi_image(roi_name)
+            if image is None:
+                return ("", 0.0)
+            return recognize_lines_batch([image])[0]
+        return self.memoize(('ocr_roi_line', roi_name), compute)
+
+    def ocr_lines(self, name, crops):
+        """
+        对一组单行截图块做批量识别，按 name 和截图块内容缓存结果 (同一帧内相同的请求只识别一次)。
+        """
+        crops = list(crops)
+        crop_keys = tuple(_crop_key(crop) for crop in crops)
+        return self.memoize(('ocr_lines', name, crop_keys), lambda: recognize_lines_batch(crops))
+
+    def stats(self):
+        """
+        返回 {名称: {'compute_ms', 'hits', 'saved_ms'}}，saved_ms 为命中次数 * 计算耗时。
+        """
+        with self._lock:
+            return {
+                name: {
+                    'compute_ms': seconds * 1000,
+                    'hits': hits,
+                    'saved_ms': seconds * hits * 1000,
+                }
+                for name, (seconds, hits) in self._memo_stats.items()
+            }
@@ -0,0 +1,264 @@
+# core/frame_source.py
+"""
+可替换的画面来源。
+
+常驻运行循环只通过 FrameSource.read(client_rect) 取帧：
+- LiveScreenSource: 实时截取屏幕 (mss，回退到 pyautogui)。
+- ImageDirectorySource: 按文件名顺序回放目录中的截图。
+- VideoFileSource: 逐帧回放录屏视频。
+- RawFrameDumpSource: 以内存映射方式回放原始 BGR 帧转储 (N 帧首尾相接的 height*width*3 字节)。
+- SharedRingSource: 读取另一个截图进程写入共享内存环形缓冲区的最新帧。
+
+回放来源的 realtime 为 False，main.py 的回放模式据此不再按固定频率等待，而是让 CPU 全速处理。
+"""
+import glob
+import os
+
+import cv2
+import numpy as np
+
+_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+_VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov')
+_RAW_EXTENSIONS = ('.raw', '.bgr')
+
+
+class FrameSource:
+    """
+    画面来源的基类。
+
+    read(client_rect) 返回下一帧 BGR 图像 (numpy.ndarray)，暂时取不到画面时返回 None；
+    exhausted 为 True 时表示回放结束，调用方应停止循环。
+    """
+
+    realtime = False
+
+    @property
+    def exhausted(self):
+        return False
+
+    def read(self, client_rect):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class LiveScreenSource(FrameSource):
+    """从屏幕上 client_rect 所在区域实时截图。"""
+
+    realtime = True
+
+    def __init__(self, backend=None):
+        # 延迟导入：回放模式在没有桌面环境的机器上也不需要 mss / pyautogui
+        from core.screen_capture import get_default_capture_backend
+        self.backend = backend or get_default_capture_backend()
+
+    def read(self, client_rect):
+        if client_rect is None:
+            return None
+        if self.backend.available:
+            return self.backend.grab(*client_rect)
+        from core.screen_capture import capture_screen_area
+        return capture_screen_area(*client_rect)
+
+    def close(self):
+        self.backend.close()
+
+
+class _ReplaySource(FrameSource):
+    """回放来源的公共部分：帧计数、循环播放和按客户端尺寸裁剪。"""
+
+    def __init__(self, loop=False, crop_to_client=True):
+        self.loop = loop
+        self.crop_to_client = crop_to_client
+        self.frames_read = 0
+        self._exhausted = False
+
+    @property
+    def exhausted(self):
+        return self._exhausted
+
+    def _next_frame(self):
+        raise NotImplementedError
+
+    def _rewind(self):
+        raise NotImplementedError
+
+    def read(self, client_rect):
+        if self._exhausted:
+            return None
+        frame = self._next_frame()
+        if frame is None and self.loop and self.frames_read:
+            self._rewind()
+            frame = self._next_frame()
+        if frame is None:
+            self._exhausted = True
+            return None
+        self.frames_read += 1
+        if self.crop_to_client and client_rect is not None:
+            width, height = client_rect[2], client_rect[3]
+            if frame.shape[1] > width or frame.shape[0] > height:
+                frame = frame[:height, :width]
+        return frame
+
+
+class ImageDirectorySource(_ReplaySource):
+    """按文件名顺序回放目录 (或文件列表) 中的截图，解码后的图像不缓存，每帧都重新读盘。"""
+
+    def __init__(self, path_or_paths, loop=False, crop_to_client=True):
+        super().__init__(loop, crop_to_client)
+        if isinstance(path_or_paths, str):
+            path_or_paths = [path_or_paths]
+        self.paths = []
+        for path in path_or_paths:
+            if os.path.isdir(path):
+                self.paths.extend(sorted(p for p in glob.glob(os.path.join(path, '*'))
+                                         if p.lower().endswith(_IMAGE_EXTENSIONS)))
+            else:
+                self.paths.append(path)
+        self._index = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _next_frame(self):
+        while self._index < len(self.paths):
+            path = self.paths[self._index]
+            self._index += 1
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is not None:
+                return frame
+        return None
+
+    def _rewind(self):
+        self._index = 0
+
+
+class VideoFileSource(_ReplaySource):
+    """用 cv2.VideoCapture 逐帧回放录屏视频，解码缓冲区在帧之间复用。"""
+
+    def __init__(self, path, loop=False, crop_to_client=True):
+        super().__init__(loop, crop_to_client)
+        self.path = path
+        self._capture = cv2.VideoCapture(path)
+        if not self._capture.isOpened():
+            raise ValueError(f"无法打开视频文件: {path}")
+        self._buffer = None
+
+    def _next_frame(self):
+        ok, frame = self._capture.read(self._buffer)
+        if not ok:
+            return None
+        self._buffer = frame
+        return frame
+
+    def _rewind(self):
+        self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def close(self):
+        self._capture.release()
+
+
+class RawFrameDumpSource(_ReplaySource):
+    """
+    回放原始 BGR 帧转储：文件内容是 N 帧首尾相接的 uint8 数组，每帧 height*width*3 字节。
+    文件以 numpy.memmap 只读映射，返回的每一帧都是映射的视图，不经过解码也不拷贝。
+    """
+
+    def __init__(self, path, width, height, loop=False, crop_to_client=True):
+        super().__init__(loop, crop_to_client)
+        self.path = path
+        frame_bytes = width * height * 3
+        file_size = os.path.getsize(path)
+        if file_size < frame_bytes:
+            raise ValueError(f"帧转储 {path} 小于一帧 ({width}x{height})")
+        frame_count = file_size // frame_bytes
+        self._frames = np.memmap(path, dtype=np.uint8, mode='r', shape=(frame_count, height, width, 3))
+        self._index = 0
+
+    def __len__(self):
+        return self._frames.shape[0]
+
+    def _next_frame(self):
+        if self._index >= self._frames.shape[0]:
+            return None
+        frame = self._frames[self._index]
+        self._index += 1
+        return frame
+
+    def _rewind(self):
+        self._index = 0
+
+    def close(self):
+        # 只释放引用；调用方仍持有的帧视图会让映射保持有效，直到它们也被释放
+        self._frames = self._frames[:0]
+        self._exhausted = True
+
+
+def write_raw_frame_dump(path, frames):
+    """把一组同尺寸的 BGR 帧写成 RawFrameDumpSource 可以回放的原始转储，返回写入的帧数。"""
+    count = 0
+    with open(path, 'wb') as f:
+        for frame in frames:
+            f.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+            count += 1
+    return count
+
+
+def open_frame_source(path, frame_size=None, loop=False):
+    """
+    根据路径选择回放来源：目录或图片 -> ImageDirectorySource，视频 -> VideoFileSource，
+    .raw / .bgr -> RawFrameDumpSource (需要 frame_size=(width, height))。
+    """
+    lower = path.lower()
+    if os.path.isdir(path) or lower.endswith(_IMAGE_EXTENSIONS):
+        return ImageDirectorySource(path, loop=loop)
+    if lower.endswith(_RAW_EXTENSIONS):
+        if frame_size is None:
+            raise ValueError("回放原始帧转储需要指定帧尺寸 (width, height)")
+        return RawFrameDumpSource(path, frame_size[0], frame_size[1], loop=loop)
+    if lower.endswith(_VIDEO_EXTENSIONS):
+        return VideoFileSource(path, loop=loop)
+    raise ValueError(f"无法识别的回放来源: {path}")
+
+
+class SharedRingSource(FrameSource):
+    """
+    从 core.screen_capture.FrameRingBuffer 读取截图进程发布的最新帧 (零拷贝)。
+
+    每次 read() 先释放上一次取得的槽位，再等待比它更新的帧 (最多 timeout 秒)；
+    返回的图像在下一次 read() 或 close() 之前有效。
+    """
+
+    realtime = True
+
+    def __init__(self, ring, timeout=1.0):
+        self.ring = ring
+        self.timeout = timeout
+        self.last_seq = None
+        self.skipped_frames = 0 # 读取方处理不过来而被跳过的帧数
+        self._current = None
+
+    def read(self, client_rect):
+        if self._current is not None:
+            self._current.release()
+            self._current = None
+        shared = self.ring.acquire_latest(after_seq=self.last_seq, timeout=self.timeout)
+        if shared is None:
+            return None
+        if self.last_seq is not None:
+            self.skipped_frames += shared.seq - self.last_seq - 1
+        self.last_seq = shared.seq
+        self._current = shared
+        return shared.image
+
+    def close(self):
+        if self._current is not None:
+            self._current.release()
+            self._current = None
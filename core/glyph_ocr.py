@@ -0,0 +1,258 @@
+# core/glyph_ocr.py
+"""
+游戏固定点阵字体的字形模板识别。
+
+任务追踪栏的文字 (任务类型、绿色 NPC 名字) 都用同一种固定尺寸的点阵字体渲染，
+因此不需要通用的深度 OCR 模型：先按列投影把单行截图切成单个字形，再把每个字形与
+字形图集 (由带标注的样本截图构建) 中的全部模板做一次矩阵乘法求归一化相关系数，
+取最高分的字符。整行的置信度是各字形得分的最小值，低于阈值时由调用方回退到 PaddleOCR。
+
+构建图集 (样本目录中每张图片是一行文字，文件名 (去掉扩展名和 "__" 之后的部分) 就是标注):
+
+    python -m core.glyph_ocr build samples/ assets/glyphs/atlas.npz
+"""
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+from core.image_matcher import to_gray
+from core.metrics import span
+
+# 识别时允许字形与模板之间错开的像素 (截图位置的亚像素抖动、二值化边缘差异)
+_SHIFTS = tuple((dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+_IMAGE_EXTENSIONS = ('.png', '.bmp', '.jpg', '.jpeg')
+
+
+def binarize(image):
+    """
+    把一行文字截图二值化为 0/1 掩码 (1 为文字像素)。
+    用 Otsu 阈值，取像素较少的一侧作为文字，亮字暗底和暗字亮底都能处理。
+    """
+    gray = to_gray(image)
+    _, mask = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if np.count_nonzero(mask) * 2 > mask.size:
+        mask = 1 - mask
+    return mask
+
+
+def _runs(flags):
+    """一维布尔数组中连续 True 区间的 [(start, end)] (end 不含)。"""
+    padded = np.concatenate(([0], flags.astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(padded))
+    return list(zip(edges[0::2], edges[1::2]))
+
+
+def trim_line(mask):
+    """去掉文字上下方的空白行，返回 (裁剪后的掩码, 顶部偏移)；没有文字像素时返回 (None, 0)。"""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None, 0
+    return mask[rows[0]:rows[-1] + 1], int(rows[0])
+
+
+def segment_glyphs(line_mask, max_glyph_width):
+    """
+    按列投影切分字形：先找出所有含文字像素的列区间，再从左到右贪心合并，
+    只要合并后的宽度不超过 max_glyph_width 就视为同一个字 (汉字的偏旁部首之间常有空列)。
+
+    返回:
+    - list: [(x0, x1)] 每个字形的列范围 (x1 不含)。
+    """
+    glyphs = []
+    for start, end in _runs(line_mask.any(axis=0)):
+        if glyphs and end - glyphs[-1][0] <= max_glyph_width:
+            glyphs[-1] = (glyphs[-1][0], end)
+        else:
+            glyphs.append((start, end))
+    return glyphs
+
+
+def _to_cell(line_mask, x0, x1, cell_height, cell_width):
+    # 字形顶端与行顶端对齐、水平居中放进固定尺寸的格子；构建图集和识别时使用同一种放置方式
+    glyph = line_mask[:cell_height, x0:x1]
+    if glyph.shape[1] > cell_width:
+        trim = (glyph.shape[1] - cell_width) // 2
+        glyph = glyph[:, trim:trim + cell_width]
+    cell = np.zeros((cell_height, cell_width), dtype=np.float32)
+    left = (cell_width - glyph.shape[1]) // 2
+    cell[:glyph.shape[0], left:left + glyph.shape[1]] = glyph
+    return cell
+
+
+def _normalize_rows(vectors):
+    # 零均值、单位长度：点积即为归一化相关系数；全空白的向量保持为 0 (与任何模板的得分都是 0)
+    vectors = vectors - vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class GlyphAtlas:
+    """
+    字形图集：固定格子尺寸 (cell_height x cell_width) 的二值字形模板及其字符。
+    同一个字符可以有多个模板 (例如来自不同样本)，识别时取得分最高的一个。
+    """
+
+    def __init__(self, cell_height, cell_width, chars=(), bitmaps=None):
+        self.cell_height = int(cell_height)
+        self.cell_width = int(cell_width)
+        self.chars = list(chars)
+        self.bitmaps = list(bitmaps) if bitmaps is not None else []
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.chars)
+
+    def add(self, char, cell):
+        self.chars.append(char)
+        self.bitmaps.append(np.asarray(cell, dtype=np.uint8))
+        self._matrix = None
+
+    @property
+    def matrix(self):
+        """(模板数, cell_height * cell_width) 的归一化模板矩阵。"""
+        if self._matrix is None:
+            flat = np.array(self.bitmaps, dtype=np.float32).reshape(len(self.bitmaps), -1)
+            self._matrix = _normalize_rows(flat)
+        return self._matrix
+
+    @classmethod
+    def from_samples(cls, samples, cell_height=None, cell_width=None):
+        """
+        由带标注的单行样本构建图集。
+
+        参数:
+        - samples: [(BGR 或灰度截图, 文字)]，文字中不含空格，字数必须与切分出的字形数一致。
+        - cell_height, cell_width (int, optional): 格子尺寸，默认取样本中最高的行高 / 最宽的字形。
+
+        返回:
+        - (GlyphAtlas, rejected): rejected 为切分出的字形数与标注字数不一致而被跳过的样本文字列表。
+        """
+        lines = []
+        rejected = []
+        for image, text in samples:
+            line_mask, _ = trim_line(binarize(image))
+            if line_mask is None:
+                rejected.append(text)
+                continue
+            # 汉字基本是方块字，样本切分时以行高 (略放宽) 作为最大字宽
+            glyphs = segment_glyphs(line_mask, int(round(line_mask.shape[0] * 1.1)))
+            if len(glyphs) != len(text):
+                rejected.append(text)
+                continue
+            lines.append((line_mask, glyphs, text))
+        if not lines:
+            raise ValueError("没有可用的字形样本")
+
+        cell_height = cell_height or max(mask.shape[0] for mask, _, _ in lines)
+        cell_width = cell_width or max(x1 - x0 for _, glyphs, _ in lines for x0, x1 in glyphs)
+        atlas = cls(cell_height, cell_width)
+        for line_mask, glyphs, text in lines:
+            for (x0, x1), char in zip(glyphs, text):
+                atlas.add(char, _to_cell(line_mask, x0, x1, cell_height, cell_width))
+        return atlas, rejected
+
+    def save(self, path):
+        np.savez_compressed(path, cell_size=np.array([self.cell_height, self.cell_width]),
+                            chars=np.array(self.chars), bitmaps=np.array(self.bitmaps, dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            cell_height, cell_width = (int(v) for v in data['cell_size'])
+            return cls(cell_height, cell_width, [str(c) for c in data['chars']], list(data['bitmaps']))
+
+
+class GlyphRecognizer:
+    """
+    基于 GlyphAtlas 的单行文字识别器。recognize_line() 返回 (文字, 置信度)，
+    置信度是各字形最高相关系数中的最小值；行高与图集不符或无法切分时置信度为 0。
+    """
+
+    def __init__(self, atlas, min_confidence=0.85, height_tolerance=2):
+        self.atlas = atlas
+        self.min_confidence = min_confidence
+        self.height_tolerance = height_tolerance
+
+    def _cells(self, line_mask, glyphs):
+        atlas = self.atlas
+        # 四周各补 1 像素，便于取出 _SHIFTS 中每种错位的格子
+        padded = np.pad(line_mask, 1)
+        cells = np.empty((len(_SHIFTS), len(glyphs), atlas.cell_height * atlas.cell_width), dtype=np.float32)
+        for shift_index, (dy, dx) in enumerate(_SHIFTS):
+            shifted = padded[1 + dy:, 1 + dx:]
+            for glyph_index, (x0, x1) in enumerate(glyphs):
+                cells[shift_index, glyph_index] = _to_cell(shifted, x0, x1, atlas.cell_height, atlas.cell_width).ravel()
+        return cells
+
+    @span('ocr.glyph_line')
+    def recognize_line(self, image):
+        atlas = self.atlas
+        if image is None or image.size == 0 or not len(atlas):
+            return ("", 0.0)
+        line_mask, _ = trim_line(binarize(image))
+        if line_mask is None or abs(line_mask.shape[0] - atlas.cell_height) > self.height_tolerance:
+            return ("", 0.0)
+        glyphs = segment_glyphs(line_mask, atlas.cell_width + 1)
+        if not glyphs:
+            return ("", 0.0)
+
+        cells = self._cells(line_mask, glyphs)
+        flat = _normalize_rows(cells.reshape(-1, cells.shape[2]))
+        # (错位数 * 字形数, 模板数) -> 每个字形在所有错位中对每个模板的最高分
+        scores = (flat @ atlas.matrix.T).reshape(len(_SHIFTS), len(glyphs), -1).max(axis=0)
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(glyphs)), best]
+        text = "".join(atlas.chars[index] for index in best)
+        return (text, float(best_scores.min()))
+
+    def recognize_lines(self, crops):
+        return [self.recognize_line(crop) for crop in crops]
+
+
+def load_glyph_recognizer(atlas_path, min_confidence=0.85):
+    """从图集文件创建 GlyphRecognizer；文件不存在时返回 None。"""
+    if not atlas_path or not os.path.isfile(atlas_path):
+        return None
+    return GlyphRecognizer(GlyphAtlas.load(atlas_path), min_confidence)
+
+
+def _label_from_filename(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem.split('__', 1)[0]
+
+
+def build_atlas_from_directory(samples_dir):
+    samples = []
+    for name in sorted(os.listdir(samples_dir)):
+        if not name.lower().endswith(_IMAGE_EXTENSIONS):
+            continue
+        path = os.path.join(samples_dir, name)
+        # cv2.imread 不支持非 ASCII 路径 (Windows)，样本文件名就是中文标注，所以用 imdecode
+        image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is not None:
+            samples.append((image, _label_from_filename(path)))
+    return GlyphAtlas.from_samples(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="点阵字体字形图集工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="由样本目录构建字形图集")
+    build.add_argument('samples_dir')
+    build.add_argument('output')
+    args = parser.parse_args(argv)
+
+    atlas, rejected = build_atlas_from_directory(args.samples_dir)
+    atlas.save(args.output)
+    print(f"字形图集已写入 {args.output}: {len(atlas)} 个模板, {len(set(atlas.chars))} 个字符, "
+          f"格子 {atlas.cell_width}x{atlas.cell_height}")
+    for text in rejected:
+        print(f"警告：样本 '{text}' 切分出的字形数与标注不一致，已跳过。")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,15 +1,286 @@
 import cv2
 import numpy as np
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def find_template_in_image(main_image_bgr, template_image_path, threshold=0.8):
+from core.metrics import span
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TEMPLATE_DIR = os.path.join(_PROJECT_ROOT, 'assets', 'templates')
+_TEMPLATE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class PreparedTemplate:
+    """
+    已加载到内存中的模板，保存匹配时直接可用的灰度图和可选的掩码。
+
+    属性:
+    - key (str): 模板在注册表中的键 (相对 assets/templates 的路径，不含扩展名，例如 "task_tracker_header")。
+    - path (str): 模板文件的绝对路径。
+    - gray (numpy.ndarray): 灰度模板。
+    - mask (numpy.ndarray or None): 由 PNG 透明通道生成的掩码 (非零表示参与匹配)，没有透明通道时为 None。
+    - width, height (int): 模板尺寸。
+    - mtime (float): 加载时文件的修改时间，用于判断是否需要重新加载。
+    """
+    __slots__ = ('key', 'path', 'gray', 'mask', 'width', 'height', 'mtime', 'scale', '_last_checked', '_scaled', '_base')
+
+    def __init__(self, key, path, gray, mask, mtime, scale=1.0):
+        self.key = key
+        self.path = path
+        self.gray = gray
+        self.mask = mask
+        self.height, self.width = gray.shape[:2]
+        self.mtime = mtime
+        self.scale = scale
+        self._last_checked = time.monotonic()
+        self._scaled = {}
+        self._base = None # 缩放得到的模板指向原始模板
+
+    def __repr__(self):
+        return f"PreparedTemplate(key={self.key!r}, size={self.width}x{self.height}, masked={self.mask is not None})"
+
+    def scaled(self, scale):
+        """
+        返回相对原始模板按 scale 缩放后的模板 (结果会被缓存，同一缩放比例只计算一次)。
+
+        返回:
+        - PreparedTemplate: 缩放后的模板，scale 为 1.0 时返回原始模板。
+        - None: 缩放后尺寸小于 1 像素。
+        """
+        base = self._base or self
+        if scale == 1.0:
+            return base
+        cached = base._scaled.get(scale)
+        if cached is not None:
+            return cached
+
+        width = int(round(base.width * scale))
+        height = int(round(base.height * scale))
+        if width < 1 or height < 1:
+            return None
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+        gray = cv2.resize(base.gray, (width, height), interpolation=interpolation)
+        mask = None
+        if base.mask is not None:
+            mask = cv2.resize(base.mask, (width, height), interpolation=cv2.INTER_NEAREST)
+        scaled = PreparedTemplate(base.key, base.path, gray, mask, base.mtime, scale)
+        scaled._base = base
+        base._scaled[scale] = scaled
+        return scaled
+
+
+def load_template(template_path, key=None):
+    """
+    从磁盘读取模板并预处理为灰度图 (以及可选的掩码)。
+
+    参数:
+    - template_path (str): 模板图片的完整路径。
+    - key (str, optional): 模板键，默认使用不含扩展名的文件名。
+
+    返回:
+    - PreparedTemplate: 预处理后的模板。
+    - None: 如果文件不存在或无法读取。
+    """
+    try:
+        mtime = os.path.getmtime(template_path)
+    except OSError:
+        return None
+
+    template_raw = cv2.imread(template_path, cv2.IMREAD_UNCHANGED)
+    if template_raw is None:
+        return None
+
+    mask = None
+    if template_raw.ndim == 2:
+        template_gray = template_raw
+    elif template_raw.shape[2] == 4:
+        template_gray = cv2.cvtColor(template_raw, cv2.COLOR_BGRA2GRAY)
+        alpha = template_raw[:, :, 3]
+        if alpha.min() < 255: # 只有真正存在透明像素时才启用掩码匹配
+            mask = np.where(alpha > 0, 255, 0).astype(np.uint8)
+    else:
+        template_gray = cv2.cvtColor(template_raw, cv2.COLOR_BGR2GRAY)
+
+    if key is None:
+        key = os.path.splitext(os.path.basename(template_path))[0]
+    return PreparedTemplate(key, os.path.abspath(template_path), template_gray, mask, mtime)
+
+
+class TemplateRegistry:
+    """
+    模板注册表：一次性加载模板目录下的所有模板，并缓存在内存中。
+
+    通过 get() 取模板时会按 mtime_check_interval 的间隔检查文件修改时间，
+    模板文件被编辑后会自动重新加载。
+    """
+
+    def __init__(self, template_dir=DEFAULT_TEMPLATE_DIR, mtime_check_interval=1.0):
+        self.template_dir = os.path.abspath(template_dir)
+        self.mtime_check_interval = mtime_check_interval
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def _key_for_path(self, template_path):
+        abs_path = os.path.abspath(template_path)
+        rel_path = os.path.relpath(abs_path, self.template_dir)
+        if rel_path.startswith('..') or os.path.isabs(rel_path):
+            return abs_path # 模板目录之外的文件直接用绝对路径作为键
+        return os.path.splitext(rel_path)[0].replace(os.sep, '/')
+
+    def load_all(self):
+        """
+        扫描模板目录并加载全部模板。
+
+        返回:
+        - int: 成功加载的模板数量。
+        """
+        loaded = 0
+        if not os.path.isdir(self.template_dir):
+            return loaded
+
+        for dir_path, _, file_names in os.walk(self.template_dir):
+            for file_name in sorted(file_names):
+                if not file_name.lower().endswith(_TEMPLATE_EXTENSIONS):
+                    continue
+                file_path = os.path.join(dir_path, file_name)
+                key = self._key_for_path(file_path)
+                template = load_template(file_path, key)
+                if template is not None:
+                    with self._lock:
+                        self._templates[key] = template
+                    loaded += 1
+        return loaded
+
+    def keys(self):
+        with self._lock:
+            return list(self._templates.keys())
+
+    def _refresh_if_stale(self, template):
+        now = time.monotonic()
+        if now - template._last_checked < self.mtime_check_interval:
+            return template
+        template._last_checked = now
+
+        try:
+            mtime = os.path.getmtime(template.path)
+        except OSError:
+            return template # 文件暂时不可访问 (例如正在被编辑器保存)，继续使用内存中的版本
+        if mtime == template.mtime:
+            return template
+
+        reloaded = load_template(template.path, template.key)
+        if reloaded is None:
+            return template
+        with self._lock:
+            self._templates[template.key] = reloaded
+        return reloaded
+
+    def get(self, key_or_path):
+        """
+        按模板键或文件路径取得模板。
+
+        参数:
+        - key_or_path (str): 模板键 (例如 "task_tracker_header")，或模板文件的路径 (绝对路径或相对项目根目录)。
+
+        返回:
+        - PreparedTemplate: 对应的模板。
+        - None: 如果找不到或无法加载。
+        """
+        with self._lock:
+            template = self._templates.get(key_or_path)
+        if template is not None:
+            return self._refresh_if_stale(template)
+
+        # 不是已知的键，尝试当作路径解析
+        template_path = key_or_path
+        if not os.path.isabs(template_path):
+            template_path = os.path.join(_PROJECT_ROOT, template_path)
+        if not os.path.isfile(template_path):
+            return None
+
+        key = self._key_for_path(template_path)
+        with self._lock:
+            template = self._templates.get(key)
+        if template is not None:
+            return self._refresh_if_stale(template)
+
+        template = load_template(template_path, key)
+        if template is not None:
+            with self._lock:
+                self._templates[key] = template
+        return template
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+def get_default_template_registry():
+    """返回模块级共享的 TemplateRegistry (首次调用时加载 assets/templates 下的全部模板)。"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            registry = TemplateRegistry()
+            registry.load_all()
+            _default_registry = registry
+    return _default_registry
+
+
+def resolve_template(template, registry=None):
+    """
+    把模板参数统一解析为 PreparedTemplate。
+
+    参数:
+    - template (PreparedTemplate or str): 已准备好的模板对象、模板键或模板文件路径。
+    - registry (TemplateRegistry, optional): 使用的注册表，默认使用模块级共享注册表。
+
+    返回:
+    - PreparedTemplate 或 None。
+    """
+    if isinstance(template, PreparedTemplate):
+        return template
+    if not isinstance(template, str):
+        return None
+    if registry is None:
+        registry = get_default_template_registry()
+    return registry.get(template)
+
+
+def to_gray(image):
+    """把 BGR / BGRA 图像转换为灰度图；已经是灰度图时原样返回。"""
+    if image is None:
+        return None
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _match_score_map(main_gray, template):
+    # 执行模板匹配
+    # TM_CCOEFF_NORMED 方法效果较好，结果范围 [-1, 1] 或 [0, 1] (取决于OpenCV版本和具体实现细节，通常是归一化的)
+    # 对于灰度图，其值在匹配良好时接近1
+    if template.mask is None:
+        return cv2.matchTemplate(main_gray, template.gray, cv2.TM_CCOEFF_NORMED)
+
+    result = cv2.matchTemplate(main_gray, template.gray, cv2.TM_CCOEFF_NORMED, mask=template.mask)
+    # 带掩码时，纯色区域会产生 inf / nan，统一视为不匹配
+    return np.nan_to_num(result, copy=False, nan=-1.0, posinf=-1.0, neginf=-1.0)
+
+
+@span('match.template')
+def find_template_in_image(main_image_bgr, template_image_path, threshold=0.8, registry=None):
     """
     在给定的主图像 (BGR格式) 中查找模板图片。
 
     参数:
     - main_image_bgr (numpy.ndarray): BGR格式的主图像数据，我们将在其中搜索。
-    - template_image_path (str): 模板图片的完整路径。
+                                      也可以直接传入已转换好的灰度图，避免重复转换。
+    - template_image_path (PreparedTemplate or str): 模板对象、模板键，或模板图片的路径。
     - threshold (float): 匹配的置信度阈值 (0.0 到 1.0)。
+    - registry (TemplateRegistry, optional): 解析模板键/路径时使用的注册表。
 
     返回:
     - tuple: 如果找到，返回 (x, y, w, h, confidence)，其中 (x,y) 是模板在主图像中
@@ -20,38 +291,344 @@ def find_template_in_image(main_image_bgr, template_image_path, threshold=0.8):
         # print("错误 (find_template_in_image): 主图像数据为空。") # 遵循原则，暂时不打印
         return None
 
-    if not os.path.exists(template_image_path):
+    template = resolve_template(template_image_path, registry)
+    if template is None:
         # print(f"错误 (find_template_in_image): 模板图片未找到: {template_image_path}") # 暂时不打印
         return None
 
     try:
-        template_bgr = cv2.imread(template_image_path) # 读取彩色模板
-        if template_bgr is None:
-            # print(f"错误 (find_template_in_image): 无法读取模板图片: {template_image_path}") # 暂时不打印
-            return None
-
         # 转换为灰度图进行匹配，通常更稳定且对颜色变化不那么敏感
-        main_gray = cv2.cvtColor(main_image_bgr, cv2.COLOR_BGR2GRAY)
-        template_gray = cv2.cvtColor(template_bgr, cv2.COLOR_BGR2GRAY)
-
-        template_h, template_w = template_gray.shape[:2]
+        main_gray = to_gray(main_image_bgr)
+        if main_gray.shape[0] < template.height or main_gray.shape[1] < template.width:
+            return None
 
-        # 执行模板匹配
-        # TM_CCOEFF_NORMED 方法效果较好，结果范围 [-1, 1] 或 [0, 1] (取决于OpenCV版本和具体实现细节，通常是归一化的)
-        # 对于灰度图，其值在匹配良好时接近1
-        result = cv2.matchTemplate(main_gray, template_gray, cv2.TM_CCOEFF_NORMED)
+        result = _match_score_map(main_gray, template)
 
         # 获取最佳匹配的位置和相似度
         min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
 
         if max_val >= threshold:
             match_x, match_y = max_loc # 左上角坐标
-            # print(f"模板 '{os.path.basename(template_image_path)}' 找到，位置: ({match_x}, {match_y}), 置信度: {max_val:.4f}") # 暂时不打印
-            return (match_x, match_y, template_w, template_h, max_val)
+            # print(f"模板 '{template.key}' 找到，位置: ({match_x}, {match_y}), 置信度: {max_val:.4f}") # 暂时不打印
+            return (match_x, match_y, template.width, template.height, max_val)
         else:
-            # print(f"模板 '{os.path.basename(template_image_path)}' 未达到阈值 {threshold} (最高匹配度: {max_val:.4f})") # 暂时不打印
+            # print(f"模板 '{template.key}' 未达到阈值 {threshold} (最高匹配度: {max_val:.4f})") # 暂时不打印
             return None
 
     except Exception: # 捕获所有可能的OpenCV或其他异常
         # print(f"错误 (find_template_in_image): 模板匹配过程中发生错误 - {e}") # 暂时不打印
-        return None
\ No newline at end of file
+        return None
+
+
+def _top_k_peaks(score_map, k, suppress_w, suppress_h):
+    # 逐个取最大值，并把其邻域置为 -1 (非极大值抑制)，避免 top-k 都落在同一个峰附近
+    scores = score_map.copy()
+    peaks = []
+    for _ in range(k):
+        _, max_val, _, max_loc = cv2.minMaxLoc(scores)
+        if max_val <= -1.0:
+            break
+        peaks.append(max_loc)
+        px, py = max_loc
+        scores[max(0, py - suppress_h):py + suppress_h + 1, max(0, px - suppress_w):px + suppress_w + 1] = -1.0
+    return peaks
+
+
+def _pyramid_match_single_scale(main_gray, coarse_gray, factor, template, top_k):
+    frame_h, frame_w = main_gray.shape[:2]
+    if frame_h < template.height or frame_w < template.width:
+        return None
+
+    coarse_template = template.scaled(template.scale / factor) if factor > 1 else template
+    if coarse_template is None or coarse_template.width < 4 or coarse_template.height < 4 \
+            or coarse_gray.shape[0] < coarse_template.height or coarse_gray.shape[1] < coarse_template.width:
+        # 模板缩得太小，粗匹配已经没有意义，直接在原分辨率下匹配
+        result = _match_score_map(main_gray, template)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return (max_loc[0], max_loc[1], template.width, template.height, max_val)
+
+    coarse_result = _match_score_map(coarse_gray, coarse_template)
+    peaks = _top_k_peaks(coarse_result, top_k, max(1, coarse_template.width // 2), max(1, coarse_template.height // 2))
+
+    best = None
+    margin = factor + 1 # 粗匹配坐标乘回原分辨率后的量化误差
+    for coarse_x, coarse_y in peaks:
+        x0 = max(0, coarse_x * factor - margin)
+        y0 = max(0, coarse_y * factor - margin)
+        x1 = min(frame_w, coarse_x * factor + template.width + margin)
+        y1 = min(frame_h, coarse_y * factor + template.height + margin)
+        if x1 - x0 < template.width or y1 - y0 < template.height:
+            continue
+        result = _match_score_map(main_gray[y0:y1, x0:x1], template)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if best is None or max_val > best[4]:
+            best = (x0 + max_loc[0], y0 + max_loc[1], template.width, template.height, max_val)
+    return best
+
+
+@span('match.pyramid')
+def find_template_pyramid(main_image_bgr, template_image_path, threshold=0.8,
+                          pyramid_levels=1, top_k=3, scales=(1.0,), registry=None):
+    """
+    由粗到精的金字塔模板匹配，可选多尺度搜索。
+
+    先在 1/2**pyramid_levels 分辨率下做粗匹配，取置信度最高的 top_k 个候选位置，
+    再只在这些候选位置附近的小窗口内做全分辨率匹配。scales 中的每个比例都会对模板缩放后
+    重复上述过程，用于游戏客户端分辨率与配置的 1366x768 不完全一致的情况。
+
+    参数:
+    - main_image_bgr (numpy.ndarray): BGR 主图像或已转换好的灰度图。
+    - template_image_path (PreparedTemplate or str): 模板对象、模板键或模板路径。
+    - threshold (float): 匹配置信度阈值。
+    - pyramid_levels (int): 金字塔层数，1 表示 1/2 分辨率粗匹配，2 表示 1/4；0 等同于单尺度全分辨率匹配。
+    - top_k (int): 粗匹配后送去精匹配的候选数量。
+    - scales (iterable of float): 要尝试的模板缩放比例。
+
+    返回:
+    - tuple: (x, y, w, h, confidence)，(w,h) 为命中尺度下的模板尺寸。
+    - None: 如果未找到、模板无法加载或发生其他错误。
+    """
+    if main_image_bgr is None:
+        return None
+    template = resolve_template(template_image_path, registry)
+    if template is None:
+        return None
+
+    try:
+        match, _ = _pyramid_search(to_gray(main_image_bgr), template, threshold, pyramid_levels, top_k, scales)
+        return match
+    except Exception: # 捕获所有可能的OpenCV或其他异常
+        return None
+
+
+def _pyramid_search(main_gray, template, threshold, pyramid_levels, top_k, scales):
+    # 返回 (match, scale)，scale 为命中的模板缩放比例
+    factor = 2 ** max(0, int(pyramid_levels))
+    coarse_gray = main_gray
+    if factor > 1:
+        coarse_gray = cv2.resize(main_gray, (main_gray.shape[1] // factor, main_gray.shape[0] // factor),
+                                 interpolation=cv2.INTER_AREA)
+
+    best, best_scale = None, None
+    for scale in scales:
+        scaled_template = template.scaled(float(scale))
+        if scaled_template is None:
+            continue
+        match = _pyramid_match_single_scale(main_gray, coarse_gray, factor, scaled_template, top_k)
+        if match is not None and (best is None or match[4] > best[4]):
+            best, best_scale = match, float(scale)
+
+    if best is not None and best[4] >= threshold:
+        return best, best_scale
+    return None, None
+
+_match_executor = None
+_match_executor_lock = threading.Lock()
+
+def _get_match_executor():
+    # 模块级共享线程池；cv2.matchTemplate 在计算时会释放 GIL，多个模板可以真正并行
+    global _match_executor
+    with _match_executor_lock:
+        if _match_executor is None:
+            _match_executor = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1),
+                                                 thread_name_prefix='template-match')
+    return _match_executor
+
+
+def _match_in_region(main_gray, template, threshold, region):
+    if region is None:
+        return find_template_in_image(main_gray, template, threshold)
+
+    region_x, region_y, region_w, region_h = region
+    frame_h, frame_w = main_gray.shape[:2]
+    x0, y0 = max(0, region_x), max(0, region_y)
+    x1, y1 = min(frame_w, region_x + region_w), min(frame_h, region_y + region_h)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    match = find_template_in_image(main_gray[y0:y1, x0:x1], template, threshold)
+    if match is None:
+        return None
+    return (x0 + match[0], y0 + match[1]) + match[2:]
+
+
+@span('match.batch')
+def find_templates(main_image_bgr, templates, threshold=0.8, regions=None, parallel=True, registry=None):
+    """
+    在同一帧中一次性查找多个模板。
+
+    整帧只转换一次灰度图，所有模板共享；各模板的 matchTemplate 相互独立，可以在线程池中并行执行。
+
+    参数:
+    - main_image_bgr (numpy.ndarray): BGR 主图像或已转换好的灰度图。
+    - templates (iterable): 模板键、模板路径或 PreparedTemplate 的列表。
+    - threshold (float or dict): 统一的置信度阈值，或 {模板键: 阈值} 字典 (未列出的模板使用 0.8)。
+    - regions (dict, optional): {模板键: (x, y, w, h)}，限定该模板的搜索区域 (主图像坐标)。
+    - parallel (bool): 是否使用线程池并行匹配。
+    - registry (TemplateRegistry, optional): 解析模板键/路径时使用的注册表。
+
+    返回:
+    - dict: {模板键: (x, y, w, h, confidence) 或 None}。坐标均相对于整个主图像。
+            传入 PreparedTemplate 时以其 key 作为字典键。
+    """
+    if main_image_bgr is None:
+        return {}
+
+    jobs = []
+    results = {}
+    for template in templates:
+        result_key = template.key if isinstance(template, PreparedTemplate) else template
+        prepared = resolve_template(template, registry)
+        results[result_key] = None
+        if prepared is None:
+            continue
+        if isinstance(threshold, dict):
+            template_threshold = threshold.get(result_key, threshold.get(prepared.key, 0.8))
+        else:
+            template_threshold = threshold
+        region = None
+        if regions:
+            region = regions.get(result_key, regions.get(prepared.key))
+        jobs.append((result_key, prepared, template_threshold, region))
+
+    if not jobs:
+        return results
+
+    try:
+        main_gray = to_gray(main_image_bgr)
+    except Exception:
+        return results
+
+    if parallel and len(jobs) > 1:
+        executor = _get_match_executor()
+        futures = [(key, executor.submit(_match_in_region, main_gray, prepared, job_threshold, region))
+                   for key, prepared, job_threshold, region in jobs]
+        for key, future in futures:
+            try:
+                results[key] = future.result()
+            except Exception:
+                results[key] = None
+    else:
+        for key, prepared, job_threshold, region in jobs:
+            results[key] = _match_in_region(main_gray, prepared, job_threshold, region)
+    return results
+
+
+class TemplateTracker:
+    """
+    带时间连续性的模板匹配器。
+
+    记住每个模板上一次的匹配位置，下一次先只在该位置周围 search_padding 像素的小窗口内搜索；
+    只有小窗口内的置信度低于阈值时，才回退到整帧搜索。适合位置几乎不变的 UI 面板 (例如任务追踪栏)。
+
+    pyramid_levels > 0 或 scales 不止 (1.0,) 时，整帧搜索使用 find_template_pyramid，
+    并记住命中时的缩放比例，局部搜索直接使用该比例的模板。
+    """
+
+    def __init__(self, search_padding=24, registry=None, pyramid_levels=0, top_k=3, scales=(1.0,)):
+        self.search_padding = search_padding
+        self.registry = registry
+        self.pyramid_levels = pyramid_levels
+        self.top_k = top_k
+        self.scales = tuple(scales)
+        self._last_matches = {} # 模板键 -> (x, y, w, h, scale)
+        self._lock = threading.Lock()
+        self.local_hits = 0     # 在上次位置附近直接命中的次数
+        self.local_misses = 0   # 局部搜索失败、需要整帧搜索的次数
+        self.full_searches = 0  # 整帧搜索次数 (包括首次搜索)
+        self.full_misses = 0    # 整帧搜索也没找到的次数
+
+    def _search_near_last(self, main_gray, template, last_match, threshold):
+        last_x, last_y = last_match[0], last_match[1]
+        pad = self.search_padding
+        frame_h, frame_w = main_gray.shape[:2]
+        x0 = max(0, last_x - pad)
+        y0 = max(0, last_y - pad)
+        x1 = min(frame_w, last_x + template.width + pad)
+        y1 = min(frame_h, last_y + template.height + pad)
+        if x1 - x0 < template.width or y1 - y0 < template.height:
+            return None
+
+        result = _match_score_map(main_gray[y0:y1, x0:x1], template)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val < threshold:
+            return None
+        return (x0 + max_loc[0], y0 + max_loc[1], template.width, template.height, max_val)
+
+    @span('match.tracker')
+    def find(self, main_image_bgr, template, threshold=0.8):
+        """
+        查找模板，优先在上一次匹配位置附近搜索。
+
+        参数:
+        - main_image_bgr (numpy.ndarray): BGR 主图像或已转换好的灰度图。
+        - template (PreparedTemplate or str): 模板对象、模板键或模板路径。
+        - threshold (float): 匹配置信度阈值，局部搜索低于该值时回退到整帧搜索。
+
+        返回:
+        - tuple: (x, y, w, h, confidence)，与 find_template_in_image 相同。
+        - None: 如果整帧搜索也未找到。
+        """
+        if main_image_bgr is None:
+            return None
+        prepared = resolve_template(template, self.registry)
+        if prepared is None:
+            return None
+
+        try:
+            main_gray = to_gray(main_image_bgr)
+        except Exception:
+            return None
+
+        with self._lock:
+            last_match = self._last_matches.get(prepared.key)
+
+        if last_match is not None:
+            last_scale = last_match[4]
+            try:
+                match = self._search_near_last(main_gray, prepared.scaled(last_scale), last_match, threshold)
+            except Exception:
+                match = None
+            with self._lock:
+                if match is not None:
+                    self.local_hits += 1
+                    self._last_matches[prepared.key] = match[:4] + (last_scale,)
+                    return match
+                self.local_misses += 1
+
+        match_scale = 1.0
+        if self.pyramid_levels > 0 or self.scales != (1.0,):
+            try:
+                match, match_scale = _pyramid_search(main_gray, prepared, threshold,
+                                                     self.pyramid_levels, self.top_k, self.scales)
+            except Exception:
+                match = None
+        else:
+            match = find_template_in_image(main_gray, prepared, threshold)
+        with self._lock:
+            self.full_searches += 1
+            if match is not None:
+                self._last_matches[prepared.key] = match[:4] + (float(match_scale),)
+            else:
+                self.full_misses += 1
+                self._last_matches.pop(prepared.key, None)
+        return match
+
+    def reset(self, template_key=None):
+        """清除某个模板 (或全部模板) 记住的位置，下一次将重新整帧搜索。"""
+        with self._lock:
+            if template_key is None:
+                self._last_matches.clear()
+            else:
+                self._last_matches.pop(template_key, None)
+
+    def stats(self):
+        """返回命中/未命中计数的快照字典。"""
+        with self._lock:
+            lookups = self.local_hits + self.full_searches
+            return {
+                'local_hits': self.local_hits,
+                'local_misses': self.local_misses,
+                'full_searches': self.full_searches,
+                'full_misses': self.full_misses,
+                'local_hit_rate': (self.local_hits / lookups) if lookups else 0.0,
+            }
@@ -1,10 +1,33 @@
-import pyautogui
+try:
+    import pyautogui # 没有桌面环境时不可用；回放模式使用 RecordingInput 代替本模块
+except ImportError:
+    pyautogui = None
+import heapq
+import itertools
+import logging
+import sys
+import threading
 import time # 用于可能的延时
 
+from core.metrics import span, get_registry
+
+logger = logging.getLogger(__name__)
+
+# pyautogui 不可用时为空元组，使下面的 except FailSafeException 子句不会再引发 AttributeError
+FailSafeException = getattr(pyautogui, 'FailSafeException', ())
+
+
+def _require_pyautogui():
+    """没有 pyautogui 时直接报错，而不是在各函数里静默失败。"""
+    if pyautogui is None:
+        raise RuntimeError("pyautogui 不可用 (未安装或没有桌面环境)，无法模拟键鼠操作；"
+                           "无界面运行请使用 RecordingInput")
+
 # pyautogui 的一些全局设置，可以根据需要调整
 # pyautogui.PAUSE = 0.05  # 在每次pyautogui函数调用后自动暂停的秒数，有助于操作更稳定
 # pyautogui.FAILSAFE = True # 将鼠标移到屏幕左上角会触发FailSafeException，终止脚本
 
+@span('input.click')
 def click_screen_coords(screen_x, screen_y, button='left', clicks=1, interval=0.1, duration=0.1):
     """
     在屏幕的指定绝对坐标处模拟鼠标点击。
@@ -18,6 +41,7 @@ def click_screen_coords(screen_x, screen_y, button='left', clicks=1, interval=0.
     - duration (float): 鼠标移动到目标位置并完成点击的总耗时（近似值）。
                        较小的值意味着更快的点击。
     """
+    _require_pyautogui()
     try:
         # 先将鼠标移动到目标位置，然后点击
         # duration 控制移动速度，可以设为0实现瞬移后点击
@@ -25,7 +49,7 @@ def click_screen_coords(screen_x, screen_y, button='left', clicks=1, interval=0.
         pyautogui.click(x=screen_x, y=screen_y, 
                         clicks=clicks, interval=interval, 
                         button=button, duration=duration / 2 if clicks == 1 else 0.05) # duration用于单次点击的按下释放过程
-    except pyautogui.FailSafeException:
+    except FailSafeException:
         # print("FailSafe triggered: 鼠标移动到屏幕左上角，脚本终止。") # 暂时不打印
         raise # 重新抛出异常，让调用者知道发生了什么
     except Exception: # 捕获其他可能的pyautogui错误
@@ -33,6 +57,7 @@ def click_screen_coords(screen_x, screen_y, button='left', clicks=1, interval=0.
         pass # 根据你的原则，暂时不处理，让它静默失败或由调用者处理
 
 
+@span('input.press_key')
 def press_key(key_name_or_list, presses=1, interval=0.1):
     """
     模拟按下并释放一个或多个按键。
@@ -45,6 +70,7 @@ def press_key(key_name_or_list, presses=1, interval=0.1):
     - presses (int): 按键次数。
     - interval (float): 多次按键之间的间隔秒数。
     """
+    _require_pyautogui()
     try:
         if isinstance(key_name_or_list, list):
             # 如果是列表，pyautogui.press会依次按下它们
@@ -60,6 +86,7 @@ def press_key(key_name_or_list, presses=1, interval=0.1):
         pass
 
 
+@span('input.hotkey')
 def press_hotkey(*args):
     """
     模拟按下组合键 (例如 Ctrl+C, Alt+Tab)。
@@ -68,6 +95,7 @@ def press_hotkey(*args):
     参数:
     - *args: 任意数量的按键名称字符串，例如 press_hotkey('ctrl', 'alt', 'delete')。
     """
+    _require_pyautogui()
     try:
         pyautogui.hotkey(*args)
     except Exception:
@@ -75,11 +103,13 @@ def press_hotkey(*args):
         pass
 
 # (可选) 其他鼠标操作函数
+@span('input.move')
 def move_to_screen_coords(screen_x, screen_y, duration=0.25):
     """模拟鼠标移动到屏幕指定坐标。"""
+    _require_pyautogui()
     try:
         pyautogui.moveTo(screen_x, screen_y, duration=duration)
-    except pyautogui.FailSafeException:
+    except FailSafeException:
         raise
     except Exception:
         pass
@@ -91,4 +121,300 @@ def move_to_screen_coords(screen_x, screen_y, duration=0.25):
 #     except pyautogui.FailSafeException:
 #         raise
 #     except Exception:
-#         pass
\ No newline at end of file
+#         pass
+
+
+class RecordingInput:
+    """
+    与本模块接口相同的输入替身：不操作键鼠，只按顺序记录每次调用 (名称, 参数, 关键字参数, 时间戳)。
+    用于无界面回放和基准测试，事后可以检查处理器在什么时候点了哪里。
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.actions = []
+        self._clock = clock
+
+    def _record(self, name, args, kwargs):
+        self.actions.append((name, args, kwargs, self._clock()))
+
+    def click_screen_coords(self, *args, **kwargs):
+        self._record('click_screen_coords', args, kwargs)
+
+    def press_key(self, *args, **kwargs):
+        self._record('press_key', args, kwargs)
+
+    def press_hotkey(self, *args):
+        self._record('press_hotkey', args, {})
+
+    def move_to_screen_coords(self, *args, **kwargs):
+        self._record('move_to_screen_coords', args, kwargs)
+
+    def clear(self):
+        self.actions.clear()
+
+
+# InputAction.status 的取值
+ACTION_PENDING = 'pending'
+ACTION_DONE = 'done'
+ACTION_FAILED = 'failed'
+ACTION_COALESCED = 'coalesced' # 被之后的移动/点击取代
+ACTION_EXPIRED = 'expired'     # 超过 deadline 仍未执行
+ACTION_STALE = 'stale'         # 触发它的帧已被后续帧取代
+ACTION_CANCELLED = 'cancelled'
+
+
+class InputAction:
+    """
+    InputExecutor 队列中的一个键鼠操作。
+
+    - name: input_simulator 中的函数名，例如 'click_screen_coords'。
+    - priority: 数值越大越先执行；相同优先级按入队顺序执行。
+    - deadline: time.perf_counter() 时间点，过了这个时间还没开始执行就丢弃 (None 表示不限)。
+    - frame_seq: 触发该操作的帧序号，用于丢弃过时的操作 (None 表示不参与过时判断)。
+    wait() 阻塞到操作执行完或被丢弃，返回最终的 status。
+    """
+
+    __slots__ = ('name', 'args', 'kwargs', 'priority', 'deadline', 'frame_seq', 'enqueued_at',
+                 'status', 'error', '_done')
+
+    def __init__(self, name, args=(), kwargs=None, priority=0, deadline=None, frame_seq=None):
+        self.name = name
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.priority = priority
+        self.deadline = deadline
+        self.frame_seq = frame_seq
+        self.enqueued_at = None
+        self.status = ACTION_PENDING
+        self.error = None
+        self._done = threading.Event()
+
+    def __repr__(self):
+        return f"InputAction({self.name}{self.args}, priority={self.priority}, status={self.status})"
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.status
+
+
+# 会移动鼠标的操作：新的这类操作入队时，队列里尚未执行的单纯移动都被合并掉
+_POINTER_ACTIONS = ('move_to_screen_coords', 'click_screen_coords')
+# 零动画模式下覆盖的耗时参数
+_ZERO_ANIMATION_KWARGS = {
+    'click_screen_coords': {'duration': 0, 'interval': 0.02},
+    'move_to_screen_coords': {'duration': 0},
+    'press_key': {'interval': 0.02},
+}
+
+
+class InputExecutor:
+    """
+    非阻塞的键鼠操作执行器：调用方 (任务处理器) 只把操作放进队列就立即返回，
+    由后台线程按 优先级 -> 入队顺序 依次执行。
+
+    与本模块 / ArbitratedInput / RecordingInput 接口相同 (click_screen_coords、press_key、
+    press_hotkey、move_to_screen_coords)，可以直接作为处理器的 input_sim 传入；
+    这些方法额外接受 priority、deadline (相对现在的秒数) 和 frame_seq 关键字参数，返回 InputAction；
+    不传 frame_seq 时操作记为最近一次 advance_frame() 的帧。
+
+    - 新的移动或点击入队时，队列中尚未执行的单纯移动 (move_to_screen_coords) 被合并丢弃。
+    - advance_frame(seq) 之后，frame_seq 落后超过 max_frame_age 的待执行操作被丢弃。
+    - 过了 deadline 仍未开始执行的操作被丢弃。
+    - zero_animation=True 时点击/移动不做动画，并在每个操作执行期间把 pyautogui.PAUSE 置 0
+      (目标是本模块或 ArbitratedInput 等最终调用 pyautogui 的对象都生效)；热重载时用 apply_settings() 切换。
+    """
+
+    def __init__(self, target=None, zero_animation=False, max_frame_age=1):
+        """
+        参数:
+        - target: 真正执行操作的对象，默认是本模块 (也可以是 ArbitratedInput 或 RecordingInput)。
+        - zero_animation (bool): 是否启用零动画快速路径。
+        - max_frame_age (int, optional): 允许的最大帧落后数，None 表示从不因过时丢弃。
+        """
+        self.target = target if target is not None else sys.modules[__name__]
+        self.zero_animation = zero_animation
+        self.max_frame_age = max_frame_age
+        self.current_frame_seq = None
+        self._heap = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._busy = False
+        self.counts = {status: 0 for status in (ACTION_DONE, ACTION_FAILED, ACTION_COALESCED,
+                                                ACTION_EXPIRED, ACTION_STALE, ACTION_CANCELLED)}
+
+    def apply_settings(self, settings):
+        """按新的配置快照更新零动画和过时判断参数 (热重载时调用，从下一个操作开始生效)。"""
+        with self._condition:
+            self.zero_animation = settings.input_zero_animation
+            self.max_frame_age = settings.input_max_frame_age
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='input-executor', daemon=True)
+            self._thread.start()
+        return self
+
+    # ---- 入队 ----
+
+    def submit(self, action):
+        """把 InputAction 放入队列并返回它 (执行器尚未启动时自动启动)。"""
+        with self._condition:
+            if self._closed:
+                action._finish(ACTION_CANCELLED)
+                return action
+            if action.name in _POINTER_ACTIONS:
+                self._drop_pending_locked(lambda pending: pending.name == 'move_to_screen_coords',
+                                          ACTION_COALESCED)
+            action.enqueued_at = time.perf_counter()
+            heapq.heappush(self._heap, (-action.priority, next(self._order), action))
+            self._condition.notify()
+        if self._thread is None:
+            self.start()
+        return action
+
+    def _enqueue(self, name, args, kwargs):
+        priority = kwargs.pop('priority', 0)
+        deadline = kwargs.pop('deadline', None)
+        # 未指定时记为当前正在分析的帧 (即触发该操作的帧)；显式传 None 表示不参与过时判断
+        frame_seq = kwargs.pop('frame_seq', self.current_frame_seq)
+        if deadline is not None:
+            deadline = time.perf_counter() + deadline
+        return self.submit(InputAction(name, args, kwargs, priority, deadline, frame_seq))
+
+    def click_screen_coords(self, *args, **kwargs):
+        return self._enqueue('click_screen_coords', args, kwargs)
+
+    def press_key(self, *args, **kwargs):
+        return self._enqueue('press_key', args, kwargs)
+
+    def press_hotkey(self, *args, **kwargs):
+        return self._enqueue('press_hotkey', args, kwargs)
+
+    def move_to_screen_coords(self, *args, **kwargs):
+        return self._enqueue('move_to_screen_coords', args, kwargs)
+
+    # ---- 队列管理 ----
+
+    def _drop_pending_locked(self, predicate, status):
+        kept = []
+        for entry in self._heap:
+            if predicate(entry[2]):
+                entry[2]._finish(status)
+                self.counts[status] += 1
+            else:
+                kept.append(entry)
+        if len(kept) != len(self._heap):
+            heapq.heapify(kept)
+            self._heap = kept
+
+    def _is_stale(self, action):
+        return (self.max_frame_age is not None and action.frame_seq is not None and
+                self.current_frame_seq is not None and
+                self.current_frame_seq - action.frame_seq > self.max_frame_age)
+
+    def advance_frame(self, frame_seq):
+        """通知执行器已经开始分析 frame_seq 这一帧，丢弃由过时的帧触发、尚未执行的操作。"""
+        with self._condition:
+            self.current_frame_seq = frame_seq
+            self._drop_pending_locked(self._is_stale, ACTION_STALE)
+
+    def cancel_pending(self):
+        """丢弃全部尚未执行的操作。"""
+        with self._condition:
+            self._drop_pending_locked(lambda action: True, ACTION_CANCELLED)
+
+    def pending(self):
+        with self._condition:
+            return len(self._heap)
+
+    def wait_idle(self, timeout=None):
+        """等待队列清空且没有正在执行的操作，超时返回 False。"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._heap and not self._busy, timeout)
+
+    # ---- 执行 ----
+
+    def _next_action_locked(self):
+        now = time.perf_counter()
+        while self._heap:
+            _, _, action = heapq.heappop(self._heap)
+            if action.deadline is not None and now > action.deadline:
+                action._finish(ACTION_EXPIRED)
+                self.counts[ACTION_EXPIRED] += 1
+            elif self._is_stale(action):
+                action._finish(ACTION_STALE)
+                self.counts[ACTION_STALE] += 1
+            else:
+                return action
+        return None
+
+    def _execute(self, action):
+        # 每个操作都按当前设置决定，热重载切换 zero_animation 后立即生效
+        zero_animation = self.zero_animation
+        kwargs = action.kwargs
+        if zero_animation and action.name in _ZERO_ANIMATION_KWARGS:
+            kwargs = dict(_ZERO_ANIMATION_KWARGS[action.name], **kwargs)
+        get_registry().observe('input.queue_wait', time.perf_counter() - action.enqueued_at)
+        if not zero_animation or pyautogui is None:
+            getattr(self.target, action.name)(*action.args, **kwargs)
+            return
+        restore_pause, pyautogui.PAUSE = pyautogui.PAUSE, 0
+        try:
+            getattr(self.target, action.name)(*action.args, **kwargs)
+        finally:
+            pyautogui.PAUSE = restore_pause
+
+    def _run(self):
+        while True:
+            with self._condition:
+                action = None
+                while action is None:
+                    action = self._next_action_locked()
+                    if action is None:
+                        self._condition.notify_all() # 唤醒 wait_idle()
+                        if self._closed:
+                            return
+                        self._condition.wait()
+                self._busy = True
+            try:
+                self._execute(action)
+            except Exception as e:
+                logger.warning("Input action %r failed: %s", action, e)
+                status, error = ACTION_FAILED, e
+            else:
+                status, error = ACTION_DONE, None
+            with self._condition:
+                self._busy = False
+                self.counts[status] += 1
+            action._finish(status, error)
+
+    def close(self, cancel_pending=False, timeout=5.0):
+        """停止执行器。默认先执行完队列中剩余的操作；cancel_pending=True 时直接丢弃它们。"""
+        with self._condition:
+            if cancel_pending:
+                self._drop_pending_locked(lambda action: True, ACTION_CANCELLED)
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def stats(self):
+        with self._condition:
+            return dict(self.counts, pending=len(self._heap))
@@ -0,0 +1,195 @@
+from collections import deque, namedtuple
+
+KIND_TASK = 'task'
+KIND_NPC = 'npc'
+
+# kind: KIND_TASK / KIND_NPC；group: 所属任务类型 (例如 "jianduoshiguang")；
+# label: 规范名称 (任务类型名或 NPC 标准名)；alias: 实际命中的别名；
+# score: 1.0 表示精确命中，模糊命中为 1 - 编辑距离 / 别名长度；start/end: 在文本中的位置 (end 不含)。
+KeywordMatch = namedtuple('KeywordMatch', ['kind', 'group', 'label', 'alias', 'score', 'start', 'end'])
+
+_Entry = namedtuple('_Entry', ['kind', 'group', 'label', 'alias'])
+
+
+def _split_aliases(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _bounded_substring_distance(pattern, text, max_distance):
+    """
+    近似子串匹配 (Sellers 算法)：返回 pattern 与 text 中任意子串的最小编辑距离及该子串的结束位置。
+    复杂度 O(len(pattern) * len(text))，OCR 文本和别名都很短，找到距离为 0 的子串时提前结束。
+
+    返回:
+    - (distance, end) 或 (None, None) (距离超过 max_distance)。
+    """
+    m = len(pattern)
+    previous = list(range(m + 1)) # 子串可以从 text 的任意位置开始，所以第 0 行恒为 0
+    best_distance, best_end = previous[m], 0
+    for j, ch in enumerate(text, start=1):
+        current = [0] * (m + 1)
+        for i in range(1, m + 1):
+            cost = 0 if pattern[i - 1] == ch else 1
+            current[i] = min(previous[i] + 1, current[i - 1] + 1, previous[i - 1] + cost)
+        if current[m] <= best_distance: # 距离相同时取更靠后的结束位置 (替换优先于删除)
+            best_distance, best_end = current[m], j
+            if best_distance == 0:
+                break
+        previous = current
+    if best_distance > max_distance:
+        return None, None
+    return best_distance, best_end
+
+
+class KeywordIndex:
+    """
+    OCR 文本的多模式关键词索引。
+
+    所有任务类型别名和 NPC 别名在 build() 时编译进同一个 Aho-Corasick 自动机，
+    search() 对文本只扫描一遍就能得到全部精确命中；某个任务类型 / NPC 没有任何精确命中时，
+    再用有界编辑距离对它的别名做近似子串匹配，容忍 OCR 的个别错字 (例如 见多识厂、灵儿 -> 灵JL)。
+    """
+
+    def __init__(self, max_edit_distance=1, min_fuzzy_length=3):
+        """
+        参数:
+        - max_edit_distance (int): 模糊匹配允许的最大编辑距离。
+        - min_fuzzy_length (int): 别名至少这么长才参与模糊匹配 (两个字的别名错一个字就没有意义了)。
+        """
+        self.max_edit_distance = max_edit_distance
+        self.min_fuzzy_length = min_fuzzy_length
+        self._entries = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._built = True
+
+    def add(self, kind, group, label, alias):
+        alias = alias.strip()
+        if not alias:
+            return
+        self._entries.append(_Entry(kind, group, label, alias))
+        self._built = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def build(self):
+        """构建 Aho-Corasick 自动机 (添加完全部别名后调用一次)。"""
+        goto, fail, output = [{}], [0], [[]]
+        for entry_id, entry in enumerate(self._entries):
+            state = 0
+            for ch in entry.alias:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    fail.append(0)
+                    output.append([])
+                state = next_state
+            output[state].append(entry_id)
+
+        # 广度优先计算失配指针，并把失配链上的输出合并进来
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, next_state in goto[state].items():
+                pending.append(next_state)
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(ch, 0)
+                output[next_state] = output[next_state] + output[fail[next_state]]
+
+        self._goto, self._fail, self._output = goto, fail, output
+        self._built = True
+        return self
+
+    def _exact_matches(self, text):
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for position, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for entry_id in output[state]:
+                entry = self._entries[entry_id]
+                yield entry, position + 1 - len(entry.alias), position + 1
+
+    def search(self, text, kind=None, group=None, fuzzy=True):
+        """
+        在文本中查找所有任务类型 / NPC。
+
+        参数:
+        - text (str): OCR 识别出的文本。
+        - kind (str, optional): 只返回 KIND_TASK 或 KIND_NPC。
+        - group (str, optional): 只返回属于该任务类型的条目。
+        - fuzzy (bool): 没有精确命中的条目是否再做模糊匹配。
+
+        返回:
+        - list[KeywordMatch]: 每个 (kind, group, label) 最多一条 (取得分最高、别名最长的一条)，按得分从高到低排序。
+        """
+        if not self._built:
+            self.build()
+        if not text:
+            return []
+
+        def wanted(entry):
+            return (kind is None or entry.kind == kind) and (group is None or entry.group == group)
+
+        best = {}
+        for entry, start, end in self._exact_matches(text):
+            if not wanted(entry):
+                continue
+            key = (entry.kind, entry.group, entry.label)
+            current = best.get(key)
+            if current is None or len(entry.alias) > len(current.alias):
+                best[key] = KeywordMatch(entry.kind, entry.group, entry.label, entry.alias, 1.0, start, end)
+
+        if fuzzy and self.max_edit_distance > 0:
+            for entry in self._entries:
+                key = (entry.kind, entry.group, entry.label)
+                if key in best and best[key].score >= 1.0:
+                    continue
+                if len(entry.alias) < self.min_fuzzy_length or not wanted(entry):
+                    continue
+                max_distance = min(self.max_edit_distance, len(entry.alias) // 3)
+                distance, end = _bounded_substring_distance(entry.alias, text, max_distance)
+                if distance is None:
+                    continue
+                score = 1.0 - distance / len(entry.alias)
+                current = best.get(key)
+                if current is None or score > current.score:
+                    start = max(0, end - len(entry.alias))
+                    best[key] = KeywordMatch(entry.kind, entry.group, entry.label, entry.alias, score, start, end)
+
+        return sorted(best.values(), key=lambda m: (-m.score, -len(m.alias), m.start))
+
+    def best(self, text, kind=None, group=None, fuzzy=True):
+        """返回得分最高的一条 KeywordMatch，没有命中时返回 None。"""
+        matches = self.search(text, kind, group, fuzzy)
+        return matches[0] if matches else None
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """
+        由 task_keywords.ini 的全部段落构建索引:
+        - [taskkeywords] 中每个键是一个任务类型，值是它的别名列表；
+        - [<任务类型>_npc_keywords] 段落的 targetnpcname 是 NPC 标准名，keywords 是它的 OCR 误识别别名。
+        """
+        index = cls(**kwargs)
+        if config.has_section('taskkeywords'):
+            for task_type, value in config.items('taskkeywords'):
+                for alias in _split_aliases(value):
+                    index.add(KIND_TASK, task_type, task_type, alias)
+        for section in config.sections():
+            if not section.endswith('_npc_keywords'):
+                continue
+            task_type = section[:-len('_npc_keywords')]
+            target_name = config.get(section, 'targetnpcname', fallback='').strip()
+            aliases = _split_aliases(config.get(section, 'keywords', fallback=''))
+            label = target_name or (aliases[0] if aliases else '')
+            for alias in ([target_name] if target_name else []) + aliases:
+                index.add(KIND_NPC, task_type, label, alias)
+        return index.build()
@@ -0,0 +1,233 @@
+# core/metrics.py
+"""
+轻量级进程内性能埋点。
+
+    from core.metrics import span
+
+    with span('capture.grab'):
+        frame = backend.grab(...)
+
+    @span('ocr.recognize_batch')
+    def recognize_lines_batch(...):
+        ...
+
+每个 span 只做两次 time.perf_counter() 和一次直方图计数 (固定的对数分桶，O(log 桶数))，
+可以常开。get_registry().snapshot() 返回全部直方图和计数器；export_json() 写文件，
+start_http_exporter() 在本机端口上提供 GET /metrics (JSON)。
+"""
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from contextlib import ContextDecorator
+
+
+def percentile(sorted_values, fraction):
+    """已排序样本的分位数 (最近秩)，空列表返回 0.0。"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _default_bucket_bounds():
+    # 1µs 到约 67s，每个 2 的幂之间分 4 档 (相邻桶约 19%)，足够区分 p50/p95/p99
+    return tuple(1e-6 * 2 ** (i / 4) for i in range(4 * 26 + 1))
+
+
+_BUCKET_BOUNDS = _default_bucket_bounds()
+
+
+class Histogram:
+    """固定对数分桶的延迟直方图 (单位：秒)。分位数由桶上界估计，误差不超过一个桶宽。"""
+
+    __slots__ = ('count', 'total', 'min', 'max', '_buckets', '_lock')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._buckets = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(_BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self._buckets[index] += 1
+            if seconds < self.min:
+                self.min = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, fraction):
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = fraction * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self._buckets):
+                seen += bucket_count
+                if seen >= rank and bucket_count:
+                    upper = _BUCKET_BOUNDS[index] if index < len(_BUCKET_BOUNDS) else self.max
+                    return min(upper, self.max)
+            return self.max
+
+    def summary(self):
+        count = self.count
+        return {
+            'count': count,
+            'mean_ms': (self.total / count * 1000) if count else 0.0,
+            'min_ms': (self.min * 1000) if count else 0.0,
+            'max_ms': self.max * 1000,
+            'p50_ms': self.quantile(0.50) * 1000,
+            'p95_ms': self.quantile(0.95) * 1000,
+            'p99_ms': self.quantile(0.99) * 1000,
+            'total_ms': self.total * 1000,
+        }
+
+
+class MetricsRegistry:
+    """按名称保存直方图和计数器。"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.enabled = True
+        self.started_at = time.time()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return histogram
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self.histogram(name).observe(seconds)
+
+    def increment(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+            self.started_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            'pid': os.getpid(),
+            'started_at': self.started_at,
+            'exported_at': time.time(),
+            'spans': {name: histogram.summary() for name, histogram in sorted(histograms.items())},
+            'counters': dict(sorted(counters.items())),
+        }
+
+    def format_summary(self, names=None):
+        snapshot = self.snapshot()['spans']
+        return " ".join(f"{name}: p50={s['p50_ms']:.2f}ms p95={s['p95_ms']:.2f}ms n={s['count']}"
+                        for name, s in snapshot.items() if names is None or name in names)
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    return _registry
+
+
+def set_enabled(enabled):
+    _registry.enabled = bool(enabled)
+
+
+class span(ContextDecorator):
+    """
+    计时 span，可作为上下文管理器或装饰器使用。耗时记入 get_registry() 中名为 name 的直方图。
+    异常照常向外抛出，同时计数器 '<name>.errors' 加一。
+    """
+
+    def __init__(self, name, registry=None):
+        self.name = name
+        self.registry = registry
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        registry = self.registry or _registry
+        registry.observe(self.name, time.perf_counter() - self._started)
+        if exc_type is not None:
+            registry.increment(f"{self.name}.errors")
+        return False
+
+    def _recreate_cm(self):
+        # 作为装饰器时每次调用使用独立的实例，多线程下不共享 _started
+        return span(self.name, self.registry)
+
+
+def export_json(path, registry=None):
+    """把当前指标快照写入 JSON 文件 (先写临时文件再替换，读取方不会看到写了一半的文件)。"""
+    snapshot = (registry or _registry).snapshot()
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return snapshot
+
+
+class MetricsHttpExporter:
+    """在后台线程中提供 GET /metrics，返回 JSON 快照。只监听本机地址。"""
+
+    def __init__(self, port=9109, host='127.0.0.1', registry=None):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # 只有启用导出时才需要
+        self.registry = registry or _registry
+        exporter = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(exporter.registry.snapshot(), ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # 不把每个请求打印到控制台
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-exporter', daemon=True)
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def start_http_exporter(port=9109, host='127.0.0.1', registry=None):
+    return MetricsHttpExporter(port, host, registry).start()
@@ -0,0 +1,129 @@
+# core/multi_client.py
+import multiprocessing
+import queue
+from contextlib import contextmanager
+
+from core import input_simulator
+from core.screen_wait import wait_for
+from core.window_manager import activate_window, find_game_windows, get_window_handle, is_window_active
+
+
+class InputArbiter:
+    """
+    Serializes the parts of the pipeline that must be exclusive across game clients:
+    window focus plus mouse/keyboard input.
+
+    The arbiter wraps a multiprocessing lock and can be passed to worker processes as a
+    Process argument. Everything else (capture, matching, OCR) runs fully in parallel.
+    """
+
+    def __init__(self, lock):
+        self._lock = lock
+
+    @contextmanager
+    def exclusive(self, window_object=None):
+        """Holds the input lock and (optionally) brings window_object to the foreground."""
+        with self._lock:
+            if window_object is not None and not is_window_active(window_object):
+                activate_window(window_object)
+                # 焦点切换完成后才发送键鼠操作，否则可能落到上一个客户端的窗口上
+                wait_for(lambda: is_window_active(window_object), timeout=0.3)
+            yield
+
+
+class ArbitratedInput:
+    """
+    Drop-in replacement for the core.input_simulator module inside a client worker: every call
+    acquires the InputArbiter and focuses this worker's window before touching the mouse/keyboard.
+    """
+
+    def __init__(self, arbiter, window_provider):
+        """
+        - arbiter (InputArbiter): shared arbiter.
+        - window_provider (callable): returns this client's current window object (e.g. GameWindowTracker.get_window).
+        """
+        self.arbiter = arbiter
+        self.window_provider = window_provider
+
+    def _run_exclusive(self, function, *args, **kwargs):
+        with self.arbiter.exclusive(self.window_provider()):
+            return function(*args, **kwargs)
+
+    def click_screen_coords(self, *args, **kwargs):
+        return self._run_exclusive(input_simulator.click_screen_coords, *args, **kwargs)
+
+    def press_key(self, *args, **kwargs):
+        return self._run_exclusive(input_simulator.press_key, *args, **kwargs)
+
+    def press_hotkey(self, *args):
+        return self._run_exclusive(input_simulator.press_hotkey, *args)
+
+    def move_to_screen_coords(self, *args, **kwargs):
+        return self._run_exclusive(input_simulator.move_to_screen_coords, *args, **kwargs)
+
+
+def discover_game_window_handles(title_pattern, expected_width, expected_height):
+    """Returns the native handles of every matching game window (windows without a handle are skipped)."""
+    handles = []
+    for window in find_game_windows(title_pattern, expected_width, expected_height):
+        handle = get_window_handle(window)
+        if handle is not None and handle not in handles:
+            handles.append(handle)
+    return handles
+
+
+class MultiClientSupervisor:
+    """
+    Runs one worker process per game window.
+
+    Each worker gets its own capture backend, OCR engine and processor state (they are all
+    per-process module state), and shares only an InputArbiter with the other workers.
+    worker_target must be a picklable module-level function with the signature
+    worker_target(window_handle, arbiter, stop_event, status_queue, *worker_args).
+    Game windows must not overlap on screen, since each worker captures its own client area.
+    """
+
+    def __init__(self, worker_target, window_handles, worker_args=(), start_method='spawn'):
+        self.worker_target = worker_target
+        self.window_handles = list(window_handles)
+        self.worker_args = tuple(worker_args)
+        self._mp_context = multiprocessing.get_context(start_method)
+        self.arbiter = InputArbiter(self._mp_context.Lock())
+        self.stop_event = self._mp_context.Event()
+        self.status_queue = self._mp_context.Queue()
+        self.workers = {} # window_handle -> Process
+
+    def start(self):
+        for index, handle in enumerate(self.window_handles):
+            worker = self._mp_context.Process(
+                target=self.worker_target,
+                args=(handle, self.arbiter, self.stop_event, self.status_queue) + self.worker_args,
+                name=f'client-worker-{index}',
+                daemon=True
+            )
+            worker.start()
+            self.workers[handle] = worker
+        return self
+
+    def alive_workers(self):
+        return [handle for handle, worker in self.workers.items() if worker.is_alive()]
+
+    def poll_status(self, timeout=None):
+        """Returns the next status message posted by a worker, or None if none arrived within timeout."""
+        try:
+            return self.status_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self, timeout=10.0):
+        self.stop_event.set()
+        for worker in self.workers.values():
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
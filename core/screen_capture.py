@@ -1,15 +1,166 @@
-import pyautogui
+try:
+    import pyautogui # 没有桌面环境时不可用，capture_screen_area 随之返回 None
+except ImportError:
+    pyautogui = None
 import numpy as np
 import cv2 # 用于颜色空间转换 (RGB -> BGR)
+import multiprocessing
 import os
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+from core.metrics import span
 
 # 导入我们自己的模块 (注意相对路径，假设screen_capture.py在core目录下)
 # from .window_manager import find_game_window, get_window_rect # 如果需要直接依赖WindowMananger获取窗口信息
-# from .config_loader import load_config_file, get_config_value # 如果需要直接读取配置
+
+try:
+    import mss # 可选依赖：缺失时回退到 pyautogui 截图
+except ImportError:
+    mss = None
+
+
+class MssCaptureBackend:
+    """
+    基于 mss 的常驻截图后端。
+
+    每个线程只打开一次 mss 会话 (mss 在 Windows 上持有的 GDI 句柄不能跨线程使用)，
+    并为当前截图尺寸预分配 BGR 帧缓冲区：每次截图由 cv2.cvtColor 直接从 mss 的 BGRA 截图缓冲区
+    转换写入这块缓冲区，不再经过 Pillow 图像、额外的 np.array 拷贝或中间的 BGRA 拷贝。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._bgr = None
+        self._buffer_lock = threading.RLock()
+
+    @property
+    def available(self):
+        return mss is not None
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = mss.mss()
+            self._local.session = session
+        return session
+
+    def _ensure_bgr_buffer(self, width, height):
+        if self._bgr is None or self._bgr.shape[:2] != (height, width):
+            self._bgr = np.empty((height, width, 3), dtype=np.uint8)
+
+    def _grab_raw(self, screen_x, screen_y, width, height):
+        # 返回 mss 截图缓冲区 (BGRA 排列) 的视图，不拷贝；视图引用 shot.raw，在调用方用完之前一直有效
+        if mss is None or width <= 0 or height <= 0:
+            return None
+        monitor = {'left': int(screen_x), 'top': int(screen_y), 'width': int(width), 'height': int(height)}
+        shot = self._session().grab(monitor)
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def grab_bgra(self, screen_x, screen_y, width, height):
+        """
+        截取指定区域，返回 BGRA 格式的图像数据 (mss 原始排列，调用者独占的新数组)。
+
+        返回:
+        - numpy.ndarray: 形状为 (height, width, 4) 的 BGRA 图像。
+        - None: 如果 mss 不可用、参数无效或截图失败。
+        """
+        try:
+            raw = self._grab_raw(screen_x, screen_y, width, height)
+            return None if raw is None else raw.copy()
+        except Exception:
+            return None
+
+    @span('capture.grab')
+    def grab(self, screen_x, screen_y, width, height, reuse_buffer=True):
+        """
+        截取指定区域，返回 BGR 格式的图像数据。BGRA -> BGR 转换直接读取 mss 的截图缓冲区，
+        中间没有额外的整帧拷贝。
+
+        参数:
+        - screen_x, screen_y, width, height (int): 截图区域的屏幕坐标和尺寸。
+        - reuse_buffer (bool): 为 True 时结果写入后端预分配的 BGR 缓冲区 (下一次截图会覆盖)；
+                               为 False 时返回一份独立的新数组。
+
+        返回:
+        - numpy.ndarray: BGR格式的图像数据。
+        - None: 如果截图失败或参数无效。
+        """
+        with self._buffer_lock:
+            try:
+                raw = self._grab_raw(screen_x, screen_y, width, height)
+                if raw is None:
+                    return None
+                if reuse_buffer:
+                    self._ensure_bgr_buffer(raw.shape[1], raw.shape[0])
+                    cv2.cvtColor(raw, cv2.COLOR_BGRA2BGR, dst=self._bgr)
+                    return self._bgr
+                return cv2.cvtColor(raw, cv2.COLOR_BGRA2BGR)
+            except Exception:
+                return None
+
+    def grab_into(self, ring, screen_x, screen_y, width, height):
+        """
+        截取指定区域，BGRA -> BGR 转换直接从 mss 的截图缓冲区写入 FrameRingBuffer 的空闲槽位并发布。
+
+        返回:
+        - int: 发布的帧序号。
+        - None: 截图失败、尺寸与环形缓冲区不一致或没有空闲槽位 (帧被丢弃)。
+        """
+        with self._buffer_lock:
+            try:
+                raw = self._grab_raw(screen_x, screen_y, width, height)
+            except Exception:
+                return None
+            if raw is None or raw.shape[:2] != ring.frame_shape[:2]:
+                return None
+            with ring.write_slot() as view:
+                if view is None:
+                    return None
+                cv2.cvtColor(raw, cv2.COLOR_BGRA2BGR, dst=view)
+            return ring.latest_seq
+
+    def close(self):
+        """关闭当前线程的 mss 会话。"""
+        session = getattr(self._local, 'session', None)
+        if session is not None:
+            try:
+                session.close()
+            except Exception:
+                pass
+            self._local.session = None
+
+
+_default_capture_backend = None
+
+def get_default_capture_backend():
+    """返回模块级共享的 MssCaptureBackend 实例 (首次调用时创建)。"""
+    global _default_capture_backend
+    if _default_capture_backend is None:
+        _default_capture_backend = MssCaptureBackend()
+    return _default_capture_backend
+
+
+@span('capture.pyautogui')
+def _capture_with_pyautogui(screen_x, screen_y, width, height):
+    # pyautogui.screenshot() 返回一个 Pillow Image 对象 (RGB模式)
+    screenshot_pil = pyautogui.screenshot(region=(screen_x, screen_y, width, height))
+
+    # 将 Pillow Image 转换为 OpenCV BGR NumPy array
+    return cv2.cvtColor(np.array(screenshot_pil), cv2.COLOR_RGB2BGR)
+
 
 def capture_screen_area(screen_x, screen_y, width, height):
     """
     截取屏幕上指定矩形区域的图像。
+    优先使用常驻的 mss 截图后端，mss 不可用时回退到 pyautogui。
+
+    这是一次性截图的入口 (启动时的第一帧、没有 mss 时的回退路径)，调用方可能长期持有结果，
+    也可能在处理途中再次截图，所以每次都返回新分配的数组 (由 BGRA -> BGR 转换直接生成，不经过中间拷贝)。
+    需要避免每帧分配的常驻循环应直接使用 MssCaptureBackend.grab() 或 FrameSource，
+    它们返回的是复用缓冲区、在下一次截图前有效的帧。
 
     参数:
     - screen_x (int): 截图区域左上角的屏幕X坐标。
@@ -18,72 +169,309 @@ def capture_screen_area(screen_x, screen_y, width, height):
     - height (int): 截图区域的高度。
 
     返回:
-    - numpy.ndarray: BGR格式的图像数据。
+    - numpy.ndarray: BGR格式的图像数据 (调用者独占的新数组)。
     - None: 如果截图失败或参数无效。
     """
     if width <= 0 or height <= 0:
         # print("错误 (capture_screen_area): 截图宽度和高度必须大于0。") # 遵循原则，暂时不打印
         return None
 
-    try:
-        # pyautogui.screenshot() 返回一个 Pillow Image 对象 (RGB模式)
-        screenshot_pil = pyautogui.screenshot(region=(screen_x, screen_y, width, height))
+    backend = get_default_capture_backend()
+    if backend.available:
+        return backend.grab(screen_x, screen_y, width, height, reuse_buffer=False)
 
-        # 将 Pillow Image 转换为 OpenCV BGR NumPy array
-        screenshot_bgr = cv2.cvtColor(np.array(screenshot_pil), cv2.COLOR_RGB2BGR)
-        return screenshot_bgr
+    try:
+        return _capture_with_pyautogui(screen_x, screen_y, width, height)
     except Exception: # 捕获截图时可能发生的各种异常
         # print(f"错误 (capture_screen_area): 截图失败 - {e}") # 暂时不打印
         return None
 
 
-def get_game_client_area_rect(window_manager_module, config_loader_module, general_config_filename="settings_general.ini"):
+def get_game_client_area_rect(window_manager_module, settings, window_tracker=None):
     """
     计算并返回游戏内部画面 (例如1366x768) 在屏幕上的绝对坐标和尺寸。
     这需要先找到游戏窗口，获取其外部矩形，然后根据配置的偏移量计算。
 
     参数:
     - window_manager_module: 已导入的 window_manager 模块。
-    - config_loader_module: 已导入的 config_loader 模块。
-    - general_config_filename (str): 包含游戏窗口和客户端区域偏移配置的文件名。
+    - settings (core.config_loader.Settings): 配置快照 (窗口标题、期望尺寸、客户端区域偏移和尺寸)。
+    - window_tracker (GameWindowTracker, optional): 传入时直接使用其缓存的窗口句柄，不再重新枚举窗口。
 
     返回:
     - tuple: (client_area_screen_x, client_area_screen_y, client_area_width, client_area_height)
-    - None: 如果无法找到窗口或读取配置失败。
+    - None: 如果无法找到窗口。
     """
-    # 1. 加载通用配置
-    general_config = config_loader_module.load_config_file(general_config_filename)
-    if not general_config:
-        return None
+    if window_tracker is not None:
+        return window_tracker.get_client_rect()
 
-    # 2. 从配置中获取窗口查找参数和客户端区域偏移
-    try:
-        title_pattern = general_config.get('GameWindow', 'TitlePattern')
-        expected_width = general_config.getint('GameWindow', 'ExpectedWidth')
-        expected_height = general_config.getint('GameWindow', 'ExpectedHeight')
-
-        offset_x = general_config.getint('ScreenCapture', 'ClientAreaOffsetX')
-        offset_y = general_config.getint('ScreenCapture', 'ClientAreaOffsetY')
-        client_width = general_config.getint('ScreenCapture', 'ClientAreaWidth')
-        client_height = general_config.getint('ScreenCapture', 'ClientAreaHeight')
-    except Exception: # 捕获 get 或 getint 可能的错误 (NoSection, NoOption, ValueError)
-        # print(f"错误 (get_game_client_area_rect): 读取配置失败 - {e}") # 暂时不打印
-        return None
-
-    # 3. 查找游戏窗口
-    game_window = window_manager_module.find_game_window(title_pattern, expected_width, expected_height)
+    # 1. 查找游戏窗口
+    expected_width, expected_height = settings.expected_window_size
+    game_window = window_manager_module.find_game_window(settings.window_title, expected_width, expected_height)
     if not game_window:
         return None
 
-    # 4. 获取窗口的外部屏幕矩形
+    # 2. 获取窗口的外部屏幕矩形
     window_rect = window_manager_module.get_window_rect(game_window)
     if not window_rect:
         return None
 
+    # 3. 计算内部游戏客户端区域的屏幕绝对坐标
     window_screen_x, window_screen_y, _, _ = window_rect
+    offset_x, offset_y = settings.client_offset
+    client_width, client_height = settings.client_size
+    return (window_screen_x + offset_x, window_screen_y + offset_y, client_width, client_height)
+
+
+def _attach_shared_memory(name):
+    # 附加方不应接管共享内存的生命周期 (由创建方 unlink)。Python 3.13 起可以直接关闭跟踪；
+    # 更早的版本里子进程与创建方共用同一个 resource_tracker，重复登记同一个名字不会造成提前删除
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
 
-    # 5. 计算内部游戏客户端区域的屏幕绝对坐标
-    client_area_screen_x = window_screen_x + offset_x
-    client_area_screen_y = window_screen_y + offset_y
+class SharedFrame:
+    """
+    FrameRingBuffer.acquire_latest() 返回的帧引用。
+
+    image 是共享内存中对应槽位的零拷贝视图，在 release() 之前写入方不会覆盖这个槽位；
+    release() 之后不能再使用 image (需要保留时请先 copy())。可用作上下文管理器。
+    """
 
-    return (client_area_screen_x, client_area_screen_y, client_width, client_height)
\ No newline at end of file
+    __slots__ = ('ring', 'slot', 'seq', 'image', '_released')
+
+    def __init__(self, ring, slot, seq, image):
+        self.ring = ring
+        self.slot = slot
+        self.seq = seq
+        self.image = image
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.image = None
+            self.ring._release_slot(self.slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class FrameRingBuffer:
+    """
+    基于 multiprocessing.shared_memory 的多进程帧环形缓冲区，用于 截图进程 -> 分析进程 的零拷贝交接。
+
+    共享内存中预分配 num_slots 个固定尺寸 (height, width, 3) 的 BGR 槽位，以及每个槽位的序号和引用计数。
+    写入方 (截图进程) 总是写入最旧的、没有被读取方占用的槽位，写完后发布为最新帧；
+    读取方 (OCR 工作进程、处理器、调试录制等) 用 acquire_latest() 取得最新帧的零拷贝视图，
+    用完后显式 release()。读取方只关心最新帧：来不及处理的旧帧直接被覆盖，不会排队。
+    所有槽位都被占用时本次写入被丢弃 (dropped_frames 加一)，写入方永远不会阻塞。
+
+    由创建方 (create=True) 负责 unlink()；对象可以作为 Process 参数传给子进程 (只传递名字和锁)，
+    此时 mp_context 必须与启动子进程所用的 multiprocessing 上下文一致。
+    """
+
+    _HEADER_FIELDS = 3 # [最新序号, 最新槽位, 丢弃帧数]
+
+    def __init__(self, width, height, num_slots=4, name=None, create=True, mp_context=None, _condition=None):
+        if num_slots < 2:
+            raise ValueError("FrameRingBuffer 至少需要 2 个槽位")
+        self.width = width
+        self.height = height
+        self.num_slots = num_slots
+        self.frame_shape = (height, width, 3)
+        self.frame_bytes = width * height * 3
+        self._owner = create
+        if _condition is None:
+            _condition = (mp_context or multiprocessing.get_context()).Condition()
+        self._condition = _condition
+
+        header_items = self._HEADER_FIELDS + 2 * num_slots
+        self._header_bytes = ((header_items * 8 + 63) // 64) * 64 # 帧数据按 64 字节对齐
+        total_bytes = self._header_bytes + num_slots * self.frame_bytes
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=total_bytes)
+        else:
+            self._shm = _attach_shared_memory(name)
+        self.name = self._shm.name
+        self._map_views()
+        if create:
+            self._header[:] = -1
+            self._header[2] = 0
+            self._refs[:] = 0
+
+    def _map_views(self):
+        buf = self._shm.buf
+        header_items = self._HEADER_FIELDS + 2 * self.num_slots
+        header = np.ndarray((header_items,), dtype=np.int64, buffer=buf)
+        self._header = header[:self._HEADER_FIELDS]
+        self._seqs = header[self._HEADER_FIELDS:self._HEADER_FIELDS + self.num_slots]
+        self._refs = header[self._HEADER_FIELDS + self.num_slots:]
+        self._frames = np.ndarray((self.num_slots,) + self.frame_shape, dtype=np.uint8,
+                                  buffer=buf, offset=self._header_bytes)
+
+    def __getstate__(self):
+        return {
+            'width': self.width,
+            'height': self.height,
+            'num_slots': self.num_slots,
+            'name': self.name,
+            'condition': self._condition,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['width'], state['height'], state['num_slots'], name=state['name'],
+                      create=False, _condition=state['condition'])
+
+    @property
+    def latest_seq(self):
+        return int(self._header[0])
+
+    @property
+    def dropped_frames(self):
+        return int(self._header[2])
+
+    # ---- 写入方 ----
+
+    def _claim_slot(self):
+        # 调用方持有锁：选序号最小 (最旧) 且没有读取方占用的槽位，最新帧所在槽位不复用
+        latest_slot = self._header[1]
+        best_slot, best_seq = None, None
+        for slot in range(self.num_slots):
+            if slot == latest_slot or self._refs[slot] != 0:
+                continue
+            if best_seq is None or self._seqs[slot] < best_seq:
+                best_slot, best_seq = slot, self._seqs[slot]
+        if best_slot is not None:
+            self._seqs[best_slot] = -1 # 写入期间该槽位对读取方不可见
+        return best_slot
+
+    @contextmanager
+    def write_slot(self):
+        """
+        取得一个空闲槽位的可写视图，with 块正常结束时发布为最新帧：
+
+            with ring.write_slot() as view:
+                if view is not None:
+                    cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=view)
+
+        没有空闲槽位时 view 为 None，本帧被丢弃。with 块抛出异常时槽位不发布。
+        """
+        with self._condition:
+            slot = self._claim_slot()
+            if slot is None:
+                self._header[2] += 1
+        if slot is None:
+            yield None
+            return
+
+        published = False
+        try:
+            yield self._frames[slot]
+            published = True
+        finally:
+            with self._condition:
+                if published:
+                    seq = self._header[0] + 1 if self._header[0] >= 0 else 0
+                    self._seqs[slot] = seq
+                    self._header[0] = seq
+                    self._header[1] = slot
+                    self._condition.notify_all()
+
+    def publish(self, frame):
+        """把 frame 拷贝进一个空闲槽位并发布，返回序号；没有空闲槽位时返回 None。"""
+        if frame.shape != self.frame_shape:
+            raise ValueError(f"帧尺寸 {frame.shape} 与环形缓冲区 {self.frame_shape} 不一致")
+        with self.write_slot() as view:
+            if view is None:
+                return None
+            np.copyto(view, frame)
+        return self.latest_seq
+
+    # ---- 读取方 ----
+
+    def _acquire_latest_locked(self, after_seq):
+        seq = self._header[0]
+        if seq < 0 or (after_seq is not None and seq <= after_seq):
+            return None
+        slot = int(self._header[1])
+        self._refs[slot] += 1
+        return SharedFrame(self, slot, int(seq), self._frames[slot])
+
+    def acquire_latest(self, after_seq=None, timeout=0):
+        """
+        占用最新帧所在的槽位并返回 SharedFrame；没有比 after_seq 更新的帧时等待最多 timeout 秒
+        (timeout=None 表示一直等待)，仍然没有则返回 None。
+        """
+        with self._condition:
+            shared = self._acquire_latest_locked(after_seq)
+            if shared is None and timeout != 0:
+                self._condition.wait_for(
+                    lambda: self._header[0] >= 0 and (after_seq is None or self._header[0] > after_seq),
+                    timeout)
+                shared = self._acquire_latest_locked(after_seq)
+            return shared
+
+    def _release_slot(self, slot):
+        with self._condition:
+            if self._refs[slot] > 0:
+                self._refs[slot] -= 1
+
+    def stats(self):
+        with self._condition:
+            return {
+                'latest_seq': int(self._header[0]),
+                'dropped_frames': int(self._header[2]),
+                'slots_in_use': int(np.count_nonzero(self._refs)),
+            }
+
+    def close(self):
+        """断开本进程与共享内存的映射；创建方同时 unlink()。之后不能再使用已取得的帧视图。"""
+        if self._shm is None:
+            return
+        self._header = self._seqs = self._refs = self._frames = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def capture_to_ring(ring, client_rect, stop_event, target_fps=None):
+    """
+    截图进程的入口：按 target_fps (None 表示不限速) 持续截取 client_rect 并发布到 ring，直到 stop_event 被 set()。
+    可直接作为 multiprocessing.Process 的 target，ring 和 stop_event 须来自同一个 multiprocessing 上下文。
+
+    返回:
+    - int: 成功发布的帧数。
+    """
+    backend = MssCaptureBackend()
+    period = 1.0 / target_fps if target_fps else 0.0
+    published = 0
+    next_tick = time.perf_counter()
+    try:
+        while not stop_event.is_set():
+            if period:
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_tick = max(next_tick + period, time.perf_counter())
+            if backend.available:
+                seq = backend.grab_into(ring, *client_rect)
+            else:
+                frame = capture_screen_area(*client_rect)
+                seq = ring.publish(frame) if frame is not None and frame.shape == ring.frame_shape else None
+            if seq is not None:
+                published += 1
+    finally:
+        backend.close()
+    return published
@@ -0,0 +1,193 @@
+# core/screen_wait.py
+"""
+事件驱动的等待：反复截取一个小 ROI，直到画面满足条件就立即返回，代替固定时长的 sleep。
+
+    from core.screen_wait import wait_for, TemplateAppears, RegionChanged
+
+    input_sim.click_screen_coords(x, y)
+    result = wait_for(RegionChanged(), roi=(x - 40, y - 10, 80, 20), timeout=1.0)
+    if not result:
+        ...  # 游戏没有响应
+
+轮询间隔从 min_interval 开始按 backoff 倍数增长到 max_interval；ROI 内出现任何变化
+(说明游戏正在响应) 时间隔重新回到 min_interval。
+"""
+import time
+
+import cv2
+import numpy as np
+
+from core.change_detector import RegionChangeDetector
+from core.image_matcher import find_template_in_image, resolve_template, to_gray
+from core.metrics import span
+from core.screen_capture import MssCaptureBackend, capture_screen_area
+
+
+class WaitCondition:
+    """
+    等待条件的基类。reset() 在每次 wait_for 开始时调用；check(image) 收到 ROI 的 BGR 截图，
+    条件满足时返回 True。条件满足时 last_result 保存可供调用方使用的附加结果 (例如匹配位置)。
+    """
+
+    def __init__(self):
+        self.last_result = None
+
+    def reset(self):
+        self.last_result = None
+
+    def check(self, image):
+        raise NotImplementedError
+
+
+class TemplateAppears(WaitCondition):
+    """ROI 内出现模板 (last_result 为相对 ROI 的 (x, y, w, h, confidence))。"""
+
+    def __init__(self, template, threshold=0.8, registry=None):
+        super().__init__()
+        self.template = resolve_template(template, registry)
+        if self.template is None:
+            raise ValueError(f"模板无法加载: {template}")
+        self.threshold = threshold
+
+    def check(self, image):
+        self.last_result = find_template_in_image(to_gray(image), self.template, self.threshold)
+        return self.last_result is not None
+
+
+class TemplateDisappears(TemplateAppears):
+    """ROI 内不再出现模板。"""
+
+    def check(self, image):
+        return not super().check(image)
+
+
+class RegionChanged(WaitCondition):
+    """
+    ROI 相对于第一次截图 (或传入的 baseline) 发生了变化，变化的判定与 RegionChangeDetector 相同。
+    baseline 可以是点击之前截取的 ROI 图像，这样点击和第一次轮询之间发生的变化也不会漏掉。
+    """
+
+    def __init__(self, baseline=None, tile_size=8, tile_tolerance=6.0):
+        super().__init__()
+        self.baseline = baseline
+        self._detector = RegionChangeDetector(tile_size, tile_tolerance)
+
+    def reset(self):
+        super().reset()
+        self._detector.invalidate()
+        if self.baseline is not None:
+            self._detector.check('region', self.baseline, (0, 0, self.baseline.shape[1], self.baseline.shape[0]))
+            self._primed = True
+        else:
+            self._primed = False
+
+    def check(self, image):
+        dirty = self._detector.check('region', image, (0, 0, image.shape[1], image.shape[0]))
+        if not self._primed:
+            self._primed = True # 第一次截图只作为基准
+            return False
+        return dirty
+
+
+class ColorPresent(WaitCondition):
+    """ROI 内至少有 min_pixels 个像素落在 BGR 范围 [lower, upper] 内 (last_result 为像素数)。"""
+
+    def __init__(self, lower_bgr, upper_bgr, min_pixels=1):
+        super().__init__()
+        self.lower = np.asarray(lower_bgr, dtype=np.uint8)
+        self.upper = np.asarray(upper_bgr, dtype=np.uint8)
+        self.min_pixels = min_pixels
+
+    def check(self, image):
+        count = cv2.countNonZero(cv2.inRange(image, self.lower, self.upper))
+        self.last_result = count
+        return count >= self.min_pixels
+
+
+class ColorAbsent(ColorPresent):
+    """ROI 内落在 BGR 范围内的像素少于 min_pixels 个。"""
+
+    def check(self, image):
+        return not super().check(image)
+
+
+class WaitResult:
+    """wait_for 的结果；条件满足时为真值。"""
+
+    __slots__ = ('satisfied', 'elapsed', 'polls', 'image', 'detail')
+
+    def __init__(self, satisfied, elapsed, polls, image, detail):
+        self.satisfied = satisfied
+        self.elapsed = elapsed
+        self.polls = polls
+        self.image = image   # 最后一次截取的 ROI 图像
+        self.detail = detail # 条件的 last_result
+
+    def __bool__(self):
+        return self.satisfied
+
+    def __repr__(self):
+        return f"WaitResult(satisfied={self.satisfied}, elapsed={self.elapsed * 1000:.1f}ms, polls={self.polls})"
+
+
+# 等待轮询专用的截图后端：不与常驻循环共用缓冲区，小 ROI 和整帧截图交替时不会反复重新分配
+_wait_backend = None
+
+
+def _grab_roi(roi):
+    global _wait_backend
+    if _wait_backend is None:
+        _wait_backend = MssCaptureBackend()
+    if _wait_backend.available:
+        return _wait_backend.grab(*roi)
+    return capture_screen_area(*roi)
+
+
+@span('wait.for')
+def wait_for(condition, roi=None, timeout=2.0, grab=None,
+             min_interval=0.005, max_interval=0.1, backoff=1.5):
+    """
+    轮询直到条件满足或超时。
+
+    参数:
+    - condition (WaitCondition or callable): 屏幕条件；也可以是不需要截图的无参函数 (例如检查窗口是否已激活)，
+                                             此时 roi 必须为 None。
+    - roi (tuple): 要轮询的屏幕区域 (x, y, w, h)，绝对屏幕坐标。越小越快。
+    - timeout (float): 最长等待秒数。
+    - grab (callable, optional): grab(roi) -> BGR 图像，默认截取实时屏幕；回放/测试时可以替换。
+    - min_interval, max_interval (float): 轮询间隔的下限和上限 (秒)。
+    - backoff (float): 画面没有变化时每次轮询间隔增长的倍数。
+
+    返回:
+    - WaitResult: 条件满足时为真值。
+    """
+    is_screen_condition = isinstance(condition, WaitCondition)
+    if is_screen_condition and roi is None:
+        raise ValueError("屏幕条件需要指定 roi")
+    if is_screen_condition:
+        condition.reset()
+    grab = grab or _grab_roi
+    activity = RegionChangeDetector() if is_screen_condition else None
+
+    started = time.perf_counter()
+    interval = min_interval
+    polls = 0
+    image = None
+    while True:
+        polls += 1
+        if is_screen_condition:
+            image = grab(roi)
+            satisfied = image is not None and image.size > 0 and condition.check(image)
+        else:
+            satisfied = bool(condition())
+        elapsed = time.perf_counter() - started
+        if satisfied or elapsed >= timeout:
+            # 默认截图后端会复用缓冲区，返回前拷贝一份 (ROI 很小，代价可以忽略)
+            last_image = image.copy() if image is not None else None
+            detail = getattr(condition, 'last_result', None) if satisfied else None
+            return WaitResult(satisfied, elapsed, polls, last_image, detail)
+
+        # 画面正在变化 (游戏正在响应) 时保持高频轮询，静止时逐渐放慢
+        changed = image is not None and activity.check('roi', image, (0, 0, image.shape[1], image.shape[0]))
+        interval = min_interval if changed and polls > 1 else min(max_interval, interval * backoff)
+        time.sleep(min(interval, max(0.0, timeout - elapsed)))
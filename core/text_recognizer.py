@@ -1,32 +1,226 @@
 # core/text_recognizer.py
-from PIL import Image
 import numpy as np
 import cv2 # 仍然保留，以防未来需要非常基础的图像操作或格式转换
 import os
+import abc
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from core.metrics import span
 # pytesseract 相关可以完全移除了，如果我们完全转向PaddleOCR
 
+logger = logging.getLogger(__name__)
+
 _paddle_ocr_instance = None 
+_paddle_init_lock = threading.Lock() # 后台预热线程和主线程可能同时触发初始化
+# PaddleOCR 的推理器不是线程安全的：预热线程和主线程的识别调用必须串行
+_paddle_inference_lock = threading.Lock()
+
+
+class OcrResultCache:
+    """
+    LRU cache for OCR results, keyed by a content hash of the crop (bytes + shape + dtype).
+
+    With phash_tolerance > 0, a crop that misses the exact lookup may still reuse the result of a
+    same-sized crop whose 64-bit difference hash is within phash_tolerance bits (useful when the
+    game re-renders the same text with slightly different anti-aliasing).
+    Entries older than ttl_seconds are treated as misses (None disables expiry).
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=None, phash_tolerance=0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.phash_tolerance = phash_tolerance
+        self._entries = OrderedDict() # key -> (value, stored_at, phash, namespace, shape)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.phash_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @staticmethod
+    def content_key(image):
+        contiguous = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(contiguous.data, digest_size=16)
+        digest.update(str((contiguous.shape, contiguous.dtype.str)).encode('ascii'))
+        return digest.digest()
+
+    @staticmethod
+    def perceptual_hash(image):
+        """64-bit difference hash (dHash) of the crop."""
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+    def _is_expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, image, namespace=None):
+        """Returns (True, value) on a hit and (False, None) on a miss."""
+        key = (namespace, self.content_key(image))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_expired(entry[1], now):
+                    del self._entries[key]
+                    self.expired += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[0]
+
+        if self.phash_tolerance > 0:
+            phash = self.perceptual_hash(image)
+            with self._lock:
+                for other_key, (value, stored_at, other_phash, other_namespace, shape) in reversed(self._entries.items()):
+                    if other_namespace != namespace or shape != image.shape or self._is_expired(stored_at, now):
+                        continue
+                    if bin(phash ^ other_phash).count('1') <= self.phash_tolerance:
+                        self._entries.move_to_end(other_key)
+                        self.phash_hits += 1
+                        return True, value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def put(self, image, value, namespace=None):
+        key = (namespace, self.content_key(image))
+        phash = self.perceptual_hash(image) if self.phash_tolerance > 0 else 0
+        with self._lock:
+            self._entries[key] = (value, time.monotonic(), phash, namespace, image.shape)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, namespace=None):
+        """Drops every entry, or only the entries stored under namespace."""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                return
+            for key in [key for key, entry in self._entries.items() if entry[3] == namespace]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.phash_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'phash_hits': self.phash_hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_rate': ((self.hits + self.phash_hits) / lookups) if lookups else 0.0,
+            }
+
+
+_ocr_cache = OcrResultCache()
+
+def configure_ocr_cache(max_entries=256, ttl_seconds=None, phash_tolerance=0):
+    """Replaces the module-level OCR cache. max_entries <= 0 disables caching."""
+    global _ocr_cache
+    _ocr_cache = OcrResultCache(max_entries, ttl_seconds, phash_tolerance) if max_entries > 0 else None
+    return _ocr_cache
+
+def get_ocr_cache():
+    return _ocr_cache
+
+_glyph_recognizer = None
+# 字形识别结果的缓存命名空间，每次重新配置都换一个：旧图集 / 旧阈值下的结果不会再被命中
+_glyph_generations = itertools.count()
+_glyph_cache_namespace = ('glyph_rec', next(_glyph_generations))
+
+def configure_glyph_recognizer(atlas_path=None, min_confidence=0.85):
+    """
+    Enables the bitmap-font glyph recognizer (core.glyph_ocr) as a fast path in front of
+    PaddleOCR in recognize_lines_batch. Passing no atlas path (or a missing file) disables it.
+    Cached glyph results from the previous configuration are discarded.
+    """
+    global _glyph_recognizer, _glyph_cache_namespace
+    from core.glyph_ocr import load_glyph_recognizer
+    recognizer = load_glyph_recognizer(atlas_path, min_confidence)
+    previous_namespace = _glyph_cache_namespace
+    _glyph_recognizer, _glyph_cache_namespace = recognizer, ('glyph_rec', next(_glyph_generations))
+    if _ocr_cache is not None:
+        _ocr_cache.clear(previous_namespace)
+    return _glyph_recognizer
+
+def get_glyph_recognizer():
+    return _glyph_recognizer
 
 def initialize_paddle_ocr(lang='ch', use_gpu_flag=True, use_angle_cls=True):
     global _paddle_ocr_instance
     if _paddle_ocr_instance is None:
+        with _paddle_init_lock:
+            if _paddle_ocr_instance is None:
+                _paddle_ocr_instance = _create_paddle_ocr(lang, use_gpu_flag, use_angle_cls)
+    return _paddle_ocr_instance is not None and _paddle_ocr_instance != "error"
+
+@span('ocr.model_load')
+def _create_paddle_ocr(lang, use_gpu_flag, use_angle_cls):
+    try:
+        from paddleocr import PaddleOCR
+        logger.debug("Initializing PaddleOCR with use_gpu=%s, lang='%s'...", use_gpu_flag, lang)
+        # show_log=True 可以看到PaddleOCR更详细的内部日志，调试时有用
+        instance = PaddleOCR(use_angle_cls=use_angle_cls, lang=lang, use_gpu=use_gpu_flag, show_log=False)
+        logger.debug("PaddleOCR instance initialized successfully.")
+        return instance
+    except ImportError:
+        logger.error("paddleocr library not found. Please run 'pip install paddleocr'")
+        return "error"
+    except Exception as e:
+        logger.error("Failed to initialize PaddleOCR - %s", e)
+        return "error"
+
+def warm_up_ocr(lang='ch', use_gpu_flag=True):
+    """
+    Loads the PaddleOCR model and runs one recognition on a dummy single-line crop, so the
+    first real recognize call does not pay for model loading or first-inference setup.
+
+    Returns a dict with 'ok', 'model_load_s' and 'warmup_s'.
+    """
+    started = time.perf_counter()
+    ok = initialize_paddle_ocr(lang=lang, use_gpu_flag=use_gpu_flag)
+    loaded = time.perf_counter()
+    if ok:
+        with span('ocr.warmup'):
+            # 与任务类型 ROI 尺寸相近的白底黑字假截图块
+            dummy = np.full((32, 160, 3), 255, dtype=np.uint8)
+            cv2.putText(dummy, "warmup", (8, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+            recognize_lines_batch([dummy], lang=lang, use_gpu_flag=use_gpu_flag, use_cache=False)
+    return {'ok': ok, 'model_load_s': loaded - started, 'warmup_s': time.perf_counter() - loaded}
+
+def start_ocr_warmup(lang='ch', use_gpu_flag=True):
+    """
+    Runs warm_up_ocr on a background daemon thread and returns a concurrent.futures.Future
+    with its result, so model loading overlaps window discovery and the first capture.
+    """
+    future = Future()
+
+    def run():
         try:
-            from paddleocr import PaddleOCR
-            print(f"DEBUG (recognizer): Initializing PaddleOCR with use_gpu={use_gpu_flag}, lang='{lang}'...")
-            # show_log=True 可以看到PaddleOCR更详细的内部日志，调试时有用
-            _paddle_ocr_instance = PaddleOCR(use_angle_cls=use_angle_cls, lang=lang, use_gpu=use_gpu_flag, show_log=False)
-            print("DEBUG (recognizer): PaddleOCR instance initialized successfully.")
-        except ImportError:
-            print("ERROR (recognizer): paddleocr library not found. Please run 'pip install paddleocr'")
-            _paddle_ocr_instance = "error" 
+            future.set_result(warm_up_ocr(lang, use_gpu_flag))
         except Exception as e:
-            print(f"ERROR (recognizer): Failed to initialize PaddleOCR - {e}")
-            _paddle_ocr_instance = "error"
-    return _paddle_ocr_instance is not None and _paddle_ocr_instance != "error"
+            future.set_exception(e)
+
+    threading.Thread(target=run, name='ocr-warmup', daemon=True).start()
+    return future
 
-def recognize_text_with_paddle(image_bgr, lang='ch', detail=0, use_gpu_flag=True):
+@span('ocr.recognize')
+def recognize_text_with_paddle(image_bgr, lang='ch', detail=0, use_gpu_flag=True, use_cache=True):
     """
     Recognizes text from BGR NumPy array using PaddleOCR with its default capabilities.
+    Results are served from the module-level OcrResultCache when the same crop was seen before.
     """
     if not initialize_paddle_ocr(lang=lang, use_gpu_flag=use_gpu_flag):
         # print("ERROR (recognizer): PaddleOCR not initialized or init failed during recognize call.")
@@ -36,17 +230,405 @@ def recognize_text_with_paddle(image_bgr, lang='ch', detail=0, use_gpu_flag=True
         # print("ERROR (recognizer): Invalid image data or PaddleOCR engine error for paddle.")
         return "" 
 
+    cache = _ocr_cache if use_cache else None
+    cache_namespace = ('paddle', lang, detail)
+    if cache is not None:
+        found, cached_value = cache.get(image_bgr, cache_namespace)
+        if found:
+            return cached_value
+
     # 直接将原始BGR图像块传递给PaddleOCR
     # cv2.imwrite("debug_paddle_direct_input_to_ocr.png", image_bgr) # DEBUG: 保存实际送入OCR的图像
 
-    result = _paddle_ocr_instance.ocr(image_bgr, cls=True) # cls=True is generally recommended
+    with _paddle_inference_lock:
+        result = _paddle_ocr_instance.ocr(image_bgr, cls=True) # cls=True is generally recommended
 
     if not result or not result[0]: # result might be [None] or [[]] if nothing found
-        return "" 
-
-    if detail == 1: # 如果调用者需要详细结果（包括坐标和置信度）
-        return result[0] 
+        value = ""
+    elif detail == 1: # 如果调用者需要详细结果（包括坐标和置信度）
+        value = result[0]
     else:
         # 提取所有识别到的文本并用空格拼接
         texts = [line[1][0] for line in result[0] if line and len(line) >= 2 and isinstance(line[1], (tuple, list)) and len(line[1]) >= 1]
-        return " ".join(texts).strip()
\ No newline at end of file
+        value = " ".join(texts).strip()
+
+    if cache is not None:
+        cache.put(image_bgr, value, cache_namespace)
+    return value
+
+@span('ocr.engine_batch')
+def _run_recognizer_batch(crops):
+    with _paddle_inference_lock:
+        return _run_recognizer_batch_locked(crops)
+
+
+def _run_recognizer_batch_locked(crops):
+    # 只跑识别模型：跳过文本检测和方向分类，所有截图块作为一个批次送入识别器
+    text_recognizer = getattr(_paddle_ocr_instance, 'text_recognizer', None)
+    if text_recognizer is not None:
+        rec_res, _ = text_recognizer(list(crops))
+        return [(str(text), float(score)) for text, score in rec_res]
+
+    # 旧版本 PaddleOCR 没有暴露 text_recognizer 时，逐块调用 det=False 的识别
+    outputs = []
+    for crop in crops:
+        result = _paddle_ocr_instance.ocr(crop, det=False, cls=False)
+        if result and result[0]:
+            text, score = result[0][0]
+            outputs.append((str(text), float(score)))
+        else:
+            outputs.append(("", 0.0))
+    return outputs
+
+
+@span('ocr.recognize_lines')
+def recognize_lines_batch(crops, lang='ch', use_gpu_flag=True, use_cache=True):
+    """
+    Recognition-only OCR for crops that already contain a single tight line of text
+    (the tasktype ROI, grouped NPC-name blobs, ...).
+
+    Skips PaddleOCR's detector and angle classifier and sends every uncached crop through the
+    recognizer as one batch. When a glyph recognizer is configured (configure_glyph_recognizer),
+    crops it reads with enough confidence never reach PaddleOCR.
+
+    Returns a list with one (text, confidence) tuple per input crop, in input order.
+    Invalid crops and engine failures yield ("", 0.0).
+    """
+    crops = list(crops)
+    results = [("", 0.0)] * len(crops)
+    if not crops:
+        return results
+
+    cache = _ocr_cache if use_cache else None
+    cache_namespace = ('paddle_rec', lang)
+    # 字形识别器和它的缓存命名空间一起读取，热重载时不会把新图集的结果存进旧命名空间
+    glyph_recognizer, glyph_namespace = _glyph_recognizer, _glyph_cache_namespace
+    pending_indices = []
+    for index, crop in enumerate(crops):
+        if crop is None or crop.size == 0:
+            continue
+        if cache is not None:
+            if glyph_recognizer is not None:
+                found, cached_value = cache.get(crop, glyph_namespace)
+                if found:
+                    results[index] = cached_value
+                    continue
+            found, cached_value = cache.get(crop, cache_namespace)
+            if found:
+                results[index] = cached_value
+                continue
+        if glyph_recognizer is not None:
+            # 点阵字体快速路径：置信度足够时直接采用，否则仍交给 PaddleOCR
+            glyph_result = glyph_recognizer.recognize_line(crop)
+            if glyph_result[1] >= glyph_recognizer.min_confidence:
+                results[index] = glyph_result
+                if cache is not None:
+                    cache.put(crop, glyph_result, glyph_namespace)
+                continue
+        pending_indices.append(index)
+
+    if not pending_indices:
+        return results
+
+    if not initialize_paddle_ocr(lang=lang, use_gpu_flag=use_gpu_flag):
+        return results
+
+    try:
+        batch_outputs = _run_recognizer_batch([crops[i] for i in pending_indices])
+    except Exception:
+        return results
+
+    for index, output in zip(pending_indices, batch_outputs):
+        results[index] = output
+        if cache is not None:
+            cache.put(crops[index], output, cache_namespace)
+    return results
+
+
+
+class _BatchingOcrService(abc.ABC):
+    """
+    Shared front end of the OCR services: callers submit crops and get futures back, a dispatcher
+    thread groups requests that arrive within batch_window seconds (up to max_batch_size crops)
+    into one batch and hands it to _dispatch_batch().
+
+    Each future resolves to the same (text, confidence) tuple recognize_lines_batch returns.
+    """
+
+    def __init__(self, batch_window=0.005, max_batch_size=16, use_cache=True, lang='ch'):
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.use_cache = use_cache
+        self._cache_namespace = ('paddle_rec', lang) # 与 recognize_lines_batch 共用缓存条目
+        self._submissions = queue.Queue()
+        self._pending = {} # batch_id -> [(future, crop), ...]
+        self._pending_lock = threading.Lock()
+        self._batch_ids = itertools.count()
+        self._dispatcher = None
+        self._closed = False
+        self._error = None # 后端失效的原因；设置后所有请求立即失败
+        self.batches_sent = 0
+        self.crops_sent = 0
+
+    def start(self):
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name='ocr-dispatcher', daemon=True)
+            self._dispatcher.start()
+        return self
+
+    def submit(self, crop):
+        """Queues one crop for recognition and returns a Future of (text, confidence)."""
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("OCR service is closed"))
+            return future
+        if self._error is not None:
+            future.set_exception(RuntimeError(f"OCR service failed: {self._error}"))
+            return future
+        if crop is None or crop.size == 0:
+            future.set_result(("", 0.0))
+            return future
+
+        cache = _ocr_cache if self.use_cache else None
+        if cache is not None:
+            found, cached_value = cache.get(crop, self._cache_namespace)
+            if found:
+                future.set_result(cached_value)
+                return future
+
+        self._submissions.put((future, crop))
+        return future
+
+    def submit_many(self, crops):
+        return [self.submit(crop) for crop in crops]
+
+    def recognize(self, crops, timeout=None):
+        """Blocking convenience wrapper: submits all crops and waits for their results."""
+        return [future.result(timeout) for future in self.submit_many(crops)]
+
+    def _dispatch_loop(self):
+        while True:
+            item = self._submissions.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.batch_window
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._submissions.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            batch_id = next(self._batch_ids)
+            with self._pending_lock:
+                self._pending[batch_id] = batch
+            self.batches_sent += 1
+            self.crops_sent += len(batch)
+            try:
+                if self._error is not None:
+                    raise RuntimeError(self._error)
+                self._dispatch_batch(batch_id, [crop for _, crop in batch])
+            except Exception as e:
+                self._complete_batch(batch_id, None, repr(e))
+            if stop:
+                break
+
+    def _complete_batch(self, batch_id, outputs, error):
+        with self._pending_lock:
+            batch = self._pending.pop(batch_id, None)
+        if batch is None:
+            return
+        cache = _ocr_cache if self.use_cache else None
+        for index, (future, crop) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None or outputs is None or index >= len(outputs):
+                future.set_exception(RuntimeError(f"OCR batch failed: {error}"))
+                continue
+            future.set_result(outputs[index])
+            if cache is not None:
+                cache.put(crop, outputs[index], self._cache_namespace)
+
+    @abc.abstractmethod
+    def _dispatch_batch(self, batch_id, crops):
+        """Sends one batch to the backend; the backend must eventually call _complete_batch(batch_id, ...)."""
+
+    def _stop_backend(self):
+        pass
+
+    def _fail_pending(self, message):
+        with self._pending_lock:
+            batches = list(self._pending.values())
+            self._pending.clear()
+        for batch in batches:
+            for future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError(message))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._submissions.put(None)
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        self._stop_backend()
+        self._fail_pending("OCR service closed before the request completed")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def stats(self):
+        return {
+            'batches_sent': self.batches_sent,
+            'crops_sent': self.crops_sent,
+            'mean_batch_size': (self.crops_sent / self.batches_sent) if self.batches_sent else 0.0,
+        }
+
+
+class LocalOcrService(_BatchingOcrService):
+    """
+    In-process stand-in for OcrService with the same submit/future interface.
+
+    Batches are recognized on the dispatcher thread by recognize_fn (defaults to
+    recognize_lines_batch), so tests and replay runs can inject a fake engine.
+    """
+
+    def __init__(self, recognize_fn=None, batch_window=0.005, max_batch_size=16, use_cache=True):
+        super().__init__(batch_window, max_batch_size, use_cache)
+        self.recognize_fn = recognize_fn or (lambda crops: recognize_lines_batch(crops, use_cache=False))
+
+    def _dispatch_batch(self, batch_id, crops):
+        self._complete_batch(batch_id, self.recognize_fn(crops), None)
+
+
+def _ocr_worker_main(request_queue, result_queue, lang, use_gpu_flag):
+    # 子进程入口：每个工作进程持有自己的 PaddleOCR 实例
+    ready = initialize_paddle_ocr(lang=lang, use_gpu_flag=use_gpu_flag, use_angle_cls=False)
+    result_queue.put(('ready', os.getpid(), ready))
+    while True:
+        item = request_queue.get()
+        if item is None:
+            break
+        batch_id, crops = item
+        try:
+            outputs = recognize_lines_batch(crops, lang=lang, use_gpu_flag=use_gpu_flag, use_cache=False)
+            result_queue.put((batch_id, outputs, None))
+        except Exception as e:
+            result_queue.put((batch_id, None, repr(e)))
+
+
+class OcrService(_BatchingOcrService):
+    """
+    Out-of-process OCR: num_workers worker processes, each with its own initialized PaddleOCR
+    engine, pull micro-batches from a shared request queue. The control loop only submits crops
+    and collects futures, so capture and input keep running while OCR saturates the other cores.
+    """
+
+    def __init__(self, num_workers=2, lang='ch', use_gpu_flag=False,
+                 batch_window=0.005, max_batch_size=16, use_cache=True):
+        super().__init__(batch_window, max_batch_size, use_cache, lang)
+        self.num_workers = num_workers
+        self.lang = lang
+        self.use_gpu_flag = use_gpu_flag
+        # spawn: PaddleOCR / OpenCV 的线程池在 fork 之后不安全
+        self._mp_context = multiprocessing.get_context('spawn')
+        self._request_queue = self._mp_context.Queue()
+        self._result_queue = self._mp_context.Queue()
+        self._workers = []
+        self._collector = None
+        self._ready_workers = 0
+        self._ready_event = threading.Event()
+        self.liveness_interval = 0.5 # 收集线程空闲时检查工作进程是否存活的间隔 (秒)
+
+    def start(self):
+        if self._workers:
+            return self
+        for index in range(self.num_workers):
+            worker = self._mp_context.Process(
+                target=_ocr_worker_main,
+                args=(self._request_queue, self._result_queue, self.lang, self.use_gpu_flag),
+                name=f'ocr-worker-{index}',
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        self._collector = threading.Thread(target=self._collect_loop, name='ocr-collector', daemon=True)
+        self._collector.start()
+        return super().start()
+
+    def wait_until_ready(self, timeout=None):
+        """
+        Blocks until every worker has finished loading its model. Returns False on timeout and
+        raises RuntimeError if a worker failed to load its model or exited.
+        """
+        ready = self._ready_event.wait(timeout)
+        if self._error is not None:
+            raise RuntimeError(f"OCR service failed: {self._error}")
+        return ready
+
+    def _dispatch_batch(self, batch_id, crops):
+        self._request_queue.put((batch_id, crops))
+
+    def _collect_loop(self):
+        while True:
+            try:
+                message = self._result_queue.get(timeout=self.liveness_interval)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if message is None:
+                break
+            if message[0] == 'ready':
+                _, pid, ok = message
+                if not ok:
+                    self._fail_service(f"worker {pid} failed to load the OCR model")
+                    continue
+                self._ready_workers += 1
+                if self._ready_workers >= self.num_workers:
+                    self._ready_event.set()
+                continue
+            batch_id, outputs, error = message
+            self._complete_batch(batch_id, outputs, error)
+            self._check_workers()
+
+    def _check_workers(self):
+        # 关闭过程中工作进程正常退出，不算失效
+        if self._closed or self._error is not None:
+            return
+        for worker in self._workers:
+            if not worker.is_alive():
+                self._fail_service(f"{worker.name} exited with code {worker.exitcode}")
+                return
+
+    def _fail_service(self, message):
+        # 无法知道失效的工作进程当时在处理哪个批次，所有已派发的请求都以异常结束
+        if self._error is None:
+            self._error = message
+            logger.error("OCR service failed: %s", message)
+        self._fail_pending(f"OCR service failed: {message}")
+        self._ready_event.set() # 唤醒 wait_until_ready，由它抛出异常
+
+    def _stop_backend(self, timeout=5.0):
+        # 工作进程按顺序处理完已派发的批次后才会读到结束标记
+        for _ in self._workers:
+            self._request_queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+        self._result_queue.put(None)
+        if self._collector is not None:
+            self._collector.join(timeout)
+        self._workers = []
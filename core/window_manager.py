@@ -1,56 +1,85 @@
 # core/window_manager.py
-import pyautogui
+import logging
+import threading
 
-def find_game_window(title_pattern, expected_width, expected_height):
+try:
+    import pyautogui # 没有桌面环境 (Linux 构建机/CI) 时不可用，只能使用 FakeWindowTracker
+except ImportError:
+    pyautogui = None
+
+logger = logging.getLogger(__name__)
+
+def find_game_windows(title_pattern, expected_width, expected_height):
     """
-    Finds a game window by title pattern and expected dimensions.
-    No caching is used in this version for direct debugging.
+    Finds every window matching the title pattern and expected dimensions (±5 px),
+    in the order pyautogui reports them.
     """
-    print(f"DEBUG (wm): Entering find_game_window, title_pattern='{title_pattern}', expected_size={expected_width}x{expected_height}")
+    logger.debug("Entering find_game_windows, title_pattern='%s', expected_size=%sx%s", title_pattern, expected_width, expected_height)
 
-    found_window_obj = None
+    if pyautogui is None:
+        logger.debug("pyautogui is not available, no live windows can be enumerated.")
+        return []
 
     # pyautogui.getWindowsWithTitle 可能会抛出异常，但根据原则我们不在这里try-except
     windows = pyautogui.getWindowsWithTitle(title_pattern)
     if not windows:
-        print("DEBUG (wm): pyautogui.getWindowsWithTitle returned no windows.")
-        return None
+        logger.debug("pyautogui.getWindowsWithTitle returned no windows.")
+        return []
 
-    print(f"DEBUG (wm): pyautogui.getWindowsWithTitle found {len(windows)} window(s).")
+    logger.debug("pyautogui.getWindowsWithTitle found %s window(s).", len(windows))
     candidate_windows = []
     for i, window in enumerate(windows):
         win_title = getattr(window, 'title', 'N/A')
         win_width = getattr(window, 'width', 0)
         win_height = getattr(window, 'height', 0)
 
-        print(f"DEBUG (wm):  Checking candidate {i+1}: '{win_title}', W={win_width}, H={win_height}")
+        logger.debug("  Checking candidate %s: '%s', W=%s, H=%s", i+1, win_title, win_width, win_height)
 
         if not (win_width > 0 and win_height > 0):
-            print(f"DEBUG (wm):    Candidate {i+1} has invalid dimensions, skipping.")
+            logger.debug("   Candidate %s has invalid dimensions, skipping.", i+1)
             continue
 
         width_match = abs(win_width - expected_width) <= 5
         height_match = abs(win_height - expected_height) <= 5
 
-        print(f"DEBUG (wm):    Candidate {i+1} - Width match ({win_width} vs {expected_width}): {width_match}, "
-              f"Height match ({win_height} vs {expected_height}): {height_match}")
+        logger.debug("   Candidate %s - Width match (%s vs %s): %s, Height match (%s vs %s): %s",
+                     i+1, win_width, expected_width, width_match, win_height, expected_height, height_match)
 
         if width_match and height_match:
-            print(f"DEBUG (wm):    Candidate {i+1} dimensions match!")
+            logger.debug("   Candidate %s dimensions match!", i+1)
             candidate_windows.append(window)
         else:
-            print(f"DEBUG (wm):    Candidate {i+1} dimensions do not match, skipping.")
+            logger.debug("   Candidate %s dimensions do not match, skipping.", i+1)
 
     if not candidate_windows:
-        print("DEBUG (wm): No candidate windows passed the dimension filter.")
+        logger.debug("No candidate windows passed the dimension filter.")
+    else:
+        logger.debug("%s candidate window(s) passed dimension filter.", len(candidate_windows))
+    return candidate_windows
+
+def find_game_window(title_pattern, expected_width, expected_height, window_handle=None):
+    """
+    Finds a game window by title pattern and expected dimensions.
+    Returns the first candidate, or the candidate whose native handle equals window_handle.
+    """
+    candidate_windows = find_game_windows(title_pattern, expected_width, expected_height)
+    if window_handle is not None:
+        candidate_windows = [w for w in candidate_windows if get_window_handle(w) == window_handle]
+    if not candidate_windows:
         return None
 
-    print(f"DEBUG (wm): {len(candidate_windows)} candidate window(s) passed dimension filter.")
     found_window_obj = candidate_windows[0] 
-    print(f"DEBUG (wm): Selected window: '{getattr(found_window_obj, 'title', 'N/A')}'")
+    logger.debug("Selected window: '%s'", getattr(found_window_obj, 'title', 'N/A'))
 
     return found_window_obj
 
+def get_window_handle(window_object):
+    """
+    Returns the native window handle (HWND on Windows) of a pygetwindow window, or None.
+    Handles are plain integers, so they can be passed to worker processes.
+    """
+    return getattr(window_object, '_hWnd', None)
+
 def activate_window(window_object):
     """
     Activates the specified window object.
@@ -70,6 +99,18 @@ def activate_window(window_object):
         return True
     return False
 
+def is_window_active(window_object):
+    """
+    Returns True if the window reports itself as the foreground window.
+    Windows that do not expose isActive are assumed to be active.
+    """
+    if window_object is None:
+        return False
+    try:
+        return bool(getattr(window_object, 'isActive', True))
+    except Exception:
+        return False # 句柄已失效
+
 def get_window_rect(window_object):
     """
     Gets the screen rectangle (left, top, width, height) of the window object.
@@ -81,4 +122,174 @@ def get_window_rect(window_object):
        hasattr(window_object, 'width') and \
        hasattr(window_object, 'height'):
         return (window_object.left, window_object.top, window_object.width, window_object.height)
-    return None
\ No newline at end of file
+    return None
+
+def _read_window_geometry(window_object):
+    # pygetwindow 的 box 属性一次系统调用取回全部几何信息；逐个读 left/top/width/height 会各调用一次
+    try:
+        box = getattr(window_object, 'box', None)
+        if box is not None:
+            return (box[0], box[1], box[2], box[3])
+        return get_window_rect(window_object)
+    except Exception:
+        return None # 句柄已失效 (窗口被关闭) 时 pygetwindow 可能抛出异常
+
+
+class GameWindowTracker:
+    """
+    Caches the resolved game window and its rects across ticks.
+
+    Each call to get_window_rect() re-reads the cached handle's geometry only; the window list is
+    re-enumerated with find_game_window() only when the handle disappears or its size no longer
+    matches the expected dimensions. With window_handle set, only that specific window is
+    tracked (multi-client mode). Listeners registered with add_listener() are called as
+    listener(old_rect, new_rect) whenever the window rect changes (including the first resolve).
+
+    Thread-safe: the run loop refreshes the cache while the input executor thread reads the window
+    (ArbitratedInput's window_provider), so refresh and read happen under one lock and get_window()
+    returns the handle resolved by its own refresh.
+    """
+
+    def __init__(self, title_pattern, expected_width, expected_height,
+                 client_offset_x=0, client_offset_y=0, client_width=None, client_height=None,
+                 size_tolerance=5, window_handle=None):
+        self.title_pattern = title_pattern
+        self.expected_width = expected_width
+        self.expected_height = expected_height
+        self.client_offset_x = client_offset_x
+        self.client_offset_y = client_offset_y
+        self.client_width = client_width
+        self.client_height = client_height
+        self.size_tolerance = size_tolerance
+        self.window_handle = window_handle # 多客户端模式下固定跟踪某一个窗口句柄
+        self.window = None
+        self.window_rect = None
+        self._listeners = []
+        self.validations = 0
+        self.enumerations = 0
+        self.rect_changes = 0
+        self._lock = threading.RLock() # 可重入：监听器里可以再次读取 tracker
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _geometry_is_valid(self, rect):
+        if rect is None:
+            return False
+        _, _, width, height = rect
+        return abs(width - self.expected_width) <= self.size_tolerance and \
+               abs(height - self.expected_height) <= self.size_tolerance
+
+    def _set_rect(self, new_rect):
+        old_rect = self.window_rect
+        self.window_rect = new_rect
+        if new_rect != old_rect:
+            self.rect_changes += 1
+            for listener in list(self._listeners):
+                listener(old_rect, new_rect)
+
+    def invalidate(self):
+        """Forgets the cached handle; the next call re-enumerates windows."""
+        with self._lock:
+            self.window = None
+
+    def _find_window(self):
+        return find_game_window(self.title_pattern, self.expected_width, self.expected_height,
+                                window_handle=self.window_handle)
+
+    def get_window(self):
+        with self._lock:
+            self.get_window_rect()
+            return self.window
+
+    def get_window_rect(self):
+        """
+        Returns the (left, top, width, height) of the tracked window, or None if no matching
+        window exists.
+        """
+        with self._lock:
+            if self.window is not None:
+                self.validations += 1
+                rect = _read_window_geometry(self.window)
+                if self._geometry_is_valid(rect):
+                    self._set_rect(rect)
+                    return rect
+                self.window = None
+
+            self.enumerations += 1
+            self.window = self._find_window()
+            rect = _read_window_geometry(self.window) if self.window is not None else None
+            self._set_rect(rect)
+            return rect
+
+    def get_client_rect(self):
+        """
+        Returns the game client area (x, y, w, h) in screen coordinates, derived from the
+        window rect and the configured client offsets, or None if the window is gone.
+        """
+        rect = self.get_window_rect()
+        if rect is None:
+            return None
+        width = self.client_width if self.client_width is not None else rect[2] - self.client_offset_x
+        height = self.client_height if self.client_height is not None else rect[3] - self.client_offset_y
+        return (rect[0] + self.client_offset_x, rect[1] + self.client_offset_y, width, height)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'validations': self.validations,
+                'enumerations': self.enumerations,
+                'rect_changes': self.rect_changes,
+            }
+
+
+class FakeGameWindow:
+    """
+    Stand-in for a pygetwindow window with a fixed geometry, for headless replay.
+    Exposes the attributes the rest of the code reads (title, box, left/top/width/height, _hWnd)
+    and no-op activate()/restore()/focus().
+    """
+
+    def __init__(self, title, left, top, width, height, handle=0):
+        self.title = title
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self._hWnd = handle
+        self.isActive = True
+        self.isMinimized = False
+
+    @property
+    def box(self):
+        return (self.left, self.top, self.width, self.height)
+
+    def moveTo(self, left, top):
+        self.left, self.top = left, top
+
+    def activate(self):
+        self.isActive = True
+
+    def restore(self):
+        self.isMinimized = False
+
+    def focus(self):
+        pass
+
+
+class FakeWindowTracker(GameWindowTracker):
+    """
+    GameWindowTracker that "finds" a FakeGameWindow instead of enumerating desktop windows,
+    so the run loop can drive recorded sessions on machines without a game client or display.
+    """
+
+    def __init__(self, title_pattern, expected_width, expected_height, window=None, **kwargs):
+        super().__init__(title_pattern, expected_width, expected_height, **kwargs)
+        self.fake_window = window or FakeGameWindow(title_pattern, 0, 0, expected_width, expected_height)
+
+    def _find_window(self):
+        return self.fake_window
@@ -1,94 +1,525 @@
-import pyautogui
-import cv2
-import numpy as np
+import time
+_PROCESS_STARTED_AT = time.perf_counter() # 启动耗时报告的起点
+
 import os
-import configparser
 import sys
+import argparse
+import importlib
+import logging
+from collections import deque
 
-# 导入我们重构后的模块
-from core.window_manager import find_game_window, activate_window, get_window_rect
-from core.screen_capture import capture_screen_area
-# image_matcher, color_filter, text_recognizer 会在任务处理器中导入
-from core.input_simulator import click_screen_coords # 或整个模块
+# 这里只导入轻量模块。cv2 / numpy / pyautogui 以及依赖它们的 core 模块在各函数内部按需导入，
+# 这样 OCR 模型可以在这些导入进行的同时就开始在后台加载 (见 start_ocr_warmup)
+from core.metrics import span, percentile, get_registry, export_json, start_http_exporter
 
-def run_automation():
-    print("自动化脚本启动 (极致精简版 V2)...")
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 
-    project_root = os.path.dirname(os.path.abspath(__file__))
-    config = configparser.ConfigParser()
+logger = logging.getLogger(__name__)
 
-    config_files_to_load = [
-        "settings_general.ini",
-        "settings_ui_layout.ini",
-        "settings_ocr.ini",
-        "task_keywords.ini"
-    ]
-    loaded_file_paths_for_config_read = [os.path.join(project_root, "config", fname) for fname in config_files_to_load]
+# 已注册的任务处理器: (任务名, tasks 目录下的模块名, 处理函数名)。
+# 每个处理器的签名都是 processor(context, input_sim) -> status，所有处理器共享同一帧的 FrameContext。
+TASK_PROCESSORS = [
+    ('jianduoshiguang', 'jianduoshiguang_processor', 'process_jianduoshiguang'),
+]
 
-    successfully_read_files = config.read(loaded_file_paths_for_config_read, encoding='utf-8')
-    print(f"已加载配置文件: {', '.join([os.path.basename(f) for f in successfully_read_files]) if successfully_read_files else '无或读取失败'}")
 
-    if not config.has_section('paths'):
-        config.add_section('paths')
-    config.set('paths', 'projectroot', project_root)
+class StartupTimer:
+    """
+    启动耗时报告：记录各阶段 (导入、配置、窗口、首帧截图、首帧处理) 相对进程启动的时间点，
+    以及后台 OCR 模型加载/预热的耗时。各时间点同时记入指标 'startup.<阶段>'。
+    """
 
-    window_title = config.get('gamewindow', 'titlepattern') 
-    expected_w = config.getint('gamewindow', 'expectedwidth')
-    expected_h = config.getint('gamewindow', 'expectedheight')
+    def __init__(self, started_at=_PROCESS_STARTED_AT):
+        self.started_at = started_at
+        self.marks = []
+        self.ocr_warmup = None # start_ocr_warmup() 返回的 Future
+        self.reported = False
+
+    def mark(self, name):
+        elapsed = time.perf_counter() - self.started_at
+        self.marks.append((name, elapsed))
+        get_registry().observe(f"startup.{name}", elapsed)
+
+    def format_report(self):
+        parts = [f"{name}={elapsed * 1000:.0f}ms" for name, elapsed in self.marks]
+        if self.ocr_warmup is not None:
+            if self.ocr_warmup.done() and self.ocr_warmup.exception() is None:
+                result = self.ocr_warmup.result()
+                parts.append(f"ocr_model_load={result['model_load_s'] * 1000:.0f}ms "
+                             f"ocr_warmup={result['warmup_s'] * 1000:.0f}ms (后台{'' if result['ok'] else '，失败'})")
+            else:
+                parts.append("ocr_model_load=进行中 (后台)")
+        return " ".join(parts)
+
+    def report_once(self):
+        if not self.reported:
+            self.reported = True
+            print(f"[startup] {self.format_report()}")
+
+
+_startup = StartupTimer()
+
+
+def _ocr_cache_params(settings):
+    return (settings.ocr_cache_max_entries, settings.ocr_cache_ttl_seconds, settings.ocr_cache_phash_tolerance)
+
+
+def _glyph_params(settings):
+    return (settings.glyph_atlas_path, settings.glyph_min_confidence)
+
+
+def _apply_runtime_settings(old_settings, new_settings):
+    from core.text_recognizer import configure_ocr_cache, configure_glyph_recognizer
+    # 只有 OCR 缓存参数真正变化时才重建缓存，避免每次热重载都清空已缓存的结果
+    if old_settings is None or _ocr_cache_params(old_settings) != _ocr_cache_params(new_settings):
+        configure_ocr_cache(*_ocr_cache_params(new_settings))
+    if old_settings is None or _glyph_params(old_settings) != _glyph_params(new_settings):
+        configure_glyph_recognizer(*_glyph_params(new_settings))
+
+
+def load_settings_store(project_root=PROJECT_ROOT):
+    """
+    编译全部 INI 配置文件，返回可热重载的 SettingsStore。
+
+    返回:
+    - SettingsStore: 已加载的配置仓库。
+    - None: 配置无效 (错误信息已打印)。
+    """
+    from core.config_loader import SettingsStore, ConfigValidationError
+    store = SettingsStore(project_root)
+    store.add_listener(_apply_runtime_settings)
+    try:
+        store.load()
+    except ConfigValidationError as e:
+        print(f"错误：配置文件无效 - {e}")
+        return None
+
+    loaded_files = [os.path.basename(path) for path, mtime in store.current.source_mtimes.items() if mtime is not None]
+    print(f"已加载配置文件: {', '.join(loaded_files) if loaded_files else '无或读取失败'}")
+    return store
+
+
+# 窗口报告已激活后，游戏还需要一点时间重绘前台画面，之后再截第一帧
+ACTIVATION_SETTLE_SECONDS = 0.2
+
+
+def activate_and_settle(window):
+    """激活窗口，等它到前台 (最多 0.5 秒)，再固定等待 ACTIVATION_SETTLE_SECONDS 让画面稳定。"""
+    from core.window_manager import activate_window, is_window_active
+    from core.screen_wait import wait_for
+    activate_window(window)
+    wait_for(lambda: is_window_active(window), timeout=0.5)
+    time.sleep(ACTIVATION_SETTLE_SECONDS)
 
-    game_window = find_game_window(window_title, expected_w, expected_h)
-    if game_window is None: # 明确检查 None
-        print(f"错误：未能找到标题为 '{window_title}' 的游戏窗口，脚本终止。")
-        return
 
-    activate_window(game_window) 
-    pyautogui.sleep(0.2) 
+def find_configured_game_window(settings):
+    from core.window_manager import find_game_window
+    expected_w, expected_h = settings.expected_window_size
+    return find_game_window(settings.window_title, expected_w, expected_h)
 
-    window_abs_rect = get_window_rect(game_window) 
+
+def build_window_tracker(settings, window_handle=None, fake=False):
+    """
+    根据配置创建 GameWindowTracker，窗口句柄和客户端矩形在各 tick 之间缓存。
+    fake=True 时创建 FakeWindowTracker，不枚举桌面窗口 (回放模式)。
+    """
+    from core.window_manager import GameWindowTracker, FakeWindowTracker
+    expected_w, expected_h = settings.expected_window_size
+    tracker_class = FakeWindowTracker if fake else GameWindowTracker
+    return tracker_class(
+        settings.window_title,
+        expected_w,
+        expected_h,
+        client_offset_x=settings.client_offset[0],
+        client_offset_y=settings.client_offset[1],
+        client_width=settings.client_size[0],
+        client_height=settings.client_size[1],
+        window_handle=window_handle
+    )
+
+
+def get_game_client_rect(settings, game_window):
+    """根据窗口外部矩形和配置中的偏移，计算游戏内部画面在屏幕上的绝对矩形。"""
+    from core.window_manager import get_window_rect
+    window_abs_rect = get_window_rect(game_window)
     if window_abs_rect is None: # 明确检查 None
-        print("错误：未能获取游戏窗口的屏幕矩形，脚本终止。")
+        return None
+
+    game_client_abs_x = window_abs_rect[0] + settings.client_offset[0]
+    game_client_abs_y = window_abs_rect[1] + settings.client_offset[1]
+    return (game_client_abs_x, game_client_abs_y) + tuple(settings.client_size)
+
+
+def load_task_processors(project_root=PROJECT_ROOT):
+    """按 TASK_PROCESSORS 的顺序导入所有任务处理器，返回 [(任务名, 处理函数)]。"""
+    tasks_dir = os.path.join(project_root, 'tasks')
+    if tasks_dir not in sys.path:
+        sys.path.append(tasks_dir)
+
+    processors = []
+    for task_name, module_name, function_name in TASK_PROCESSORS:
+        module = importlib.import_module(module_name)
+        processors.append((task_name, getattr(module, function_name)))
+    return processors
+
+
+def run_task_processors(context, processors, input_sim):
+    """
+    对同一个 FrameContext 依次运行所有处理器。
+    标题匹配、ROI、颜色块、OCR 等共享的派生数据每帧只计算一次，后面的处理器直接复用。
+
+    返回:
+    - dict: 任务名 -> 处理状态。
+    """
+    statuses = {}
+    for task_name, processor in processors:
+        with span(f"task.{task_name}"):
+            statuses[task_name] = processor(context, input_sim)
+    return statuses
+
+
+def _format_context_stats(context):
+    items = sorted(context.stats().items(), key=lambda item: -item[1]['compute_ms'])
+    return ", ".join(f"{'/'.join(map(str, name)) if isinstance(name, tuple) else name}: {s['compute_ms']:.1f}ms x{s['hits']} hits (saved {s['saved_ms']:.1f}ms)"
+                     for name, s in items)
+
+
+def run_automation():
+    print("自动化脚本启动 (极致精简版 V2)...")
+
+    from core.screen_capture import capture_screen_area
+    from core.frame_context import FrameContext
+
+    settings_store = load_settings_store()
+    if settings_store is None:
+        return
+    settings = settings_store.current
+    _startup.mark('settings')
+
+    game_window = find_configured_game_window(settings)
+    if game_window is None: # 明确检查 None
+        print(f"错误：未能找到标题为 '{settings.window_title}' 的游戏窗口，脚本终止。")
         return
+    _startup.mark('window')
 
-    client_offset_x = config.getint('screencapture', 'clientareaoffsetx') 
-    client_offset_y = config.getint('screencapture', 'clientareaoffsety')
-    client_width = config.getint('screencapture', 'clientareawidth')
-    client_height = config.getint('screencapture', 'clientareaheight')
+    activate_and_settle(game_window)
 
-    game_client_abs_x = window_abs_rect[0] + client_offset_x
-    game_client_abs_y = window_abs_rect[1] + client_offset_y
-    game_client_abs_rect = (game_client_abs_x, game_client_abs_y, client_width, client_height)
+    game_client_abs_rect = get_game_client_rect(settings, game_window)
+    if game_client_abs_rect is None: # 明确检查 None
+        print("错误：未能获取游戏窗口的屏幕矩形，脚本终止。")
+        return
 
     print(f"游戏内部画面在屏幕上的绝对矩形: {game_client_abs_rect}")
 
-    main_game_image_bgr = capture_screen_area(game_client_abs_x, game_client_abs_y, client_width, client_height)
+    main_game_image_bgr = capture_screen_area(*game_client_abs_rect)
     if main_game_image_bgr is None:
         print("错误：截取游戏内部画面失败，脚本终止。")
         return
+    _startup.mark('first_capture')
     print("游戏内部画面已截图。")
-    # cv2.imwrite(os.path.join(project_root, "debug_main_game_screen.png"), main_game_image_bgr)
-
-    tasks_dir = os.path.join(project_root, 'tasks')
-    if tasks_dir not in sys.path:
-        sys.path.append(tasks_dir)
+    # cv2.imwrite(os.path.join(PROJECT_ROOT, "debug_main_game_screen.png"), main_game_image_bgr)
 
-    from jianduoshiguang_processor import process_jianduoshiguang 
+    processors = load_task_processors()
 
     print("-" * 30)
-    print("开始处理 '见多识广' 类型任务 (调用处理器)...")
+    print(f"开始处理任务 (调用 {len(processors)} 个处理器)...")
 
-    import core.input_simulator as input_sim 
+    import core.input_simulator as input_sim
 
-    task_status = process_jianduoshiguang(
-        main_game_image_bgr,
-        game_client_abs_rect, 
-        config,              
-        input_sim            
-    )
+    context = FrameContext(main_game_image_bgr, game_client_abs_rect, settings)
+    task_statuses = run_task_processors(context, processors, input_sim)
+    _startup.mark('first_frame')
 
     print("-" * 30)
-    print(f"'见多识广' 任务处理完成，状态: {task_status}")
+    for task_name, task_status in task_statuses.items():
+        print(f"任务 '{task_name}' 处理完成，状态: {task_status}")
+    print(f"帧上下文缓存: {_format_context_stats(context)}")
+    _startup.report_once()
+
+
+class LoopStats:
+    """连续运行模式的统计：实际帧率、被跳过的 tick 数和最近 window 个 tick 的耗时分位数。"""
+
+    def __init__(self, window=1000):
+        self.latencies = deque(maxlen=window)
+        self.ticks = 0
+        self.skipped_ticks = 0
+        self.overruns = 0
+        self.context_saved_seconds = 0.0 # FrameContext 缓存命中累计节省的时间
+        self.started_at = time.perf_counter()
+
+    def record(self, latency):
+        self.ticks += 1
+        self.latencies.append(latency)
+
+    def record_context(self, context):
+        self.context_saved_seconds += sum(s['saved_ms'] for s in context.stats().values()) / 1000
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started_at
+        ordered = sorted(self.latencies)
+        return {
+            'ticks': self.ticks,
+            'skipped_ticks': self.skipped_ticks,
+            'overruns': self.overruns,
+            'fps': (self.ticks / elapsed) if elapsed > 0 else 0.0,
+            'p50_ms': percentile(ordered, 0.50) * 1000,
+            'p95_ms': percentile(ordered, 0.95) * 1000,
+            'p99_ms': percentile(ordered, 0.99) * 1000,
+            'context_saved_ms': self.context_saved_seconds * 1000,
+        }
+
+    def format_summary(self):
+        s = self.summary()
+        return (f"ticks={s['ticks']} fps={s['fps']:.2f} skipped={s['skipped_ticks']} overruns={s['overruns']} "
+                f"latency p50={s['p50_ms']:.1f}ms p95={s['p95_ms']:.1f}ms p99={s['p99_ms']:.1f}ms "
+                f"context_saved={s['context_saved_ms']:.1f}ms")
+
+
+def run_automation_loop(target_fps=5.0, max_ticks=None, report_interval=10.0,
+                        window_handle=None, arbiter=None, stop_event=None, status_queue=None,
+                        frame_source=None, window_tracker=None, input_sim=None, settings_store=None):
+    """
+    常驻运行模式：按固定频率循环 取帧 -> 处理器。
+
+    窗口句柄 (GameWindowTracker)、截图后端、OCR 引擎和处理器状态在所有 tick 之间复用。
+    某个 tick 超出预算 (1 / target_fps) 时，错过的 tick 直接跳过，下一次总是处理最新画面，
+    不会为了"补帧"而连续处理过时的画面。
+
+    参数:
+    - target_fps (float): 目标 tick 频率；为 0 或 None 时不等待，全速处理 (用于回放)。
+    - max_ticks (int, optional): 运行指定次数后退出，None 表示一直运行直到 Ctrl+C。
+    - report_interval (float): 打印帧率/耗时统计的间隔秒数。
+    - window_handle (int, optional): 多客户端模式下只驱动这个窗口句柄对应的客户端。
+    - arbiter (InputArbiter, optional): 多客户端模式下共享的输入仲裁器，焦点和键鼠操作都经过它串行化。
+    - stop_event (optional): 被 set() 后退出循环 (multiprocessing.Event 或 threading.Event)。
+    - status_queue (optional): 任务状态变化时放入 (window_handle, task_name, status)。
+    - frame_source (FrameSource, optional): 画面来源，默认实时截屏；回放来源读完后循环结束。
+    - window_tracker (GameWindowTracker, optional): 默认根据配置创建。
+    - input_sim (optional): 键鼠输入实现，默认 core.input_simulator (多客户端模式下为 ArbitratedInput)。
+    - settings_store (SettingsStore, optional): 已加载的配置仓库，默认调用 load_settings_store() 新建。
+
+    返回:
+    - LoopStats: 运行统计。
+    """
+    from core.frame_source import LiveScreenSource
+    from core.frame_context import FrameContext
+    from core.input_simulator import InputExecutor
+    from core.multi_client import ArbitratedInput
+
+    print(f"自动化脚本启动 (常驻模式，目标 {target_fps or '不限'} FPS)...")
+    stats = LoopStats()
+    if settings_store is None:
+        settings_store = load_settings_store()
+    if settings_store is None:
+        return stats
+    settings = settings_store.current
+    _startup.mark('settings')
+
+    if frame_source is None:
+        frame_source = LiveScreenSource()
+    if window_tracker is None:
+        window_tracker = build_window_tracker(settings, window_handle)
+    game_client_abs_rect = window_tracker.get_client_rect()
+    if game_client_abs_rect is None:
+        print(f"错误：未能找到标题为 '{settings.window_title}' 的游戏窗口，脚本终止。")
+        return stats
+    _startup.mark('window')
+    if arbiter is None and frame_source.realtime:
+        activate_and_settle(window_tracker.window)
+
+    def on_window_moved(old_rect, new_rect):
+        print(f"游戏窗口位置变化: {old_rect} -> {new_rect}")
+    window_tracker.add_listener(on_window_moved)
+
+    def on_settings_reloaded(old_settings, new_settings):
+        # 客户端区域偏移/尺寸也可以热更新
+        window_tracker.client_offset_x, window_tracker.client_offset_y = new_settings.client_offset
+        window_tracker.client_width, window_tracker.client_height = new_settings.client_size
+        input_executor.apply_settings(new_settings)
+        print("配置文件已变化，已热加载新配置。")
+    settings_store.add_listener(on_settings_reloaded)
+
+    processors = load_task_processors()
+    if input_sim is None and arbiter is not None:
+        input_sim = ArbitratedInput(arbiter, window_tracker.get_window)
+    elif input_sim is None:
+        import core.input_simulator as input_sim
+    # 处理器只把键鼠操作放进队列，由后台线程执行，不阻塞下一帧的分析
+    input_executor = InputExecutor(input_sim, zero_animation=settings.input_zero_animation,
+                                   max_frame_age=settings.input_max_frame_age).start()
+
+    period = 1.0 / target_fps if target_fps else 0.0
+    next_tick = time.perf_counter()
+    last_report = next_tick
+    last_statuses = {}
+
+    try:
+        while max_ticks is None or stats.ticks < max_ticks:
+            if stop_event is not None and stop_event.is_set():
+                break
+            now = time.perf_counter()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+
+            tick_start = time.perf_counter()
+            # 配置快照在 tick 开头取一次，整个 tick 内保持不变
+            settings_store.reload_if_changed()
+            settings = settings_store.current
+            # 只校验缓存句柄的几何信息；句柄失效或尺寸不符时 tracker 才会重新枚举窗口
+            game_client_abs_rect = window_tracker.get_client_rect()
+            if game_client_abs_rect is None:
+                next_tick = time.perf_counter() + period
+                continue
+
+            with span('capture.frame'):
+                frame = frame_source.read(game_client_abs_rect)
+            if frame is None and frame_source.exhausted:
+                break
+            if frame is not None:
+                if not _startup.reported:
+                    _startup.mark('first_capture')
+                input_executor.advance_frame(stats.ticks)
+                context = FrameContext(frame, game_client_abs_rect, settings, frame_seq=stats.ticks)
+                for task_name, status in run_task_processors(context, processors, input_executor).items():
+                    if status != last_statuses.get(task_name):
+                        print(f"任务 '{task_name}' 状态: {status}")
+                        last_statuses[task_name] = status
+                        if status_queue is not None:
+                            status_queue.put((window_handle, task_name, status))
+                stats.record_context(context)
+                if not _startup.reported:
+                    _startup.mark('first_frame')
+                    _startup.report_once()
+
+            tick_end = time.perf_counter()
+            stats.record(tick_end - tick_start)
+            get_registry().observe('loop.tick', tick_end - tick_start)
+
+            next_tick += period
+            if period and tick_end > next_tick:
+                # 超出预算：丢弃已经错过的 tick，从下一个整数周期重新对齐
+                missed = int((tick_end - next_tick) // period) + 1
+                stats.overruns += 1
+                stats.skipped_ticks += missed
+                next_tick += missed * period
+
+            if report_interval and tick_end - last_report >= report_interval:
+                print(f"[loop] {stats.format_summary()}")
+                logger.info("stages: %s", get_registry().format_summary())
+                last_report = tick_end
+    except KeyboardInterrupt:
+        print("收到中断信号，停止常驻运行。")
+        input_executor.cancel_pending()
+    finally:
+        input_executor.close()
+
+    print(f"[loop] {stats.format_summary()}")
+    return stats
+
+
+def run_replay(path, frame_size=None, loop=False, max_ticks=None, target_fps=0, report_interval=10.0):
+    """
+    无界面回放：用录制的画面 (图片目录、视频或原始帧转储) 代替实时截屏，FakeWindowTracker 代替
+    桌面窗口，RecordingInput 代替键鼠，默认不限速全速处理，用于测量持续吞吐量。
+
+    返回:
+    - (LoopStats, RecordingInput): 运行统计和处理器发出的全部键鼠操作。
+    """
+    from core.frame_source import open_frame_source
+    from core.input_simulator import RecordingInput
+
+    settings_store = load_settings_store()
+    if settings_store is None:
+        return None, None
+    settings = settings_store.current
+    recorder = RecordingInput()
+    with open_frame_source(path, frame_size or tuple(settings.client_size), loop=loop) as source:
+        stats = run_automation_loop(target_fps=target_fps, max_ticks=max_ticks, report_interval=report_interval,
+                                    frame_source=source, window_tracker=build_window_tracker(settings, fake=True),
+                                    input_sim=recorder, settings_store=settings_store)
+    print(f"回放结束：{stats.ticks} 帧，记录到 {len(recorder.actions)} 个键鼠操作。")
+    return stats, recorder
+
+
+def _client_worker(window_handle, arbiter, stop_event, status_queue, target_fps, warm_up_ocr=True):
+    # 多客户端模式的子进程入口：每个进程拥有独立的截图后端、OCR 引擎和处理器状态
+    if warm_up_ocr:
+        from core.text_recognizer import start_ocr_warmup
+        _startup.ocr_warmup = start_ocr_warmup()
+    run_automation_loop(target_fps=target_fps, window_handle=window_handle, arbiter=arbiter,
+                        stop_event=stop_event, status_queue=status_queue)
+
+
+def run_multi_client(target_fps=5.0, warm_up_ocr=True):
+    """发现所有匹配的游戏窗口，为每个窗口启动一个工作进程，直到 Ctrl+C。"""
+    from core.multi_client import MultiClientSupervisor, discover_game_window_handles
+
+    settings_store = load_settings_store()
+    if settings_store is None:
+        return
+    settings = settings_store.current
+    window_handles = discover_game_window_handles(settings.window_title, *settings.expected_window_size)
+    if not window_handles:
+        print(f"错误：未能找到标题为 '{settings.window_title}' 的游戏窗口，脚本终止。")
+        return
+    print(f"多客户端模式：发现 {len(window_handles)} 个游戏窗口，启动对应的工作进程。")
+
+    with MultiClientSupervisor(_client_worker, window_handles, worker_args=(target_fps, warm_up_ocr)) as supervisor:
+        try:
+            while supervisor.alive_workers():
+                message = supervisor.poll_status(timeout=1.0)
+                if message is not None:
+                    print(f"[client {message[0]}] 任务 '{message[1]}' 状态: {message[2]}")
+        except KeyboardInterrupt:
+            print("收到中断信号，停止所有客户端。")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="大话西游2 任务助手")
+    parser.add_argument('--loop', action='store_true', help="常驻运行，按固定频率循环处理")
+    parser.add_argument('--fps', type=float, default=None,
+                        help="目标 tick 频率 (常驻模式默认 5，回放模式默认 0 即不限速)")
+    parser.add_argument('--ticks', type=int, default=None, help="常驻模式运行的 tick 数 (默认一直运行)")
+    parser.add_argument('--multi', action='store_true', help="多客户端模式：为每个匹配的游戏窗口启动一个工作进程")
+    parser.add_argument('--replay', default=None,
+                        help="无界面回放录制的画面 (图片目录、视频文件或 .raw 原始帧转储)，默认全速处理")
+    parser.add_argument('--replay-size', default=None,
+                        help="原始帧转储的帧尺寸 WxH (默认使用配置中的客户端尺寸)")
+    parser.add_argument('--replay-loop', action='store_true', help="回放到末尾后从头循环 (配合 --ticks 做长时间压测)")
+    parser.add_argument('--no-ocr-warmup', action='store_true', help="不在启动时后台加载和预热 OCR 模型")
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="日志级别 (DEBUG 输出各模块的调试信息)")
+    parser.add_argument('--metrics-file', default=None, help="退出时把各阶段耗时指标写入这个 JSON 文件")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="在 127.0.0.1 的该端口上提供 GET /metrics (JSON)")
+    return parser.parse_args(argv)
 
 
 if __name__ == '__main__':
-    run_automation()
-    print("自动化脚本执行完毕。")
\ No newline at end of file
+    args = parse_args()
+    logging.basicConfig(level=getattr(logging, args.log_level),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    _startup.mark('imports')
+    if not args.no_ocr_warmup and not args.multi:
+        # 模型加载与窗口查找、首帧截图并行进行 (多客户端模式由各工作进程自己预热)
+        from core.text_recognizer import start_ocr_warmup
+        _startup.ocr_warmup = start_ocr_warmup()
+    metrics_exporter = start_http_exporter(args.metrics_port) if args.metrics_port else None
+    try:
+        if args.replay:
+            replay_size = tuple(int(v) for v in args.replay_size.lower().split('x')) if args.replay_size else None
+            run_replay(args.replay, replay_size, loop=args.replay_loop, max_ticks=args.ticks,
+                       target_fps=args.fps or 0)
+        elif args.multi:
+            run_multi_client(target_fps=args.fps if args.fps is not None else 5.0, warm_up_ocr=not args.no_ocr_warmup)
+        elif args.loop:
+            run_automation_loop(target_fps=args.fps if args.fps is not None else 5.0, max_ticks=args.ticks)
+        else:
+            run_automation()
+    finally:
+        if args.metrics_file:
+            export_json(args.metrics_file)
+        if metrics_exporter is not None:
+            metrics_exporter.close()
+    print("自动化脚本执行完毕。")
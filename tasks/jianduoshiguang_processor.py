@@ -1,134 +1,216 @@
 # tasks/jianduoshiguang_processor.py
 import cv2
+import logging
 import os
-import pyautogui 
+import time
 
-from core.image_matcher import find_template_in_image
-from core.color_filter import find_contours_by_bgr_range
-from core.text_recognizer import recognize_text_with_paddle # 使用PaddleOCR
-from game_elements.task_panel_analyzer import get_relative_roi_from_layout
+import numpy as np
 
-def process_jianduoshiguang(
-    main_game_image_bgr,
-    game_screen_abs_rect,
-    config, 
-    input_sim 
-    ):
-    print("DEBUG (proc): Entering process_jianduoshiguang")
+from core.keyword_index import KIND_TASK, KIND_NPC
+
+TASK_TYPE = 'jianduoshiguang'
+
+logger = logging.getLogger(__name__)
+
+# 任务追踪面板在大多数帧里完全不变；面板像素与上一次分析时完全相同时直接返回上一次的处理结果，
+# 连标题模板匹配和 ROI 计算都跳过。
+# - 只缓存确定的结果：OCR 失败、没找到 NPC 之类的结果可能是偶发的，下一帧需要重新识别。
+# - 缓存绑定生成它的配置快照，热重载配置 (关键字、ROI、颜色范围) 后即使面板没变也会重新分析。
+# - 按像素逐一比较 (不是分块均值)，换了一个墨迹量相近的 NPC 名字也能发现；
+#   缓存超过 _PANEL_CACHE_MAX_AGE 秒后无论如何都重新分析一次。
+_CACHEABLE_STATUSES = frozenset(("task_type_mismatch", "npc_clicked"))
+_PANEL_CACHE_MAX_AGE = 2.0
+_panel_cache = None # _PanelCache
 
-    project_root = config.get("paths", "projectroot")
-    # print(f"DEBUG (proc): Project root: {project_root}") # 可以按需开启
 
-    print("DEBUG (proc): Reading task tracker template config...")
-    header_template_rel_path = config.get('tasktrackerui_templates', 'headertemplatepath')
-    header_template_path = os.path.join(project_root, header_template_rel_path)
-    header_match_threshold = config.getfloat('tasktrackerui_templates', 'headermatchthreshold')
-    # print(f"DEBUG (proc): Template path: {header_template_path}, Threshold: {header_match_threshold}")
+class _PanelCache:
+    __slots__ = ('settings', 'rect', 'pixels', 'status', 'stored_at')
 
-    header_match = find_template_in_image(main_game_image_bgr, header_template_path, header_match_threshold)
+    def __init__(self, settings, rect, pixels, status):
+        self.settings = settings
+        self.rect = rect
+        self.pixels = pixels # 面板区域像素的拷贝
+        self.status = status
+        self.stored_at = time.monotonic()
+
+    def matches(self, frame, settings):
+        if settings is not self.settings or time.monotonic() - self.stored_at > _PANEL_CACHE_MAX_AGE:
+            return False
+        x, y, w, h = self.rect
+        return np.array_equal(frame[y:y + h, x:x + w], self.pixels)
+
+
+def reset_panel_cache():
+    """丢弃缓存的面板处理结果 (基准测试用来测量完整的处理路径)。"""
+    global _panel_cache
+    _panel_cache = None
+
+
+def process_jianduoshiguang(
+    context,
+    input_sim 
+    ):
+    """
+    处理 '见多识广' 类型任务：定位任务追踪栏，识别任务类型，找到绿色 NPC 名字并 (模拟) 点击。
+
+    参数:
+    - context (core.frame_context.FrameContext): 本帧的共享分析上下文 (画面、屏幕矩形、配置快照，
+      以及标题位置、ROI、颜色块、OCR 结果等按需计算并缓存的派生数据)。
+    - input_sim: core.input_simulator 模块或提供相同函数的对象。
+
+    返回:
+    - str: 处理状态，例如 "npc_clicked"、"task_type_mismatch"。
+    """
+    global _panel_cache
+    logger.debug("Entering process_jianduoshiguang")
+    settings = context.settings
+
+    cache = _panel_cache
+    if cache is not None and cache.matches(context.frame, settings):
+        logger.debug("Task tracker panel unchanged, reusing previous status '%s'.", cache.status)
+        return cache.status
+
+    header_match = context.header
     if not header_match:
-        print("DEBUG (proc): Failed to find 'Task Tracker' template.")
+        logger.debug("Failed to find 'Task Tracker' template.")
         return "template_not_found_in_processor"
     header_x, header_y, header_w, header_h, _ = header_match
-    print(f"DEBUG (proc): 'Task Tracker' template found: X={header_x}, Y={header_y}, W={header_w}, H={header_h}")
-
-    print("DEBUG (proc): Reading UI layout and keyword configs...")
-    ui_layout_config = dict(config.items('tasktrackerui_layout'))
-    jdg_keywords_str = config.get('taskkeywords', 'jianduoshiguang')
-    jdg_keywords = [kw.strip() for kw in jdg_keywords_str.split(',') if kw.strip()]
-    target_npc_name_normalized = config.get('jianduoshiguang_npc_keywords', 'targetnpcname')
-    npc_keywords_str = config.get('jianduoshiguang_npc_keywords', 'keywords')
-    npc_keywords = [kw.strip() for kw in npc_keywords_str.split(',') if kw.strip()]
-    green_lower_str = config.get('tasktrackerui_layout', 'npcnamegreenlowerbound')
-    green_lower = tuple(map(int, green_lower_str.split(',')))
-    green_upper_str = config.get('tasktrackerui_layout', 'npcnamegreenupperbound')
-    green_upper = tuple(map(int, green_upper_str.split(',')))
-    # print("DEBUG (proc): All specific configs read.") # 可以按需开启
-
-    task_type_roi_coords = get_relative_roi_from_layout(ui_layout_config, 'tasktype', header_x, header_y)
-    if not task_type_roi_coords: 
-        print("DEBUG (proc): Failed to calculate TaskType ROI.")
+    logger.debug("'Task Tracker' template found: X=%s, Y=%s, W=%s, H=%s", header_x, header_y, header_w, header_h)
+
+    npc_config = settings.npc_keywords.get(TASK_TYPE)
+    if npc_config is None:
+        logger.debug("Missing [jianduoshiguang_npc_keywords] config.")
+        return "config_error_npc_keywords"
+    target_npc_name_normalized = npc_config.target_name
+    if settings.color_bounds.get('npcnamegreen') is None:
+        logger.debug("Missing npcnamegreen color bounds.")
+        return "config_error_color_bounds"
+
+    task_type_roi_coords = context.roi('tasktype')
+    if task_type_roi_coords is None: 
+        logger.debug("Failed to calculate TaskType ROI.")
         return "config_error_tasktype_roi"
 
-    tt_x, tt_y, tt_w, tt_h = task_type_roi_coords
-    if not (tt_x >= 0 and tt_y >= 0 and tt_x + tt_w <= main_game_image_bgr.shape[1] and tt_y + tt_h <= main_game_image_bgr.shape[0]):
-        print(f"DEBUG (proc): TaskType ROI out of bounds.")
+    task_desc_roi_coords = context.roi('taskdesc')
+    if task_desc_roi_coords is None: 
+        logger.debug("Failed to calculate TaskDesc ROI.")
+        return "config_error_taskdesc_roi"
+
+    status = _analyze_task_panel(context, input_sim, settings.keyword_index, target_npc_name_normalized)
+    _panel_cache = None
+    if status in _CACHEABLE_STATUSES:
+        panel_rect = _clip_rect(_union_rects([(header_x, header_y, header_w, header_h),
+                                              task_type_roi_coords, task_desc_roi_coords]), context.frame_size)
+        if panel_rect is not None:
+            x, y, w, h = panel_rect
+            _panel_cache = _PanelCache(settings, panel_rect, context.frame[y:y + h, x:x + w].copy(), status)
+    return status
+
+
+def _union_rects(rects):
+    x0 = min(r[0] for r in rects)
+    y0 = min(r[1] for r in rects)
+    x1 = max(r[0] + r[2] for r in rects)
+    y1 = max(r[1] + r[3] for r in rects)
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+def _clip_rect(rect, frame_size):
+    frame_w, frame_h = frame_size
+    x0, y0 = max(0, rect[0]), max(0, rect[1])
+    x1, y1 = min(frame_w, rect[0] + rect[2]), min(frame_h, rect[1] + rect[3])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (x0, y0, x1 - x0, y1 - y0)
+
+
+def _analyze_task_panel(
+    context,
+    input_sim,
+    keyword_index,
+    target_npc_name_normalized
+    ):
+    if not context.roi_in_bounds('tasktype'):
+        logger.debug("TaskType ROI out of bounds.")
         return "roi_out_of_bounds_tasktype"
 
-    task_type_img_bgr = main_game_image_bgr[tt_y : tt_y + tt_h, tt_x : tt_x + tt_w]
-    # cv2.imwrite(os.path.join(project_root, "debug_task_type_roi_from_task.png"), task_type_img_bgr)
+    # cv2.imwrite(os.path.join(project_root, "debug_task_type_roi_from_task.png"), context.roi_image('tasktype'))
 
-    recognized_task_type = recognize_text_with_paddle(task_type_img_bgr) 
+    recognized_task_type, _ = context.ocr_roi_line('tasktype')
     if not recognized_task_type: 
-        print("DEBUG (proc): PaddleOCR failed to recognize TaskType text.")
+        logger.debug("PaddleOCR failed to recognize TaskType text.")
         return "ocr_failed_tasktype"
-    print(f"DEBUG (proc): Recognized TaskType text (PaddleOCR): '{recognized_task_type}'")
+    logger.debug("Recognized TaskType text (PaddleOCR): '%s'", recognized_task_type)
 
-    is_target_task = any(keyword in recognized_task_type for keyword in jdg_keywords if keyword)
+    # 一次扫描就能得到文本中出现的全部任务类型，这里只关心 '见多识广'
+    task_matches = keyword_index.search(recognized_task_type, kind=KIND_TASK)
+    is_target_task = any(match.label == TASK_TYPE for match in task_matches)
     if not is_target_task:
-        print(f"DEBUG (proc): Recognized TaskType '{recognized_task_type}' does not match keywords.")
+        logger.debug("Recognized TaskType '%s' does not match keywords.", recognized_task_type)
         return "task_type_mismatch"
-    print("DEBUG (proc): TaskType matched!")
+    logger.debug("TaskType matched!")
 
-    task_desc_roi_coords = get_relative_roi_from_layout(ui_layout_config, 'taskdesc', header_x, header_y)
-    if not task_desc_roi_coords: 
-        print("DEBUG (proc): Failed to calculate TaskDesc ROI.")
-        return "config_error_taskdesc_roi"
-
-    td_x, td_y, td_w, td_h = task_desc_roi_coords
-    if not (td_x >= 0 and td_y >= 0 and td_x + td_w <= main_game_image_bgr.shape[1] and td_y + td_h <= main_game_image_bgr.shape[0]):
-        print(f"DEBUG (proc): TaskDesc ROI out of bounds.")
+    if not context.roi_in_bounds('taskdesc'):
+        logger.debug("TaskDesc ROI out of bounds.")
         return "roi_out_of_bounds_taskdesc"
 
-    task_desc_img_bgr = main_game_image_bgr[td_y : td_y + td_h, td_x : td_x + td_w]
+    td_x, td_y, td_w, td_h = context.roi('taskdesc')
+    task_desc_img_bgr = context.roi_image('taskdesc')
     # cv2.imwrite(os.path.join(project_root, "debug_task_desc_roi_from_task.png"), task_desc_img_bgr)
     # print("DEBUG (proc): TaskDesc ROI cut and saved.")
 
-    print(f"DEBUG (proc): Finding green blobs in TaskDesc ROI. Color range L:{green_lower} U:{green_upper}")
-    green_blobs = find_contours_by_bgr_range(task_desc_img_bgr, green_lower, green_upper, min_contour_area=1) 
+    logger.debug("Finding green text lines in TaskDesc ROI.")
+    # 面积按像素数计算：至少 4 个像素，过滤掉零散的单个绿色像素；
+    # 同一个名字被分割出的笔画连通块合并成一行，每个名字只送入识别器一次
+    green_lines = context.color_text_lines('taskdesc', 'npcnamegreen', min_area=4)
 
-    if not green_blobs: 
-        print("DEBUG (proc): No green blobs found in TaskDesc ROI.")
+    if not green_lines: 
+        logger.debug("No green text lines found in TaskDesc ROI.")
         return "npc_not_found_color"
 
-    print(f"DEBUG (proc): Found {len(green_blobs)} potential green blob(s).")
+    logger.debug("Found %s potential green text line(s).", len(green_lines))
     found_npc_to_click = False
     task_desc_roi_with_boxes_drawn = task_desc_img_bgr.copy()
 
-    for i, (gx, gy, gw, gh) in enumerate(green_blobs):
-        # print(f"DEBUG (proc):  Processing green blob {i+1}: X={gx}, Y={gy}, W={gw}, H={gh}") # 可以按需开启
+    # 先收集所有有效的绿色文字行，再一次性批量送入识别器
+    blob_boxes = []
+    blob_crops = []
+    for i, (gx, gy, gw, gh, members) in enumerate(green_lines):
+        # print(f"DEBUG (proc):  Processing green line {i+1}: X={gx}, Y={gy}, W={gw}, H={gh}, {len(members)} blobs") # 可以按需开启
         cv2.rectangle(task_desc_roi_with_boxes_drawn, (gx, gy), (gx + gw, gy + gh), (0, 0, 255), 1)
 
         ocr_gy_end = min(gy + gh, task_desc_img_bgr.shape[0])
         ocr_gx_end = min(gx + gw, task_desc_img_bgr.shape[1])
         if gy >= ocr_gy_end or gx >= ocr_gx_end : 
-            # print(f"DEBUG (proc):    Green blob {i+1} has invalid bounds, skipping OCR.") # 可以按需开启
+            # print(f"DEBUG (proc):    Green line {i+1} has invalid bounds, skipping OCR.") # 可以按需开启
             continue
 
         green_blob_for_ocr = task_desc_img_bgr[gy:ocr_gy_end, gx:ocr_gx_end]
-        # cv2.imwrite(os.path.join(project_root, f"debug_npc_blob_ocr_input_{i+1}.png"), green_blob_for_ocr) # 保存送入OCR的小块
+        # cv2.imwrite(os.path.join(project_root, f"debug_npc_line_ocr_input_{i+1}.png"), green_blob_for_ocr) # 保存送入OCR的小块
+        blob_boxes.append((gx, gy, gw, gh))
+        blob_crops.append(green_blob_for_ocr)
+
+    blob_ocr_results = context.ocr_lines(('taskdesc', 'npcnamegreen'), blob_crops)
 
-        npc_text = recognize_text_with_paddle(green_blob_for_ocr) 
+    for i, ((gx, gy, gw, gh), (npc_text, npc_confidence)) in enumerate(zip(blob_boxes, blob_ocr_results)):
         if not npc_text: 
-            # print(f"DEBUG (proc):    Green blob {i+1} OCR (Paddle) failed to recognize text.") # 可以按需开启
+            # print(f"DEBUG (proc):    Green line {i+1} OCR (Paddle) failed to recognize text.") # 可以按需开启
             continue
-        print(f"DEBUG (proc):    Green blob {i+1} OCR (Paddle) result: '{npc_text}'")
-
-        for npc_keyword in npc_keywords:
-            if npc_keyword and npc_keyword in npc_text:
-                print(f"DEBUG (proc):    Matched NPC keyword '{npc_keyword}' in '{npc_text}'!")
-                click_x_game_relative = td_x + gx + gw // 2
-                click_y_game_relative = td_y + gy + gh // 2
-
-                abs_screen_x = game_screen_abs_rect[0] + click_x_game_relative
-                abs_screen_y = game_screen_abs_rect[1] + click_y_game_relative
-
-                print(f"DEBUG (proc):    Preparing to click NPC '{target_npc_name_normalized}' at game_rel({click_x_game_relative},{click_y_game_relative}), screen_abs({abs_screen_x},{abs_screen_y})")
-                # input_sim.click_screen_coords(abs_screen_x, abs_screen_y) 
-                print("DEBUG (proc):    (Simulated click is commented out)") 
-                found_npc_to_click = True
-                break 
-        if found_npc_to_click:
+        logger.debug("   Green line %s OCR (Paddle) result: '%s' (confidence %.2f)", i+1, npc_text, npc_confidence)
+
+        npc_match = keyword_index.best(npc_text, kind=KIND_NPC, group=TASK_TYPE)
+        if npc_match is not None and npc_match.label == target_npc_name_normalized:
+            logger.debug("   Matched NPC keyword '%s' in '%s' (score %.2f)!", npc_match.alias, npc_text, npc_match.score)
+            click_x_game_relative = td_x + gx + gw // 2
+            click_y_game_relative = td_y + gy + gh // 2
+
+            abs_screen_x = context.client_rect[0] + click_x_game_relative
+            abs_screen_y = context.client_rect[1] + click_y_game_relative
+
+            logger.debug("   Preparing to click NPC '%s' at game_rel(%s,%s), screen_abs(%s,%s)", target_npc_name_normalized, click_x_game_relative, click_y_game_relative, abs_screen_x, abs_screen_y)
+            # input_sim.click_screen_coords(abs_screen_x, abs_screen_y) 
+            logger.debug("   (Simulated click is commented out)")
+            found_npc_to_click = True
             break 
 
     # cv2.imwrite(os.path.join(project_root, "debug_task_desc_with_green_blobs.png"), task_desc_roi_with_boxes_drawn)
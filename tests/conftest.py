@@ -0,0 +1,26 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# 测试直接导入 core / tasks 包，与从项目根目录运行 main.py 时相同
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+
+@pytest.fixture
+def project(tmp_path):
+    """项目配置和模板的临时副本，供热重载测试修改。"""
+    shutil.copytree(os.path.join(PROJECT_ROOT, 'config'), tmp_path / 'config')
+    shutil.copytree(os.path.join(PROJECT_ROOT, 'assets', 'templates'), tmp_path / 'assets' / 'templates')
+    return tmp_path
+
+
+def edit_config(path, old, new):
+    """替换配置文件中的一段文本，并保证 mtime 一定变化 (有些文件系统的 mtime 精度是秒)。"""
+    text = path.read_text(encoding='utf-8')
+    assert old in text
+    path.write_text(text.replace(old, new), encoding='utf-8')
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
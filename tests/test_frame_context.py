@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import core.frame_context as frame_context
+
+
+@pytest.fixture
+def recognized(monkeypatch):
+    calls = []
+
+    def fake_recognize(crops):
+        calls.append(len(crops))
+        return [(str(int(crop[0, 0, 0])), 1.0) for crop in crops]
+
+    monkeypatch.setattr(frame_context, 'recognize_lines_batch', fake_recognize)
+    return calls
+
+
+def _context():
+    return frame_context.FrameContext(np.zeros((20, 20, 3), dtype=np.uint8), (0, 0, 20, 20), None)
+
+
+def test_ocr_lines_reuses_results_for_same_crops(recognized):
+    context = _context()
+    first = context.ocr_lines('names', [context.frame[0:5, 0:5]])
+    second = context.ocr_lines('names', [context.frame[0:5, 0:5]])
+    assert first == second
+    assert recognized == [1]
+
+
+def test_ocr_lines_distinguishes_crops_with_reused_addresses(recognized):
+    context = _context()
+    # 临时拷贝被释放后，新的截图块很可能分配在同一地址上
+    assert context.ocr_lines('names', [np.full((4, 4, 3), 1, dtype=np.uint8)]) == [('1', 1.0)]
+    assert context.ocr_lines('names', [np.full((4, 4, 3), 2, dtype=np.uint8)]) == [('2', 1.0)]
+    assert recognized == [1, 1]
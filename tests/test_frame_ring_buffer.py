@@ -0,0 +1,89 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from core.screen_capture import FrameRingBuffer
+
+
+def _frame(value, width=8, height=4):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRingBuffer(8, 4, num_slots=2)
+    yield ring
+    ring.close()
+
+
+def test_acquire_returns_latest_frame(ring):
+    assert ring.acquire_latest() is None
+    ring.publish(_frame(1))
+    ring.publish(_frame(2))
+    with ring.acquire_latest() as shared:
+        assert shared.seq == 1
+        assert (shared.image == 2).all()
+
+
+def test_frame_dropped_when_all_slots_pinned(ring):
+    assert ring.publish(_frame(1)) == 0
+    first = ring.acquire_latest()
+    assert ring.publish(_frame(2)) == 1
+    second = ring.acquire_latest()
+
+    # 一个槽位被读取方占用，另一个是被占用的最新帧：写入方不阻塞，本帧丢弃
+    assert ring.publish(_frame(3)) is None
+    assert ring.dropped_frames == 1
+    assert (first.image == 1).all() and (second.image == 2).all()
+
+    first.release()
+    assert ring.publish(_frame(4)) == 2
+    assert ring.stats()['slots_in_use'] == 1
+    second.release()
+
+
+def test_latest_slot_is_never_overwritten(ring):
+    ring.publish(_frame(1))
+    # 没有读取方时也不能复用最新帧所在的槽位，否则刚发布的帧可能在读取途中被覆盖
+    ring.publish(_frame(2))
+    ring.publish(_frame(3))
+    with ring.acquire_latest() as shared:
+        assert shared.seq == 2 and (shared.image == 3).all()
+    assert ring.dropped_frames == 0
+
+
+def test_failed_write_is_not_published(ring):
+    ring.publish(_frame(1))
+    with pytest.raises(RuntimeError):
+        with ring.write_slot() as view:
+            view[:] = 9
+            raise RuntimeError("capture failed")
+    with ring.acquire_latest() as shared:
+        assert shared.seq == 0 and (shared.image == 1).all()
+
+
+def test_after_seq_times_out_without_newer_frame(ring):
+    ring.publish(_frame(1))
+    started = time.perf_counter()
+    assert ring.acquire_latest(after_seq=0, timeout=0.05) is None
+    assert time.perf_counter() - started >= 0.04
+
+
+def test_after_seq_wakes_on_publish(ring):
+    ring.publish(_frame(1))
+    timer = threading.Timer(0.02, ring.publish, args=(_frame(2),))
+    timer.start()
+    shared = ring.acquire_latest(after_seq=0, timeout=2.0)
+    timer.join()
+    assert shared is not None and shared.seq == 1
+    shared.release()
+
+
+def test_release_is_idempotent(ring):
+    ring.publish(_frame(1))
+    shared = ring.acquire_latest()
+    shared.release()
+    shared.release()
+    assert ring.stats()['slots_in_use'] == 0
@@ -0,0 +1,130 @@
+import cv2
+import numpy as np
+import pytest
+
+import core.text_recognizer as text_recognizer
+from core.glyph_ocr import (GlyphAtlas, GlyphRecognizer, binarize, load_glyph_recognizer, main,
+                            segment_glyphs, trim_line)
+
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def render_line(text, foreground=(0, 255, 0), background=(30, 30, 30)):
+    """用固定字体渲染一行文字 (字间距固定，相当于游戏的点阵字体)。"""
+    image = np.full((24, 16 * len(text) + 8, 3), background, dtype=np.uint8)
+    for index, char in enumerate(text):
+        cv2.putText(image, char, (4 + 16 * index, 18), _FONT, 0.55, foreground, 1, cv2.LINE_8)
+    return image
+
+
+@pytest.fixture(scope='module')
+def atlas():
+    atlas, rejected = GlyphAtlas.from_samples([(render_line('ABCDE'), 'ABCDE'), (render_line('FHKLN'), 'FHKLN')])
+    assert rejected == []
+    return atlas
+
+
+def test_binarize_marks_text_for_both_polarities():
+    light_on_dark = render_line('A')
+    dark_on_light = 255 - light_on_dark
+    for image in (light_on_dark, dark_on_light):
+        mask = binarize(image)
+        assert set(np.unique(mask)) == {0, 1}
+        assert np.count_nonzero(mask) * 2 < mask.size # 文字像素少于背景
+
+
+def test_trim_line_and_empty_mask():
+    mask = np.zeros((10, 10), dtype=np.uint8)
+    assert trim_line(mask) == (None, 0)
+    mask[3:6, 2:4] = 1
+    trimmed, top = trim_line(mask)
+    assert top == 3 and trimmed.shape == (3, 10)
+
+
+def test_segment_glyphs_merges_runs_up_to_max_width():
+    mask = np.zeros((4, 20), dtype=np.uint8)
+    mask[:, 0:2] = 1   # 同一个字的两部分 (中间有空列)
+    mask[:, 3:5] = 1
+    mask[:, 10:13] = 1 # 下一个字
+    assert segment_glyphs(mask, max_glyph_width=6) == [(0, 5), (10, 13)]
+    assert segment_glyphs(mask, max_glyph_width=3) == [(0, 2), (3, 5), (10, 13)]
+
+
+def test_from_samples_rejects_mislabelled_samples():
+    atlas, rejected = GlyphAtlas.from_samples([(render_line('AB'), 'AB'), (render_line('CD'), 'CDE')])
+    assert rejected == ['CDE']
+    assert sorted(atlas.chars) == ['A', 'B']
+
+
+def test_recognizes_new_line_from_atlas(atlas):
+    recognizer = GlyphRecognizer(atlas, min_confidence=0.85)
+    text, confidence = recognizer.recognize_line(render_line('HEAD'))
+    assert text == 'HEAD'
+    assert confidence >= 0.85
+
+
+def test_wrong_line_height_has_zero_confidence(atlas):
+    recognizer = GlyphRecognizer(atlas)
+    big = cv2.resize(render_line('ABC'), None, fx=2, fy=2, interpolation=cv2.INTER_NEAREST)
+    assert recognizer.recognize_line(big) == ("", 0.0)
+    assert recognizer.recognize_line(np.zeros((0, 0, 3), dtype=np.uint8)) == ("", 0.0)
+
+
+def test_atlas_save_load_round_trip(atlas, tmp_path):
+    path = tmp_path / 'atlas.npz'
+    atlas.save(path)
+    loaded = GlyphAtlas.load(path)
+    assert loaded.chars == atlas.chars
+    assert (loaded.cell_height, loaded.cell_width) == (atlas.cell_height, atlas.cell_width)
+    assert np.array_equal(loaded.matrix, atlas.matrix)
+
+
+def test_build_cli(tmp_path, capsys):
+    samples = tmp_path / 'samples'
+    samples.mkdir()
+    cv2.imwrite(str(samples / 'ABCDE.png'), render_line('ABCDE'))
+    cv2.imwrite(str(samples / 'FHKLN__2.png'), render_line('FHKLN')) # "__" 之后的部分不属于标注
+    output = tmp_path / 'atlas.npz'
+
+    assert main(['build', str(samples), str(output)]) == 0
+    recognizer = load_glyph_recognizer(str(output))
+    assert recognizer.recognize_line(render_line('BLANK'))[0] == 'BLANK'
+    assert '10 个字符' in capsys.readouterr().out
+
+
+def test_missing_atlas_disables_glyph_path(tmp_path):
+    assert load_glyph_recognizer(str(tmp_path / 'missing.npz')) is None
+    assert load_glyph_recognizer(None) is None
+
+
+@pytest.fixture
+def fake_paddle(monkeypatch):
+    calls = []
+
+    def fake_batch(crops):
+        calls.append(len(crops))
+        return [("paddle", 0.5)] * len(crops)
+
+    monkeypatch.setattr(text_recognizer, 'initialize_paddle_ocr', lambda **kwargs: True)
+    monkeypatch.setattr(text_recognizer, '_run_recognizer_batch', fake_batch)
+    yield calls
+    text_recognizer.configure_glyph_recognizer(None)
+
+
+def test_recognize_lines_batch_uses_glyphs_and_falls_back(atlas, tmp_path, fake_paddle):
+    path = tmp_path / 'atlas.npz'
+    atlas.save(path)
+    assert text_recognizer.configure_glyph_recognizer(str(path), 0.85) is not None
+
+    unreadable = np.random.default_rng(0).integers(0, 255, (24, 60, 3), dtype=np.uint8)
+    results = text_recognizer.recognize_lines_batch([render_line('DEAF'), unreadable], use_cache=False)
+    assert results[0][0] == 'DEAF'
+    assert results[1] == ("paddle", 0.5)
+    assert fake_paddle == [1] # 只有字形识别不了的那一块送入 PaddleOCR
+
+
+def test_recognize_lines_batch_without_atlas_uses_paddle(tmp_path, fake_paddle):
+    assert text_recognizer.configure_glyph_recognizer(str(tmp_path / 'missing.npz')) is None
+    results = text_recognizer.recognize_lines_batch([render_line('DEAF')], use_cache=False)
+    assert results == [("paddle", 0.5)]
+    assert fake_paddle == [1]
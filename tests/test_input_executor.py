@@ -0,0 +1,182 @@
+import threading
+import time
+import types
+
+import pytest
+
+import core.input_simulator as input_simulator
+from conftest import edit_config
+from core.config_loader import SettingsStore
+from core.input_simulator import (ACTION_COALESCED, ACTION_DONE, ACTION_EXPIRED, ACTION_FAILED,
+                                  ACTION_STALE, InputExecutor, RecordingInput)
+
+
+class GatedInput(RecordingInput):
+    """press_key('gate') 阻塞到 release() 为止，让后续操作确定地留在队列里。"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self._gate = threading.Event()
+
+    def press_key(self, *args, **kwargs):
+        if args and args[0] == 'gate':
+            self.started.set()
+            self._gate.wait(5)
+        super().press_key(*args, **kwargs)
+
+    def release(self):
+        self._gate.set()
+
+
+@pytest.fixture
+def gated():
+    target = GatedInput()
+    executor = InputExecutor(target)
+    executor.press_key('gate')
+    assert target.started.wait(5)
+    yield executor, target
+    target.release()
+    executor.close()
+
+
+def _names(target):
+    return [(name, args) for name, args, _, _ in target.actions]
+
+
+def test_pending_moves_are_coalesced(gated):
+    executor, target = gated
+    first = executor.move_to_screen_coords(1, 1)
+    second = executor.move_to_screen_coords(2, 2)
+    click = executor.click_screen_coords(3, 3)
+    target.release()
+    assert executor.wait_idle(5)
+    assert first.status == ACTION_COALESCED and second.status == ACTION_COALESCED
+    assert click.status == ACTION_DONE
+    assert _names(target) == [('press_key', ('gate',)), ('click_screen_coords', (3, 3))]
+
+
+def test_key_presses_are_not_coalesced(gated):
+    executor, target = gated
+    executor.move_to_screen_coords(1, 1)
+    key = executor.press_key('a')
+    target.release()
+    assert executor.wait_idle(5)
+    assert key.status == ACTION_DONE
+    assert ('move_to_screen_coords', (1, 1)) in _names(target)
+
+
+def test_actions_from_superseded_frames_are_stale(gated):
+    executor, target = gated
+    executor.advance_frame(1)
+    # 未指定 frame_seq 的操作记为当前帧
+    clicks = [executor.click_screen_coords(i, i) for i in range(3)]
+    assert all(click.frame_seq == 1 for click in clicks)
+    executor.advance_frame(5)
+    assert all(click.status == ACTION_STALE for click in clicks)
+    target.release()
+    assert executor.wait_idle(5)
+    assert executor.stats()['stale'] == 3
+    assert _names(target) == [('press_key', ('gate',))]
+
+
+def test_staleness_respects_max_frame_age(gated):
+    executor, target = gated
+    executor.advance_frame(4)
+    recent = executor.press_key('a')
+    untagged = executor.press_key('b', frame_seq=None)
+    executor.advance_frame(5) # 只落后 1 帧 (max_frame_age=1)，保留
+    assert not recent.done
+    executor.advance_frame(100)
+    assert recent.status == ACTION_STALE
+    target.release()
+    assert executor.wait_idle(5)
+    assert untagged.status == ACTION_DONE
+
+
+def test_expired_actions_are_dropped(gated):
+    executor, target = gated
+    action = executor.press_key('a', deadline=0.01)
+    time.sleep(0.03)
+    target.release()
+    assert executor.wait_idle(5)
+    assert action.status == ACTION_EXPIRED
+
+
+def test_priority_runs_first(gated):
+    executor, target = gated
+    executor.press_key('low')
+    executor.press_key('high', priority=10)
+    target.release()
+    assert executor.wait_idle(5)
+    assert _names(target)[1:] == [('press_key', ('high',)), ('press_key', ('low',))]
+
+
+def test_failed_action_reports_error():
+    class Broken(RecordingInput):
+        def press_key(self, *args, **kwargs):
+            raise OSError("no display")
+
+    with InputExecutor(Broken()) as executor:
+        action = executor.press_key('a')
+        assert action.wait(5) == ACTION_FAILED
+        assert isinstance(action.error, OSError)
+
+
+def test_close_drains_queue(gated):
+    executor, target = gated
+    action = executor.press_key('a')
+    target.release()
+    executor.close()
+    assert action.status == ACTION_DONE
+
+
+def test_missing_pyautogui_raises_clear_error(monkeypatch):
+    monkeypatch.setattr(input_simulator, 'pyautogui', None)
+    for call in (lambda: input_simulator.click_screen_coords(1, 2),
+                 lambda: input_simulator.move_to_screen_coords(1, 2),
+                 lambda: input_simulator.press_key('a'),
+                 lambda: input_simulator.press_hotkey('ctrl', 'c')):
+        with pytest.raises(RuntimeError, match='pyautogui'):
+            call()
+
+
+class PauseProbe(RecordingInput):
+    """记录每次调用时 pyautogui.PAUSE 的值。"""
+
+    def __init__(self, fake_pyautogui):
+        super().__init__()
+        self.pauses = []
+        self._pyautogui = fake_pyautogui
+
+    def _record(self, name, args, kwargs):
+        self.pauses.append(self._pyautogui.PAUSE)
+        super()._record(name, args, kwargs)
+
+
+def test_zero_animation_toggles_per_action_through_settings_store(project, monkeypatch):
+    fake_pyautogui = types.SimpleNamespace(PAUSE=0.1)
+    monkeypatch.setattr(input_simulator, 'pyautogui', fake_pyautogui)
+
+    store = SettingsStore(str(project), check_interval=0)
+    settings = store.load()
+    assert settings.input_zero_animation is False
+    probe = PauseProbe(fake_pyautogui)
+    executor = InputExecutor(probe, zero_animation=settings.input_zero_animation)
+    store.add_listener(lambda old, new: executor.apply_settings(new))
+    with executor:
+        executor.click_screen_coords(1, 1).wait(5)
+
+        edit_config(project / 'config' / 'settings_general.ini', 'zeroanimation = false', 'zeroanimation = true')
+        assert store.reload_if_changed() is True
+        executor.click_screen_coords(2, 2).wait(5)
+        assert fake_pyautogui.PAUSE == 0.1 # 操作结束后恢复
+
+        edit_config(project / 'config' / 'settings_general.ini', 'zeroanimation = true', 'zeroanimation = false')
+        assert store.reload_if_changed() is True
+        executor.click_screen_coords(3, 3).wait(5)
+
+    assert probe.pauses == [0.1, 0, 0.1]
+    assert 'duration' not in probe.actions[0][2]
+    assert probe.actions[1][2]['duration'] == 0
+    assert 'duration' not in probe.actions[2][2]
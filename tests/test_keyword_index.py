@@ -0,0 +1,79 @@
+import configparser
+
+from core.keyword_index import KIND_NPC, KIND_TASK, KeywordIndex
+
+
+def _index(*entries, **kwargs):
+    index = KeywordIndex(**kwargs)
+    for kind, group, label, alias in entries:
+        index.add(kind, group, label, alias)
+    return index.build()
+
+
+def test_exact_hits_through_fail_links():
+    # "abce" 在 "abc" 之后失配，必须沿失配指针找到 "bcd" 和其中的 "cd"
+    index = _index(
+        (KIND_NPC, 'g', 'abce', 'abce'),
+        (KIND_NPC, 'g', 'bcd', 'bcd'),
+        (KIND_NPC, 'g', 'cd', 'cd'),
+    )
+    matches = {m.label: m for m in index.search('xabcdx', fuzzy=False)}
+    assert set(matches) == {'bcd', 'cd'}
+    assert (matches['bcd'].start, matches['bcd'].end) == (2, 5)
+    assert (matches['cd'].start, matches['cd'].end) == (3, 5)
+    assert all(m.score == 1.0 for m in matches.values())
+
+
+def test_longest_alias_wins_for_same_label():
+    index = _index(
+        (KIND_NPC, 'g', '灵儿', '灵儿'),
+        (KIND_NPC, 'g', '灵儿', '赵灵儿'),
+    )
+    match = index.best('去找赵灵儿谈谈')
+    assert match.alias == '赵灵儿' and match.start == 2
+
+
+def test_fuzzy_alias_hit():
+    index = _index((KIND_TASK, 'jianduoshiguang', 'jianduoshiguang', '见多识广'))
+    assert index.best('见多识厂', fuzzy=False) is None
+    match = index.best('任务：见多识厂(1/10)')
+    assert match.label == 'jianduoshiguang'
+    assert match.score == 0.75
+    assert (match.start, match.end) == (3, 7)
+
+
+def test_short_aliases_are_not_fuzzy_matched():
+    index = _index((KIND_NPC, 'g', '灵儿', '灵儿'))
+    assert index.best('灵JL') is None
+
+
+def test_kind_and_group_filters():
+    index = _index(
+        (KIND_TASK, 'a', 'a', '送信'),
+        (KIND_NPC, 'a', '张三', '张三'),
+        (KIND_NPC, 'b', '李四', '李四'),
+    )
+    text = '送信给张三和李四'
+    assert [m.label for m in index.search(text, kind=KIND_TASK)] == ['a']
+    assert [m.label for m in index.search(text, kind=KIND_NPC, group='b')] == ['李四']
+
+
+def test_add_after_build_rebuilds_lazily():
+    index = _index((KIND_NPC, 'g', '张三', '张三'))
+    index.add(KIND_NPC, 'g', '李四', '李四')
+    assert index.best('李四') is not None
+
+
+def test_from_config():
+    config = configparser.ConfigParser()
+    config.read_string(
+        "[taskkeywords]\n"
+        "jianduoshiguang = 见多识广, 见多识\n"
+        "[jianduoshiguang_npc_keywords]\n"
+        "targetnpcname = 赵灵儿\n"
+        "keywords = 赵灵JL\n"
+    )
+    index = KeywordIndex.from_config(config)
+    assert index.best('见多识广', kind=KIND_TASK).label == 'jianduoshiguang'
+    npc = index.best('找赵灵JL', kind=KIND_NPC, group='jianduoshiguang')
+    assert npc.label == '赵灵儿' and npc.alias == '赵灵JL'
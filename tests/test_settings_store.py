@@ -0,0 +1,45 @@
+import pytest
+
+from conftest import edit_config
+from core.config_loader import ConfigValidationError, SettingsStore
+
+
+def test_invalid_int_on_reload_keeps_previous_settings(project):
+    store = SettingsStore(str(project), check_interval=0)
+    original = store.load()
+
+    edit_config(project / 'config' / 'settings_ocr.ini', 'cachemaxentries = 256', 'cachemaxentries = 25x')
+    assert store.reload_if_changed() is False
+    assert store.current is original
+    assert isinstance(store.last_error, ConfigValidationError)
+
+    edit_config(project / 'config' / 'settings_ocr.ini', 'cachemaxentries = 25x', 'cachemaxentries = 64')
+    assert store.reload_if_changed() is True
+    assert store.current.ocr_cache_max_entries == 64
+    assert store.last_error is None
+
+
+@pytest.mark.parametrize('old, new', [
+    ('cachettlseconds = 300', 'cachettlseconds = -1'),
+    ('cachephashtolerance = 0', 'cachephashtolerance = 65'),
+])
+def test_out_of_range_values_are_rejected(project, old, new):
+    store = SettingsStore(str(project), check_interval=0)
+    original = store.load()
+    edit_config(project / 'config' / 'settings_ocr.ini', old, new)
+    assert store.reload_if_changed() is False
+    assert store.current is original
+
+
+def test_failing_listener_does_not_break_reload(project):
+    store = SettingsStore(str(project), check_interval=0)
+    store.load()
+
+    def broken_listener(old_settings, new_settings):
+        raise OSError("corrupt glyph atlas")
+
+    store.add_listener(broken_listener)
+    edit_config(project / 'config' / 'settings_ocr.ini', 'cachemaxentries = 256', 'cachemaxentries = 32')
+    assert store.reload_if_changed() is True
+    assert store.current.ocr_cache_max_entries == 32
+    assert isinstance(store.last_error, OSError)
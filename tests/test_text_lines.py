@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+
+from core.color_filter import boxes_from_mask, group_text_lines
+
+
+def test_empty():
+    assert group_text_lines([]) == []
+
+
+def test_strokes_of_one_name_merge_into_one_line():
+    # 左右结构的字、上下结构 (偏旁与下半部分相隔 1 像素) 的字、中间的细小笔画
+    boxes = [(10, 10, 4, 12), (15, 10, 5, 12), (22, 10, 10, 4), (22, 15, 10, 7), (34, 14, 2, 2)]
+    lines = group_text_lines(boxes)
+    assert len(lines) == 1
+    line = lines[0]
+    assert (line.x, line.y, line.w, line.h) == (10, 10, 26, 12)
+    assert sorted(line.members) == sorted(boxes)
+
+
+def test_names_separated_by_a_wide_gap_stay_apart():
+    boxes = [(10, 10, 12, 12), (23, 10, 12, 12), (60, 10, 12, 12), (73, 10, 12, 12)]
+    lines = group_text_lines(boxes, max_gap=6)
+    assert [(line.x, line.w) for line in lines] == [(10, 25), (60, 25)]
+
+
+def test_stacked_lines_do_not_merge():
+    # 行距只有 1 像素、在容差之内，但两行都已是完整字高且底边不对齐
+    boxes = [(10, 10, 12, 12), (23, 10, 12, 12), (10, 23, 12, 12), (23, 23, 12, 12)]
+    lines = group_text_lines(boxes, baseline_tolerance=2, min_height=8)
+    assert [(line.y, line.h, len(line.members)) for line in lines] == [(10, 12, 2), (23, 12, 2)]
+
+
+def test_merge_pass_joins_lines_started_from_fragments():
+    # 按 x 排序时先遇到上半部分的两个偏旁，各自成行；后来的整字把它们连起来，合并阶段要把所有行并成一行
+    boxes = [(10, 10, 5, 4), (10, 20, 5, 4), (16, 10, 10, 14)]
+    lines = group_text_lines(boxes, min_height=8)
+    assert len(lines) == 1
+    assert (lines[0].x, lines[0].y, lines[0].w, lines[0].h) == (10, 10, 16, 14)
+    assert len(lines[0].members) == 3
+
+
+def test_short_lines_are_dropped():
+    boxes = [(10, 10, 12, 12), (100, 50, 2, 2)]
+    lines = group_text_lines(boxes, min_height=8)
+    assert len(lines) == 1 and lines[0].x == 10
+
+
+def test_lines_sorted_top_to_bottom_then_left_to_right():
+    boxes = [(60, 40, 12, 12), (10, 40, 12, 12), (30, 10, 12, 12)]
+    lines = group_text_lines(boxes)
+    assert [(line.x, line.y) for line in lines] == [(30, 10), (10, 40), (60, 40)]
+
+
+def test_rendered_text_groups_per_word():
+    mask = np.zeros((60, 200), dtype=np.uint8)
+    cv2.putText(mask, 'iii', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 255, 1)
+    cv2.putText(mask, 'iii', (120, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 255, 1)
+    blobs = boxes_from_mask(mask)
+    assert len(blobs) > 2 # 每个 i 的点和竖线都是单独的连通块
+    lines = group_text_lines(blobs, min_height=8)
+    assert len(lines) == 2
+    assert sum(len(line.members) for line in lines) == len(blobs)
+
+
+def test_overlapping_lines_merge_regardless_of_baseline():
+    # renshen.png 中绿色 NPC 名字 (带下划线) 的连通块：整行只有一行文字
+    boxes = [(4, 2, 13, 14), (19, 2, 13, 9), (34, 2, 13, 14), (49, 2, 13, 14), (65, 2, 12, 14),
+             (79, 2, 13, 14), (94, 2, 13, 14), (68, 4, 6, 1), (67, 7, 8, 6), (20, 10, 8, 4),
+             (19, 12, 11, 4), (3, 18, 105, 1)]
+    lines = group_text_lines(boxes)
+    assert len(lines) == 1
+    assert (lines[0].x, lines[0].y, lines[0].w, lines[0].h) == (3, 2, 105, 17)
+    assert len(lines[0].members) == len(boxes)
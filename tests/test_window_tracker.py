@@ -0,0 +1,52 @@
+import threading
+import time
+
+from core.window_manager import FakeGameWindow, FakeWindowTracker
+
+
+class SlowTracker(FakeWindowTracker):
+    """枚举窗口较慢，并统计同时进行的枚举数，用来暴露刷新/读取之间的竞争。"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.max_active = 0
+
+    def _find_window(self):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        time.sleep(0.001)
+        self.active -= 1
+        return super()._find_window()
+
+
+def test_tracker_refresh_and_read_are_serialized():
+    tracker = SlowTracker('game', 800, 600, window=FakeGameWindow('game', 10, 20, 800, 600))
+    stop = threading.Event()
+    seen = []
+
+    def executor_thread():
+        # 相当于 ArbitratedInput 的 window_provider
+        while not stop.is_set():
+            seen.append(tracker.get_window())
+
+    reader = threading.Thread(target=executor_thread)
+    reader.start()
+    try:
+        for _ in range(200):
+            tracker.invalidate()
+            assert tracker.get_client_rect() == (10, 20, 800, 600)
+    finally:
+        stop.set()
+        reader.join(5)
+
+    assert seen and all(window is tracker.fake_window for window in seen)
+    assert tracker.max_active == 1
+
+
+def test_listener_may_read_tracker():
+    tracker = FakeWindowTracker('game', 800, 600)
+    windows = []
+    tracker.add_listener(lambda old, new: windows.append(tracker.get_window()))
+    assert tracker.get_window_rect() == (0, 0, 800, 600)
+    assert windows == [tracker.fake_window]